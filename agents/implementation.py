@@ -1,13 +1,14 @@
 from crewai import Agent
-from llm.gemini_llm import get_gemini_llm
+from llm.routing import llm_for
+from utils.tracing import VERBOSE
 
 def implementation_agent():
     return Agent(
         role="Senior Machine Learning Engineer",
         goal="Translate theory into practical implementation guidance suitable for real-world systems.",
         backstory="You are a senior ML engineer who has implemented multiple research papers into production systems.You understand common implementation pitfalls, performance tradeoffs, and best practices in PyTorch and TensorFlow.",
-        verbose=True,
-        llm=get_gemini_llm(),
+        verbose=VERBOSE,
+        llm=llm_for('implementation'),
         max_iter=2,
         allow_delegation=False
     )
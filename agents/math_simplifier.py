@@ -1,13 +1,14 @@
 from crewai import Agent
-from llm.gemini_llm import get_gemini_llm
+from llm.routing import llm_for
+from utils.tracing import VERBOSE
 
 def math_simplifier_agent():
     return Agent(
         role="Machine Learning Mathematics Tutor",
         goal="Convert complex mathematical expressions into clear intuition that a strong ML engineer can understand.",
         backstory="You specialize in explaining advanced ML mathematics to engineers and students.You focus on intuition first, using simple language and conceptual explanations, while preserving mathematical correctness.",
-        verbose=True,
-        llm=get_gemini_llm(),
+        verbose=VERBOSE,
+        llm=llm_for('math'),
         max_iter=2,
         allow_delegation=False
     )
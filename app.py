@@ -1,52 +1,177 @@
-from flask import Flask, request, render_template, redirect, url_for
-import os
-from werkzeug.utils import secure_filename
-from crew.crew_setup import build_crew, extract_pdf_text
-
-app = Flask(__name__)
-app.config['UPLOAD_FOLDER'] = 'uploads'
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
-
-# Ensure upload folder exists
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-
-@app.route('/')
-def index():
-    return render_template('index.html')
-
-@app.route('/upload', methods=['POST'])
-def upload_file():
-    if 'file' not in request.files:
-        return redirect(request.url)
-    
-    file = request.files['file']
-    if file.filename == '':
-        return redirect(request.url)
-    
-    if file and file.filename.lower().endswith('.pdf'):
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
-        
-        # Process the PDF
-        try:
-            paper_text = extract_pdf_text(filepath)
-            crew = build_crew(paper_text)
-            result = crew.kickoff()
-            
-            # Clean up uploaded file
-            os.remove(filepath)
-            
-            return render_template('result.html', result=str(result))
-        except Exception as e:
-            # Clean up on error
-            if os.path.exists(filepath):
-                os.remove(filepath)
-            return render_template('error.html', error=str(e))
-    
-    return redirect(url_for('index'))
-
-if __name__ == '__main__':
-    # Disable the auto-reloader to avoid restarts triggered by system file changes
-    # (useful on Windows where antivirus/OS updates touch Python stdlib files).
-    app.run(debug=True, use_reloader=False)
\ No newline at end of file
+from flask import Flask, request, render_template, redirect, url_for, jsonify, Response, stream_with_context
+import logging
+import os
+import uuid
+from werkzeug.utils import secure_filename
+from crew.crew_setup import build_crew, extract_pdf_text
+from crew.dag import kickoff_crew
+from crew.compaction import compact_paper
+from crew.streaming import open_stream, get_stream, stream_events
+from utils.tracing import traced, metrics, prometheus_metrics
+from utils.job_queue import JobQueue, QueueFull, QueueClosed, job_events, pending_page
+from utils.uploads import HashingRequest
+
+# Library modules log through `logging`; show their messages next to this module's prints
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+app = Flask(__name__)
+# Uploads are written to disk and sha256-hashed as they arrive
+app.request_class = HashingRequest
+app.config['UPLOAD_FOLDER'] = 'uploads'
+app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['JOB_DB'] = os.path.join('cache', 'jobs.sqlite3')
+app.config['JOB_WORKERS'] = int(os.getenv('JOB_WORKERS', '2'))
+# Analyses allowed to wait for a worker; beyond that /upload answers 429 (0 = unbounded)
+app.config['JOB_MAX_QUEUED'] = int(os.getenv('JOB_MAX_QUEUED', '20'))
+
+# Ensure upload folder exists
+os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+
+@traced('analysis')
+def run_analysis(job_id, payload, report):
+    """Job handler: run the crew on one uploaded PDF"""
+    filepath = payload['filepath']
+    # Live agent output for /jobs/<id>/stream
+    stream = open_stream(job_id)
+    try:
+        report("Extracting text")
+        paper_text = extract_pdf_text(filepath)
+        report("Compacting paper text")
+        compacted = compact_paper(paper_text)
+        report("Running analysis agents")
+        crew = build_crew(compacted['text'])
+        run = kickoff_crew(crew, stream=stream)
+        stream.finish(ttft=run['ttft'])
+        return {'result': str(run['result']), 'stage_timings': run['stage_timings'],
+                'tokens_saved': compacted['tokens_saved'], 'ttft': run['ttft'], 'rate_limit': run['rate_limit'],
+                'prompt_cache': run['prompt_cache'], 'model_routing': run['model_routing']}
+    except Exception as e:
+        stream.finish(error=str(e))
+        raise
+    finally:
+        # Clean up uploaded file; a failed delete must not fail the analysis
+        try:
+            if os.path.exists(filepath):
+                os.remove(filepath)
+        except OSError as e:
+            print(f"⚠️ Could not remove {filepath}: {e}")
+
+# Background analysis jobs (bounded worker pool, persistent job table)
+job_queue = JobQueue(app.config['JOB_DB'], run_analysis, max_workers=app.config['JOB_WORKERS'],
+                     max_queued=app.config['JOB_MAX_QUEUED'])
+
+@app.route('/')
+def index():
+    return render_template('index.html')
+
+def wants_html() -> bool:
+    """A browser form post or page load rather than an API client (fetch and curl send */*)"""
+    return request.accept_mimetypes.best_match(['application/json', 'text/html']) == 'text/html'
+
+def queue_refused(error):
+    """429 with a Retry-After hint while the analysis queue is full; 503 while draining for shutdown"""
+    if wants_html():
+        retry_after = error.retry_after if isinstance(error, QueueFull) else 30
+        response = app.make_response(render_template(
+            'error.html', error=f"{error}. Please try again in about {retry_after} seconds."))
+        response.headers['Retry-After'] = str(retry_after)
+        return response, 429 if isinstance(error, QueueFull) else 503
+    if isinstance(error, QueueFull):
+        response = jsonify({'error': str(error), 'queued': error.queued, 'max_queued': error.max_queued,
+                            'retry_after': error.retry_after})
+        response.headers['Retry-After'] = str(error.retry_after)
+        return response, 429
+    response = jsonify({'error': str(error)})
+    response.headers['Retry-After'] = '30'
+    return response, 503
+
+@app.route('/upload', methods=['POST'])
+def upload_file():
+    if 'file' not in request.files:
+        return redirect(request.url)
+    
+    file = request.files['file']
+    if file.filename == '':
+        return redirect(request.url)
+    
+    if file and file.filename.lower().endswith('.pdf'):
+        # Prefix with a random id so concurrent uploads of the same name don't collide
+        filename = secure_filename(file.filename)
+        filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"{uuid.uuid4().hex[:8]}_{filename}")
+        # Already spooled to disk while received; just move it into place
+        file.stream.claim(filepath)
+        
+        # Queue the analysis and return the job ID immediately
+        try:
+            job_id = job_queue.submit({'filepath': filepath, 'filename': filename})
+        except (QueueFull, QueueClosed) as refused:
+            os.remove(filepath)
+            return queue_refused(refused)
+        if wants_html():
+            # A form post from the upload page: follow the job in the browser
+            return redirect(url_for('job_result', job_id=job_id), code=303)
+        response = jsonify({
+            'job_id': job_id,
+            'queue_position': job_queue.get(job_id, include_output=False)['queue_position'],
+            'status_url': url_for('job_status', job_id=job_id),
+            'events_url': url_for('job_events_stream', job_id=job_id),
+            'stream_url': url_for('job_token_stream', job_id=job_id),
+            'result_url': url_for('job_result', job_id=job_id)
+        })
+        response.headers['Location'] = url_for('job_status', job_id=job_id)
+        return response, 202
+    
+    return redirect(url_for('index'))
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = job_queue.get(job_id, include_output=False)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job)
+
+@app.route('/jobs/<job_id>/events')
+def job_events_stream(job_id):
+    return Response(stream_with_context(job_events(job_queue, job_id)),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/jobs/<job_id>/stream')
+def job_token_stream(job_id):
+    """Server-Sent Events stream of the agents' output tokens, tagged by stage (?format=html adds rendered HTML)"""
+    stream = get_stream(job_id)
+    if stream is None:
+        return jsonify({'error': 'No live output for this job'}), 404
+    return Response(stream_with_context(stream_events(stream, html=request.args.get('format') == 'html')),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/queue-stats')
+def queue_stats():
+    """Analysis job queue: running and waiting jobs, limits, and whether uploads are accepted"""
+    return jsonify(job_queue.stats())
+
+@app.route('/metrics')
+def latency_metrics():
+    """Latency histograms per traced span (Prometheus text; ?format=json for JSON)"""
+    if request.args.get('format') == 'json':
+        return jsonify(metrics())
+    return Response(prometheus_metrics(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return render_template('error.html', error='Unknown analysis job.'), 404
+    if job['status'] == 'failed':
+        return render_template('error.html', error=job['error'])
+    if job['status'] != 'done':
+        if wants_html():
+            return Response(pending_page(job), status=202, mimetype='text/html')
+        return jsonify({k: v for k, v in job.items() if k != 'output'}), 202
+    return render_template('result.html', **job['output'])
+
+if __name__ == '__main__':
+    # Disable the auto-reloader to avoid restarts triggered by system file changes
+    # (useful on Windows where antivirus/OS updates touch Python stdlib files).
+    app.run(debug=True, use_reloader=False)
@@ -0,0 +1,90 @@
+"""
+Benchmark: single-pass markdown renderer vs. the old format_analysis_result.
+
+Builds crew-like outputs of 100 KB to 1 MB from the fake LLM's canned
+answers (headings, lists, tables, code, emphasis) and reports MB/s for the
+old line filter, for render_markdown on the whole text and for the same
+text fed in token-sized chunks, as a stream would deliver it. Streamed and
+whole renders must be identical; a flat ms/MB column means linear time.
+
+Usage:
+    python benchmarks/bench_markdown.py [--sizes 100,250,500,1000] [--chunk 16] [--repeat 3]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm.fake_llm import CANNED_RESPONSES
+from utils.markdown_render import MarkdownRenderer, render_markdown
+
+
+def legacy_format(result_text: str) -> str:
+    """The previous format_analysis_result (its reachable part, without the debug prints)"""
+    clean_lines = []
+    for line in result_text.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+        if any(css_pattern in line.lower() for css_pattern in [
+            'box-shadow', 'rgba(', 'color:', 'text-decoration',
+            'margin-bottom', 'text-align', '} h1 {', '} h2 {',
+            'color: #333', 'color: white'
+        ]):
+            continue
+        if line.count(':') > 2 and line.count(';') > 1:
+            continue
+        if 'Analysis Results' in line and ('<' in line or '>' in line):
+            continue
+        clean_lines.append(line)
+    return re.sub(r'<[^>]*>', '', '\n\n'.join(clean_lines))
+
+
+def synthetic_output(size_kb: int) -> str:
+    """Canned stage answers repeated until the text is size_kb kilobytes"""
+    sections = [f"# {stage.title()} analysis\n\n{text}" for stage, text in CANNED_RESPONSES.items()]
+    block = "\n\n".join(sections) + "\n\n"
+    target = size_kb * 1024
+    return (block * (target // len(block) + 1))[:target]
+
+
+def render_streamed(text: str, chunk: int) -> str:
+    renderer = MarkdownRenderer()
+    parts = [renderer.feed(text[i:i + chunk]) for i in range(0, len(text), chunk)]
+    parts.append(renderer.close())
+    return ''.join(parts)
+
+
+def best_of(fn, repeat: int):
+    best = float('inf')
+    output = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, output
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='100,250,500,1000', help='output sizes in KB')
+    parser.add_argument('--chunk', type=int, default=16, help='characters per streamed chunk')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'size':>8} {'old MB/s':>9} {'new MB/s':>9} {'stream MB/s':>12} {'new ms/MB':>10} identical")
+    for size_kb in [int(size) for size in args.sizes.split(',')]:
+        text = synthetic_output(size_kb)
+        size_mb = len(text.encode('utf-8')) / (1024 * 1024)
+        old_seconds, _ = best_of(lambda: legacy_format(text), args.repeat)
+        new_seconds, whole = best_of(lambda: render_markdown(text), args.repeat)
+        stream_seconds, streamed = best_of(lambda: render_streamed(text, args.chunk), args.repeat)
+        print(f"{size_kb:>6}KB {size_mb / old_seconds:9.1f} {size_mb / new_seconds:9.1f} "
+              f"{size_mb / stream_seconds:12.1f} {new_seconds * 1000 / size_mb:10.1f} {whole == streamed}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark: shared single-pass normalizer vs. the old multi-pass regex pipelines.
+
+Reports MB/s for page normalization and cache-key word extraction on the
+bundled PDF and on a synthetic 1000-page input, and checks both produce
+exactly the old output.
+
+Usage:
+    python benchmarks/bench_normalize.py [pdf_path] [--pages N] [--repeat R]
+"""
+import argparse
+import logging
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pypdf import PdfReader
+from utils.normalize import normalize_pdf_text, cache_key_words
+
+DEFAULT_PDF = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           'Contribution_and_performance_of_ChatGPT.pdf')
+
+
+def legacy_normalize(text: str) -> str:
+    """The previous normalize_pdf_text: lower/NFKD plus four uncompiled re.sub passes"""
+    if not text:
+        return ""
+    import unicodedata
+    text = text.lower().strip()
+    text = unicodedata.normalize('NFKD', text)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'[\f\r\v\x0c]', ' ', text)
+    text = re.sub(r'[""''`]', '"', text)
+    text = re.sub(r'[–—―]', '-', text)
+    return text.strip()
+
+
+def legacy_key_words(paper_text: str) -> list:
+    """The previous get_cache_key word pipeline"""
+    normalized_text = paper_text.lower().strip()
+    normalized_text = re.sub(r'=== page \d+ ===', '', normalized_text)
+    normalized_text = re.sub(r'[^a-zA-Z0-9\s]', ' ', normalized_text)
+    normalized_text = re.sub(r'\s+', ' ', normalized_text)
+    return [w for w in normalized_text.split() if len(w) >= 4 and not w.isdigit()]
+
+
+def synthetic_pages(sample_pages: list, count: int) -> list:
+    """count pages built from shuffled sample lines, with some unicode punctuation mixed in"""
+    rng = random.Random(0)
+    lines = [line for page in sample_pages for line in page.splitlines() if line.strip()]
+    extras = ['“quoted”', '‘single’', '—', '–', 'ﬁ', 'café', ' ', '\f', '\t']
+    pages = []
+    for _ in range(count):
+        picked = rng.sample(lines, min(len(lines), 45))
+        pages.append("\n".join(f"{line} {rng.choice(extras)}" for line in picked))
+    return pages
+
+
+def throughput(fn, pages: list, repeat: int):
+    """Best-of-repeat MB/s of fn over every page, plus the outputs"""
+    size_mb = sum(len(page.encode('utf-8')) for page in pages) / (1024 * 1024)
+    best = float('inf')
+    outputs = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        outputs = [fn(page) for page in pages]
+        best = min(best, time.perf_counter() - start)
+    return size_mb / best, outputs
+
+
+def report(label: str, pages: list, repeat: int):
+    size_mb = sum(len(page.encode('utf-8')) for page in pages) / (1024 * 1024)
+    print(f"\n📄 {label}: {len(pages)} pages, {size_mb:.2f} MB, best of {repeat}")
+
+    old_rate, old_out = throughput(legacy_normalize, pages, repeat)
+    new_rate, new_out = throughput(normalize_pdf_text, pages, repeat)
+    print(f"normalize  old: {old_rate:8.1f} MB/s   new: {new_rate:8.1f} MB/s  "
+          f"({new_rate / old_rate:.2f}x)  identical: {old_out == new_out}")
+
+    # Cache keys are computed over the joined, normalized text
+    joined = [" ".join(f"=== page {n} === {text}" for n, text in enumerate(new_out, 1))]
+    old_rate, old_out = throughput(legacy_key_words, joined, repeat)
+    new_rate, new_out = throughput(cache_key_words, joined, repeat)
+    print(f"cache key  old: {old_rate:8.1f} MB/s   new: {new_rate:8.1f} MB/s  "
+          f"({new_rate / old_rate:.2f}x)  identical: {old_out == new_out}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('pdf_path', nargs='?', default=DEFAULT_PDF)
+    parser.add_argument('--pages', type=int, default=1000, help='synthetic page count')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    # pypdf warns about every font it can't fully parse; keep the output readable
+    logging.disable(logging.WARNING)
+
+    pdf_pages = [page.extract_text() or "" for page in PdfReader(args.pdf_path).pages]
+    report(os.path.basename(args.pdf_path), pdf_pages, args.repeat)
+    report("synthetic", synthetic_pages(pdf_pages, args.pages), args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,274 @@
+"""
+Benchmark: end-to-end pipeline latency, throughput and memory with a local fake LLM.
+
+Runs offline: every agent (and map-reduce digest call) talks to llm.fake_llm
+instead of the real provider, with fixed latency, token rate and canned
+answers, so the numbers measure our orchestration (extraction, compaction,
+crew build, kickoff, job queue, upload handling) rather than the model.
+
+Modes:
+    crew    build_crew + kickoff_crew on the extracted paper, N papers at C at a time
+    upload  POST /upload through the Flask test client and poll /jobs/<id> until done
+
+With --latency 0 --tokens-per-second 0 the model costs nothing and the
+latency is pure orchestration overhead. --prefill-tokens-per-second charges
+input tokens the fake model's simulated prompt cache misses, so the shared
+prompt prefix shows up in latency (compare with --no-prefix-warmup).
+--cascade routes the extraction stages through llm.routing's cascade, with
+the fast fake model in front (compare per-stage seconds without it).
+--max-p95 makes the run fail (exit 1) when p95 latency regresses past a
+limit, for CI.
+
+Usage:
+    python benchmarks/bench_pipeline.py [pdf_path] [--mode crew|upload|both] [--papers N]
+        [--concurrency C] [--latency S] [--tokens-per-second R] [--output-tokens T]
+        [--prefill-tokens-per-second R] [--no-prefix-warmup] [--cascade] [--fast-failure-rate F]
+        [--execution-mode dag|sequential] [--no-memory] [--max-p95 S] [--json]
+"""
+import argparse
+import io
+import json
+import logging
+import math
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_PDF = os.path.join(ROOT, 'Contribution_and_performance_of_ChatGPT.pdf')
+
+# Poll interval while waiting for an upload's job to finish
+POLL_SECONDS = 0.02
+
+
+def configure(args):
+    """Point the pipeline at the fake LLM; must run before any pipeline module is imported"""
+    os.environ['LLM_PROVIDER'] = 'fake'
+    os.environ['FAKE_LLM_LATENCY'] = str(args.latency)
+    os.environ['FAKE_LLM_TOKENS_PER_SECOND'] = str(args.tokens_per_second)
+    os.environ['FAKE_LLM_OUTPUT_TOKENS'] = str(args.output_tokens)
+    os.environ['FAKE_LLM_PREFILL_TOKENS_PER_SECOND'] = str(args.prefill_tokens_per_second)
+    os.environ['PROMPT_PREFIX_WARMUP'] = '0' if args.no_prefix_warmup else '1'
+    os.environ['LLM_FAST_PROVIDER'] = 'fake-fast' if args.cascade else 'fake'
+    os.environ['FAKE_FAST_LLM_FAILURE_RATE'] = str(args.fast_failure_rate)
+    os.environ['LLM_MAX_CONCURRENCY'] = str(max(8, args.concurrency * 4))
+    os.environ['JOB_WORKERS'] = str(args.concurrency)
+    # Every paper must do the full work: no memoized stages or digests
+    os.environ['STAGE_CACHE_ENABLED'] = '0'
+    os.environ['CREW_VERBOSE'] = '0'
+    os.environ['TRACE_EXPORT_PATH'] = ''
+    if args.execution_mode:
+        os.environ['CREW_EXECUTION_MODE'] = args.execution_mode
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def run_papers(work, papers: int, concurrency: int):
+    """Run work(i) for every paper, `concurrency` at a time; returns (latencies, errors, wall seconds)"""
+    errors = []
+
+    def timed(i):
+        started = time.perf_counter()
+        try:
+            work(i)
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(timed, range(papers)))
+    return latencies, errors, time.perf_counter() - started
+
+
+def run_batch(label: str, work, papers: int, concurrency: int, trace_memory: bool) -> dict:
+    """Latency and throughput over the batch, then heap usage from one traced round of papers"""
+    from llm.registry import get_shared_llm
+    from llm.routing import routing_stats
+    fakes = [get_shared_llm('fake'), get_shared_llm('fake-fast')]
+    stats_before = [dict(fake.stats) for fake in fakes]
+    cascades_before = routing_stats()['cascades']
+    stage_timings = getattr(work, 'stage_timings', [])
+    stage_timings.clear()
+
+    latencies, errors, wall = run_papers(work, papers, concurrency)
+
+    def used(field):
+        return sum(fake.stats[field] - before[field] for fake, before in zip(fakes, stats_before))
+    calls = used('calls')
+    output_tokens = used('output_tokens')
+    input_tokens = used('input_tokens')
+    cached_tokens = used('cached_input_tokens')
+    cascades = routing_stats()['cascades']
+    cascade_calls = sum(c['calls'] - cascades_before.get(stage, {}).get('calls', 0) for stage, c in cascades.items())
+    escalations = sum(c['escalations'] - cascades_before.get(stage, {}).get('escalations', 0)
+                      for stage, c in cascades.items())
+    # Crew mode only: p50 seconds per stage (upload mode doesn't see the kickoff results)
+    stage_p50 = {stage: round(percentile([t[stage]['seconds'] for t in stage_timings if stage in t], 50), 3)
+                 for stage in (stage_timings[0] if stage_timings else {})}
+
+    # tracemalloc slows allocation-heavy code (pypdf) several times over, so
+    # memory is measured on a separate round instead of the timed batch
+    peak_heap = None
+    in_flight = min(concurrency, papers)
+    if trace_memory:
+        tracemalloc.start()
+        run_papers(work, in_flight, concurrency)
+        _, peak_heap = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        'mode': label,
+        'papers': papers,
+        'concurrency': concurrency,
+        'errors': len(errors),
+        'first_error': errors[0] if errors else None,
+        'p50_seconds': round(percentile(latencies, 50), 4),
+        'p95_seconds': round(percentile(latencies, 95), 4),
+        'max_seconds': round(max(latencies), 4),
+        'wall_seconds': round(wall, 4),
+        'papers_per_second': round(papers / wall, 3),
+        'llm_calls_per_paper': round(calls / papers, 2),
+        'output_tokens_per_second': round(output_tokens / wall, 1),
+        'input_tokens_per_paper': round(input_tokens / papers),
+        # Share of input tokens read from the (simulated) provider prompt cache
+        'cached_input_share': round(cached_tokens / input_tokens, 3) if input_tokens else 0.0,
+        'stage_p50_seconds': stage_p50,
+        # Cascade calls the fast model's answer didn't pass, sent on to the strong model
+        'escalation_rate': round(escalations / cascade_calls, 3) if cascade_calls else None,
+        # Python heap only (tracemalloc), shared by the papers in flight
+        'peak_heap_mb': round(peak_heap / 1e6, 2) if peak_heap is not None else None,
+        'heap_mb_per_paper': round(peak_heap / 1e6 / in_flight, 2) if peak_heap is not None else None,
+        'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def crew_work(pdf_path: str, execution_mode: str):
+    """build_crew + kickoff_crew on the extracted, compacted paper (extracted once up front)"""
+    from crew.crew_setup import build_crew, extract_pdf_text
+    from crew.compaction import compact_paper
+    from crew.dag import kickoff_crew
+
+    paper_text = compact_paper(extract_pdf_text(pdf_path))['text']
+
+    def work(i):
+        # A distinct first line per paper: prompt-cache hits only come from within the paper
+        crew = build_crew(f"[benchmark paper {i}]\n{paper_text}", execution_mode=execution_mode)
+        work.stage_timings.append(kickoff_crew(crew, memoize=False)['stage_timings'])
+    work.stage_timings = []
+    return work
+
+
+def upload_work(pdf_path: str):
+    """POST the PDF to /upload and poll /jobs/<id> until the analysis job finishes"""
+    # app.py keeps uploads and its job table relative to the working directory
+    os.chdir(tempfile.mkdtemp(prefix='bench-pipeline-'))
+    import app as web
+    with open(pdf_path, 'rb') as f:
+        pdf_bytes = f.read()
+
+    def work(i):
+        client = web.app.test_client()
+        response = client.post('/upload', data={'file': (io.BytesIO(pdf_bytes), f'paper-{i}.pdf')},
+                               content_type='multipart/form-data')
+        if response.status_code != 202:
+            raise RuntimeError(f"/upload returned {response.status_code}")
+        status_url = response.get_json()['status_url']
+        while True:
+            job = client.get(status_url).get_json()
+            if job['status'] == 'done':
+                return
+            if job['status'] == 'failed':
+                raise RuntimeError(job['error'])
+            time.sleep(POLL_SECONDS)
+    return work
+
+
+def print_report(report: dict):
+    print(f"\n🚀 {report['mode']}: {report['papers']} papers, concurrency {report['concurrency']}"
+          f"{', ' + str(report['errors']) + ' failed' if report['errors'] else ''}")
+    print(f"latency     p50 {report['p50_seconds']:.3f}s   p95 {report['p95_seconds']:.3f}s   "
+          f"max {report['max_seconds']:.3f}s")
+    print(f"throughput  {report['papers_per_second']:.2f} papers/s   "
+          f"{report['output_tokens_per_second']:.0f} output tokens/s   "
+          f"{report['llm_calls_per_paper']} LLM calls/paper")
+    print(f"input       {report['input_tokens_per_paper']} tokens/paper   "
+          f"{report['cached_input_share']:.0%} from the prompt cache")
+    if report['stage_p50_seconds']:
+        print("stages      " + "   ".join(f"{stage} {seconds:.2f}s"
+                                          for stage, seconds in report['stage_p50_seconds'].items()) + "  (p50)")
+    if report['escalation_rate'] is not None:
+        print(f"cascade     {report['escalation_rate']:.0%} of fast-model answers escalated")
+    if report['peak_heap_mb'] is not None:
+        print(f"memory      peak heap {report['peak_heap_mb']:.1f} MB   "
+              f"{report['heap_mb_per_paper']:.1f} MB/paper in flight   max RSS {report['max_rss_mb']:.0f} MB")
+    else:
+        print(f"memory      max RSS {report['max_rss_mb']:.0f} MB")
+    if report['first_error']:
+        print(f"first error: {report['first_error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('pdf_path', nargs='?', default=DEFAULT_PDF)
+    parser.add_argument('--mode', choices=['crew', 'upload', 'both'], default='both')
+    parser.add_argument('--papers', type=int, default=8)
+    parser.add_argument('--concurrency', type=int, default=2)
+    parser.add_argument('--latency', type=float, default=0.2, help='fake LLM seconds before the first token')
+    parser.add_argument('--tokens-per-second', type=float, default=200, help='fake LLM output rate (0 = instant)')
+    parser.add_argument('--output-tokens', type=int, default=400, help='fake LLM tokens per answer')
+    parser.add_argument('--prefill-tokens-per-second', type=float, default=0,
+                        help='fake LLM input rate for tokens not in its prompt cache (0 = free)')
+    parser.add_argument('--no-prefix-warmup', action='store_true',
+                        help='skip the prompt-prefix warm-up call before concurrent stages')
+    parser.add_argument('--cascade', action='store_true',
+                        help='run the extraction stages on the fast fake model, escalating failed answers')
+    parser.add_argument('--fast-failure-rate', type=float, default=0.25,
+                        help='share of the fast fake model\'s answers that fail the quality check')
+    parser.add_argument('--execution-mode', choices=['dag', 'sequential'])
+    parser.add_argument('--no-memory', action='store_true', help='skip the traced round that measures heap usage')
+    parser.add_argument('--max-p95', type=float, help='exit 1 if any mode\'s p95 latency exceeds this')
+    parser.add_argument('--json', action='store_true', help='print the reports as JSON')
+    args = parser.parse_args()
+
+    configure(args)
+    # pypdf warns about every font it can't fully parse; keep the output readable
+    logging.disable(logging.WARNING)
+    pdf_path = os.path.abspath(args.pdf_path)
+
+    reports = []
+    if args.mode in ('crew', 'both'):
+        reports.append(run_batch('crew', crew_work(pdf_path, args.execution_mode),
+                                 args.papers, args.concurrency, not args.no_memory))
+    if args.mode in ('upload', 'both'):
+        reports.append(run_batch('upload', upload_work(pdf_path),
+                                 args.papers, args.concurrency, not args.no_memory))
+
+    if args.json:
+        print(json.dumps(reports, indent=2))
+    else:
+        for report in reports:
+            print_report(report)
+
+    failed = any(report['errors'] for report in reports)
+    if args.max_p95 is not None and any(report['p95_seconds'] > args.max_p95 for report in reports):
+        print(f"❌ p95 latency above {args.max_p95}s", file=sys.stderr)
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+import os
+import re
+from collections import Counter
+from crew.map_reduce import section_spans
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken is optional; fall back to a character estimate
+    _ENCODING = None
+
+# Max tokens of paper text any single task prompt may carry
+TASK_TOKEN_BUDGET = int(os.getenv("TASK_TOKEN_BUDGET", "24000"))
+
+# Headings that start a section with no analytical value for the agents
+DROPPED_HEADING = re.compile(
+    r"^(?:(?:\d{1,2}(?:\.\d{1,2})*\.?|[ivxlc]+\.|[a-z]\.)\s+)?(?:references|bibliography|acknowledge?ments?)\b",
+    re.IGNORECASE)
+PAGE_LABEL = re.compile(r"^page \d+$")
+# What may precede a heading that starts a line: a newline, or a page marker in single-line normalized text
+LINE_START = re.compile(r"(?:^|\n|=== page \d+ ===)\s*$")
+# Roman or letter section numbers ("viii. references", "b. acknowledgements") just before a heading word
+NUMBERED_BEFORE = re.compile(r"(?:^|\s)(?:[ivxlc]+|[a-z])\.\s*$", re.IGNORECASE)
+
+# Boilerplate that shows up around author blocks, footers and licences
+BOILERPLATE = re.compile(
+    r"[\w.+-]+@[\w-]+\.[\w.-]+"                       # e-mail addresses
+    r"|(?:https?://|www\.)\S+"                        # URLs
+    r"|\bdoi:?\s*10\.\d{4,9}/\S+"                      # DOIs
+    r"|[^.]*(?:corresponding author|all rights reserved|creative commons|licensed under|"
+    r"open access article|received:? \d|accepted:? \d|published online)[^.]*\.?",
+    re.IGNORECASE,
+)
+
+# Pages needed before a repeated page prefix/suffix counts as a running header/footer
+HEADER_MIN_PAGES = 3
+HEADER_MAX_WORDS = 80
+# Shortest partial header match stripped from a page (e.g. a title page variant)
+HEADER_MIN_MATCH = 4
+
+
+def count_tokens(text: str) -> int:
+    """Tokens in text (tiktoken cl100k when available, else ~4 characters per token)"""
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def _digits_to_hash(words: list) -> tuple:
+    return tuple(re.sub(r"\d+", "#", word) for word in words)
+
+
+def _running_text(pages: list, from_end: bool) -> int:
+    """Length in words of the longest prefix (or suffix) repeated on enough pages"""
+    needed = max(HEADER_MIN_PAGES, len(pages) // 2)
+    if len(pages) < needed:
+        return 0
+    best = 0
+    for size in range(2, HEADER_MAX_WORDS + 1):
+        counts = Counter()
+        for words in pages:
+            if len(words) > size:
+                counts[_digits_to_hash(words[::-1][:size] if from_end else words[:size])] += 1
+        if counts and counts.most_common(1)[0][1] >= needed:
+            best = size
+        else:
+            break
+    return best
+
+
+def _matched_words(words: list, running: tuple) -> int:
+    """How many leading words of `words` match the running header (modulo page numbers)"""
+    matched = 0
+    for word, expected in zip(_digits_to_hash(words), running):
+        if word != expected:
+            break
+        matched += 1
+    return matched if matched >= min(len(running), HEADER_MIN_MATCH) else 0
+
+
+def _strip_running_headers(sections: list) -> list:
+    """Remove page headers/footers that repeat (modulo page numbers) across pages"""
+    page_idx = [i for i, (label, _) in enumerate(sections) if PAGE_LABEL.match(label)]
+    pages = [sections[i][1].split() for i in page_idx]
+    # Page sections start with their own '=== page N ===' marker (4 words)
+    bodies = [words[4:] for words in pages]
+    head = _running_text(bodies, from_end=False)
+    tail = _running_text(bodies, from_end=True)
+    if not head and not tail:
+        return sections
+    header = Counter(_digits_to_hash(b[:head]) for b in bodies if len(b) > head).most_common(1)[0][0] if head else ()
+    footer = Counter(_digits_to_hash(b[::-1][:tail]) for b in bodies if len(b) > tail).most_common(1)[0][0] if tail else ()
+    stripped = list(sections)
+    for i, words in zip(page_idx, pages):
+        marker, body = words[:4], words[4:]
+        start = _matched_words(body, header) if header else 0
+        end = len(body) - (_matched_words(body[::-1], footer) if footer else 0)
+        # Near-identical pages look like one big header; never strip most of a page
+        if end - start < len(body) // 2:
+            continue
+        stripped[i] = (sections[i][0], " ".join(marker + body[start:end]))
+    return stripped
+
+
+def compact_paper(paper_text: str) -> dict:
+    """
+    Drop low-value text before it reaches the crew: references, bibliography,
+    acknowledgements, running page headers/footers and author/licence boilerplate.
+    Returns {'text', 'tokens_before', 'tokens_after', 'tokens_saved', 'sections'}
+    where 'sections' lists each section's tokens and what happened to it.
+    """
+    spans = [(label, paper_text[start:end].strip(), start) for label, start, end in section_spans(paper_text)]
+    spans = [span for span in spans if span[1]]
+    sections = _strip_running_headers([(label, text) for label, text, _ in spans])
+    kept = []
+    report = []
+    dropping = False
+    for (label, text), (_, _, start) in zip(sections, spans):
+        if PAGE_LABEL.match(label):
+            # A bibliography runs on across pages; only the next real heading ends it
+            pass
+        elif (label[0].isdigit() or LINE_START.search(paper_text, max(0, start - 40), start)
+              or NUMBERED_BEFORE.search(paper_text, max(0, start - 12), start)):
+            # A real heading: numbered, or at the start of a line or page. Bare words
+            # like "references" in running text match SECTION_HEADING too and change nothing.
+            dropping = bool(DROPPED_HEADING.match(label))
+        tokens = count_tokens(text)
+        if dropping:
+            report.append({'section': label, 'tokens': tokens, 'action': 'dropped'})
+            continue
+        cleaned = re.sub(r"\s{2,}", " ", BOILERPLATE.sub(" ", text)).strip()
+        kept.append(cleaned)
+        report.append({'section': label, 'tokens': tokens,
+                       'action': 'kept' if cleaned == text else 'cleaned'})
+
+    compacted = " ".join(kept) if kept else paper_text
+    tokens_before = count_tokens(paper_text)
+    tokens_after = count_tokens(compacted)
+    return {
+        'text': compacted,
+        'tokens_before': tokens_before,
+        'tokens_after': tokens_after,
+        'tokens_saved': tokens_before - tokens_after,
+        'sections': report,
+    }
+
+
+def fit_to_budget(text: str, budget: int = None) -> str:
+    """Cap text at the per-task token budget, keeping its beginning and end"""
+    budget = budget or TASK_TOKEN_BUDGET
+    tokens = count_tokens(text)
+    if tokens <= budget:
+        return text
+    # Characters per token for this text, so the cut lands close to the budget
+    keep_chars = int(len(text) * budget / tokens)
+    head = text[:keep_chars * 3 // 4]
+    tail = text[len(text) - keep_chars // 4:]
+    return f"{head}\n\n[... {tokens - budget} tokens omitted to fit the task budget ...]\n\n{tail}"
+
+
+def compact_visual_context(images: list) -> str:
+    """One short figure note instead of a line per image"""
+    if not images:
+        return ""
+    pages = sorted({img['page'] for img in images})
+    return (f"\n\n=== VISUAL CONTENT ===\nThis paper contains {len(images)} figures/diagrams "
+            f"(pages {', '.join(str(p) for p in pages)}). "
+            f"Reference them in your analysis when relevant.\n")
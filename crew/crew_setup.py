@@ -7,17 +7,18 @@ from tasks.paper_reader_task import paper_reader_task
 from tasks.summary_task import summary_task
 from tasks.math_simplifier_task import math_simplifier_task
 from tasks.implementation_task import implementation_task
-from pypdf import PdfReader
+from crew.dag import STAGES, apply_execution_mode
+from utils.tracing import VERBOSE
+from crew.map_reduce import prepare_stage_inputs
+from crew.prompts import share_paper
+from utils.pdf_extraction import iter_pdf_pages
 
-def extract_pdf_text(pdf_path: str) -> str:
+def extract_pdf_text(pdf_path: str, max_workers: int = None) -> str:
     try:
-        reader = PdfReader(pdf_path)
-        text = []
-
-        for page_num, page in enumerate(reader.pages):
-            page_text = page.extract_text()
-            if page_text:
-                text.append(page_text)
+        # Raw page text, extracted page-parallel and yielded in page order
+        text = [page_text for _, page_text in
+                iter_pdf_pages(pdf_path, max_workers=max_workers, normalize=False)
+                if page_text]
 
         if not text:
             raise ValueError("No text could be extracted from the PDF.")
@@ -28,7 +29,7 @@ def extract_pdf_text(pdf_path: str) -> str:
     except Exception as e:
         raise Exception(f"Error reading PDF: {str(e)}")
 
-def build_crew(paper_text: str) -> Crew:
+def build_crew(paper_text: str, execution_mode: str = None) -> Crew:
 
     # Agents
     reader = paper_reader_agent()
@@ -36,18 +37,29 @@ def build_crew(paper_text: str) -> Crew:
     implementation = implementation_agent()
     summary = summary_agent()
 
-    # Tasks
-    task1 = paper_reader_task(reader, paper_text)
-    task2 = math_simplifier_task(math, paper_text)
-    task3 = implementation_task(implementation, paper_text)
-    task4 = summary_task(summary,paper_text)
+    # Full text for short papers, the map-reduce digests for long ones
+    stage_inputs = prepare_stage_inputs(paper_text)
+
+    # Every stage's prompt opens with the same paper prefix (capped at the task
+    # budget), so the provider's prompt cache prefills it once per paper and the
+    # tasks carry only their own instructions. Digests too long to share one
+    # budget go to their stages separately, each capped on its own.
+    agents = [reader, math, implementation, summary]
+    inputs = share_paper(dict(zip(STAGES, agents)), stage_inputs)
+
+    task1 = paper_reader_task(reader, inputs['reader'])
+    task2 = math_simplifier_task(math, inputs['math'])
+    task3 = implementation_task(implementation, inputs['implementation'])
+    task4 = summary_task(summary, inputs['summary'])
 
     return Crew(
-        agents=[reader, math, implementation, summary],
-        tasks=[task1, task2, task3, task4],
+        agents=agents,
+        tasks=apply_execution_mode([task1, task2, task3, task4], execution_mode),
+        # In 'dag' mode the first three tasks are async, so the sequential
+        # process runs them concurrently and waits for them before the summary
         process=Process.sequential,
         memory=False,  # Disable memory to save API calls
-        verbose=True
+        verbose=VERBOSE  # CREW_VERBOSE=0 leaves the console to tracing
     )
     
 
@@ -0,0 +1,184 @@
+import logging
+import os
+import time
+from crew.stage_cache import (STAGE_CACHE_ENABLED, stage_keys, load_stage_outputs,
+                              save_stage_output, restore_task_output)
+from crew.streaming import attach, detach
+from llm.rate_limit import INTERACTIVE, assign_lane, release_lane, new_ledger
+from crew.prompts import warm_prefix, prompt_cache_usage
+from llm.routing import routing_usage
+from crew.compaction import count_tokens
+from utils.tracing import span, record_span
+
+logger = logging.getLogger(__name__)
+
+# Stage names, in the order build_crew() creates the tasks
+STAGES = ['reader', 'math', 'implementation', 'summary']
+
+# Which stage outputs each stage consumes. reader/math/implementation are
+# built only from the paper text; the summary joins all three.
+DEPENDENCY_GRAPH = {
+    'reader': [],
+    'math': [],
+    'implementation': [],
+    'summary': ['reader', 'math', 'implementation'],
+}
+
+# 'dag' runs independent stages concurrently, 'sequential' is the old chain
+EXECUTION_MODE = os.getenv("CREW_EXECUTION_MODE", "dag")
+
+
+def dependency_graph(mode: str = None) -> dict:
+    """Return {stage: [stages it waits for]} for the given execution mode"""
+    mode = mode or EXECUTION_MODE
+    if mode == 'sequential':
+        # CrewAI's sequential process hands every earlier output to each task
+        return {stage: STAGES[:i] for i, stage in enumerate(STAGES)}
+    if mode == 'dag':
+        return {stage: list(deps) for stage, deps in DEPENDENCY_GRAPH.items()}
+    raise ValueError(f"Unknown crew execution mode: {mode}")
+
+
+def apply_execution_mode(tasks: list, mode: str = None) -> list:
+    """
+    Wire the tasks (ordered as STAGES) for the execution mode.
+    In 'dag' mode every stage that has no dependencies runs as an async task
+    and the stages that depend on them get those tasks as explicit context.
+    """
+    mode = mode or EXECUTION_MODE
+    graph = dependency_graph(mode)
+    if mode == 'dag':
+        by_stage = dict(zip(STAGES, tasks))
+        for stage, task in by_stage.items():
+            if graph[stage]:
+                task.context = [by_stage[dep] for dep in graph[stage]]
+            else:
+                task.async_execution = True
+    return tasks
+
+
+def kickoff_crew(crew, memoize: bool = None, stream=None, lane: int = INTERACTIVE) -> dict:
+    """
+    Run crew.kickoff() and time each stage.
+    With memoization on, stages whose output is already stored for the same
+    prompt, agent config and upstream outputs are skipped; only the stages
+    whose inputs changed (and those downstream of them) run.
+    With a StageStream, LLM tokens are forwarded to it tagged by stage as they
+    arrive (memoized stages are replayed in one chunk).
+    LLM calls wait for the shared rate limiter in `lane` (batch runs pass
+    llm.rate_limit.BATCH); each stage's output is stored as soon as it
+    finishes, so a run that fails later keeps its completed stages.
+    Returns {'result', 'stage_timings', 'dependency_graph', 'memoized_stages',
+    'total_seconds', 'ttft', 'prompt_cache', 'model_routing', 'rate_limit'};
+    stage times are seconds relative to kickoff, model_routing has each
+    stage's model and, for cascades, its escalations and seconds per tier.
+    """
+    memoize = STAGE_CACHE_ENABLED if memoize is None else memoize
+    mode = 'dag' if any(getattr(task, 'async_execution', False) for task in crew.tasks) else 'sequential'
+    graph = dependency_graph(mode)
+    by_stage = dict(zip(STAGES, crew.tasks))
+    keys = stage_keys(STAGES, crew.tasks, graph) if memoize else {}
+    memo = load_stage_outputs(keys) if memoize else {}
+
+    # A stage runs if it isn't memoized or anything it consumes has to run
+    pending = []
+    for stage in STAGES:
+        if stage not in memo or any(dep in pending for dep in graph[stage]):
+            pending.append(stage)
+
+    if len(pending) < len(STAGES):
+        for stage in STAGES:
+            if stage not in pending:
+                restore_task_output(by_stage[stage], memo[stage])
+        # Skipped stages are no longer in the crew, so dependents need them as explicit context
+        for stage in pending:
+            if graph[stage]:
+                by_stage[stage].context = [by_stage[dep] for dep in graph[stage]]
+        crew.tasks = [by_stage[stage] for stage in pending]
+        logger.info("Reusing memoized stages: %s", [s for s in STAGES if s not in pending])
+
+    if stream is not None:
+        for stage in STAGES:
+            if stage not in pending:
+                stream.token(stage, memo[stage], replayed=True)
+                stream.stage_done(stage, memoized=True)
+
+    finished = {}
+
+    def record(stage, callback):
+        def on_complete(output):
+            finished[stage] = time.perf_counter()
+            if memoize and output is not None:
+                save_stage_output(keys[stage], stage, output.raw)
+            if stream is not None:
+                stream.stage_done(stage)
+            if callback:
+                callback(output)
+        return on_complete
+
+    for stage in pending:
+        task = by_stage[stage]
+        task.callback = record(stage, task.callback)
+
+    streamed_agents = {stage: by_stage[stage].agent for stage in pending} if stream is not None else {}
+    if streamed_agents:
+        attach(stream, streamed_agents)
+    agents = [by_stage[stage].agent for stage in pending]
+    rate_limit = new_ledger()
+    assign_lane(agents, lane, rate_limit)
+    started = time.perf_counter()
+    started_ns = time.time_ns()
+    try:
+        if mode == 'dag':
+            # Stages without dependencies start together; prefill their shared prefix first
+            warm_prefix([by_stage[stage].agent for stage in pending if not graph[stage]])
+        with span('crew.kickoff', mode=mode, stages_run=len(pending),
+                  stages_memoized=len(STAGES) - len(pending)) as kickoff_span:
+            result = crew.kickoff() if pending else memo['summary']
+            kickoff_span.set(throttled_seconds=round(rate_limit['throttled_seconds'], 3),
+                             retries=rate_limit['retries'])
+    finally:
+        release_lane(agents)
+        model_routing = routing_usage({stage: by_stage[stage].agent for stage in pending})
+        if streamed_agents:
+            detach(streamed_agents)
+    total = time.perf_counter() - started
+    prompt_cache = prompt_cache_usage({stage: by_stage[stage].agent for stage in pending})
+
+    stage_timings = {}
+    for stage in STAGES:
+        if stage not in pending:
+            stage_timings[stage] = {'start': 0.0, 'end': 0.0, 'seconds': 0.0, 'memoized': True}
+            continue
+        if stage not in finished:
+            continue
+        # A stage starts once everything it depends on has finished
+        start = max((finished.get(dep, started) for dep in graph[stage]), default=started)
+        stage_timings[stage] = {
+            'start': round(start - started, 3),
+            'end': round(finished[stage] - started, 3),
+            'seconds': round(finished[stage] - start, 3),
+        }
+        task = by_stage[stage]
+        raw = task.output.raw if task.output is not None else ''
+        usage = prompt_cache['stages'].get(stage, {})
+        route = model_routing.get(stage, {})
+        record_span(f'task.{stage}', finished[stage] - start,
+                    end_ns=started_ns + int((finished[stage] - started) * 1e9),
+                    agent=task.agent.role, model=route.get('model'), escalations=route.get('escalations'),
+                    input_tokens=usage.get('input_tokens', count_tokens(task.description)),
+                    cached_input_tokens=usage.get('cached_input_tokens'),
+                    output_tokens=count_tokens(raw), output_bytes=len(raw.encode('utf-8')))
+
+    return {
+        'result': result,
+        'stage_timings': stage_timings,
+        'dependency_graph': graph,
+        'memoized_stages': [stage for stage in STAGES if stage not in pending],
+        'total_seconds': round(total, 3),
+        'ttft': stream.ttft() if stream is not None else None,
+        'prompt_cache': prompt_cache,
+        'model_routing': model_routing,
+        'rate_limit': {**rate_limit, 'throttled_seconds': round(rate_limit['throttled_seconds'], 3),
+                       'backoff_seconds': round(rate_limit['backoff_seconds'], 3)},
+    }
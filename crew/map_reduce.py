@@ -0,0 +1,222 @@
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from llm.registry import get_shared_llm
+from crew.stage_cache import memo_key, memoized
+from utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Max characters of paper text sent in one map call. Papers that fit in a
+# single chunk skip map-reduce and go to the tasks unchanged.
+CHUNK_SIZE = int(os.getenv("MAP_REDUCE_CHUNK_SIZE", "12000"))
+
+# Number of chunk digests requested from the LLM at the same time
+MAX_CONCURRENCY = int(os.getenv("MAP_REDUCE_CONCURRENCY", "4"))
+
+SECTION_NAMES = (
+    r"abstract|introduction|background|related work|literature review|preliminaries|"
+    r"method(?:s|ology)?|approach|model|architecture|experiments?|experimental setup|"
+    r"evaluation|results?|discussion|limitations|future work|conclusions?|"
+    r"acknowledge?ments?|references|bibliography|appendix"
+)
+
+# Candidate chunk boundaries: page markers, numbered section headings and the
+# few headings that are rarely used as ordinary words in the running text
+SECTION_HEADING = re.compile(
+    r"(?:^|(?<=\s))("
+    r"=== page \d+ ===|"
+    r"\d{1,2}(?:\.\d{1,2})*\.?\s+(?:" + SECTION_NAMES + r")\b|"
+    r"(?:abstract|references|bibliography|acknowledge?ments?|appendix)\b"
+    r")",
+    re.IGNORECASE,
+)
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+# A digest heading however the model formats it: "### MATH", "**Math:**", "2. Implementation"
+DIGEST_HEADING = re.compile(r"^[#*_\s]*(?:\d\.\s*)?(contributions|math|implementation)[*_:\s]*$", re.IGNORECASE)
+# Map calls repeated when the answer has none of the digest headings
+MAP_RETRIES = int(os.getenv("MAP_REDUCE_RETRIES", "1"))
+
+# Which digest heading each stage is fed
+STAGE_DIGESTS = {
+    'reader': 'CONTRIBUTIONS',
+    'math': 'MATH',
+    'implementation': 'IMPLEMENTATION',
+    'summary': 'CONTRIBUTIONS',
+}
+
+MAP_PROMPT = """
+You are condensing one part of a research paper for three downstream analysts.
+This part covers: {sections}
+
+Write a digest of THIS PART ONLY under exactly these three headings:
+
+### CONTRIBUTIONS
+Problem statement, claims, method, architecture, datasets, evaluation setup and results.
+
+### MATH
+Equations, objectives, definitions and derivations. Keep the paper's notation.
+
+### IMPLEMENTATION
+Algorithms, components, data flow, hyperparameters and engineering details.
+
+Write "none" under a heading if this part has nothing for it.
+Be dense and factual. Do not add anything that is not in the text.
+
+Paper part:
+-----------
+{chunk}
+"""
+
+
+def section_spans(paper_text: str) -> list:
+    """[(label, start, end), ...] for each page marker and section heading (label 'start' before the first)"""
+    spans = []
+    label = "start"
+    last = 0
+    for match in SECTION_HEADING.finditer(paper_text):
+        if match.start() > last:
+            spans.append((label, last, match.start()))
+        label = match.group(1).strip(' =').lower()
+        last = match.start()
+    spans.append((label, last, len(paper_text)))
+    return spans
+
+
+def split_sections(paper_text: str) -> list:
+    """Split paper text at page markers and section headings into [(label, text), ...]"""
+    sections = [(label, paper_text[start:end].strip()) for label, start, end in section_spans(paper_text)]
+    return [(label, text) for label, text in sections if text]
+
+
+def _split_long_text(text: str, chunk_size: int) -> list:
+    """Split text longer than chunk_size at sentence ends (hard cut as a last resort)"""
+    pieces = []
+    current = ""
+    for sentence in SENTENCE_END.split(text):
+        while len(sentence) > chunk_size:
+            pieces.append(sentence[:chunk_size])
+            sentence = sentence[chunk_size:]
+        if current and len(current) + len(sentence) + 1 > chunk_size:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_into_chunks(paper_text: str, chunk_size: int = None) -> list:
+    """
+    Pack consecutive sections into chunks of at most chunk_size characters.
+    Returns [{'index', 'sections', 'text'}, ...] in paper order.
+    """
+    chunk_size = chunk_size or CHUNK_SIZE
+    chunks = []
+    labels = []
+    parts = []
+    size = 0
+
+    def flush():
+        if parts:
+            chunks.append({
+                'index': len(chunks),
+                'sections': list(dict.fromkeys(labels)),
+                'text': " ".join(parts),
+            })
+        labels.clear()
+        parts.clear()
+
+    for label, text in split_sections(paper_text):
+        for piece in _split_long_text(text, chunk_size) if len(text) > chunk_size else [text]:
+            if parts and size + len(piece) + 1 > chunk_size:
+                flush()
+                size = 0
+            labels.append(label)
+            parts.append(piece)
+            size += len(piece) + 1
+    flush()
+    return chunks
+
+
+def parse_digest(digest_text: str) -> dict:
+    """
+    Split a map response into {'CONTRIBUTIONS': ..., 'MATH': ..., 'IMPLEMENTATION': ...};
+    {} when none of the headings is found.
+    """
+    digest = {}
+    current = None
+    for line in str(digest_text).splitlines():
+        heading = DIGEST_HEADING.match(line)
+        if heading:
+            current = heading[1].upper()
+            digest[current] = []
+        elif current:
+            digest[current].append(line)
+    return {heading: "\n".join(lines).strip() for heading, lines in digest.items()}
+
+
+def map_chunk(llm, chunk: dict) -> dict:
+    """
+    Ask the LLM for a per-stage digest of one chunk. An answer without the
+    digest headings is retried; if it never has them, every stage gets the
+    chunk text itself (marked 'fallback', so it is not memoized).
+    """
+    prompt = MAP_PROMPT.format(sections=", ".join(chunk['sections']), chunk=chunk['text'])
+    for _ in range(1 + MAP_RETRIES):
+        digest = parse_digest(llm.call([{"role": "user", "content": prompt}]))
+        if digest:
+            return digest
+    logger.warning("Map-reduce: no digest headings for chunk %d; using its text", chunk['index'])
+    return {**dict.fromkeys(STAGE_DIGESTS.values(), chunk['text']), 'fallback': True}
+
+
+def reduce_digests(chunks: list, digests: list) -> dict:
+    """Join the chunk digests, in paper order, into one input text per stage"""
+    stage_inputs = {}
+    for stage, heading in STAGE_DIGESTS.items():
+        parts = []
+        for chunk, digest in zip(chunks, digests):
+            text = digest.get(heading, "")
+            if text and text.lower().strip(' .') != "none":
+                parts.append(f"[{', '.join(chunk['sections'])}]\n{text}")
+        if not parts:
+            parts.append("(the paper has no content for this part of the analysis)")
+        stage_inputs[stage] = (
+            f"=== {heading.title()} digest of the paper ({len(chunks)} parts) ===\n\n"
+            + "\n\n".join(parts)
+        )
+    return stage_inputs
+
+
+def prepare_stage_inputs(paper_text: str, llm=None, chunk_size: int = None,
+                         max_concurrency: int = None) -> dict:
+    """
+    Map-reduce the paper into the text each stage needs.
+    Returns {stage: text}; short papers get the full text for every stage.
+    """
+    chunks = split_into_chunks(paper_text, chunk_size)
+    if len(chunks) <= 1:
+        return {stage: paper_text for stage in STAGE_DIGESTS}
+
+    map_llm = llm or get_shared_llm()
+
+    def run_map():
+        workers = max(1, min(max_concurrency or MAX_CONCURRENCY, len(chunks)))
+        with span('map_reduce.map', chunks=len(chunks), workers=workers) as map_span:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                digests = list(pool.map(lambda chunk: map_chunk(map_llm, chunk), chunks))
+            map_span.set(fallbacks=sum(1 for digest in digests if digest.get('fallback')))
+        return digests
+
+    # Digests are memoized per paper, chunking, map prompt and model, so task
+    # prompts built from them stay byte-identical across reruns. A run with a
+    # fallback chunk is not stored, so the next run asks the model again.
+    model = {'model': getattr(map_llm, 'model', None), 'temperature': getattr(map_llm, 'temperature', None)}
+    digests = memoized(memo_key('digests', [chunk['text'] for chunk in chunks], MAP_PROMPT, model), run_map,
+                       keep=lambda digests: not any(digest.get('fallback') for digest in digests))
+    return reduce_digests(chunks, digests)
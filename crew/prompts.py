@@ -0,0 +1,137 @@
+import logging
+import os
+import re
+import time
+from utils.tracing import current_span, span
+
+logger = logging.getLogger(__name__)
+
+# One tiny call with the shared prefix before the concurrent stages start,
+# so they read it from the provider's prompt cache instead of each prefilling it
+PREFIX_WARMUP = os.getenv("PROMPT_PREFIX_WARMUP", "1") != "0"
+
+# Opens every stage's prompt, byte for byte: providers cache prompt prefixes,
+# so the paper text is prefilled once per paper instead of once per stage
+PAPER_PREFIX = """You are one of several analysts working on the same research paper. \
+Every analyst receives exactly this paper text; your own role and task follow after it.
+
+Research Paper Text:
+-------------------
+{paper_text}
+-------------------
+
+"""
+
+# What the task builders get instead of the paper text, which now sits in the prefix
+PAPER_REFERENCE = "(The full research paper text is at the start of this prompt, before your role.)"
+
+WARMUP_PROMPT = "Reply with the single word OK."
+
+# Placeholders CrewAI substitutes anywhere in an agent's prompt; paper text must not trigger them
+_PLACEHOLDERS = re.compile(r'\{(input|tools|tool_names|role|goal|backstory)\}')
+
+
+def shared_paper_text(stage_inputs: dict) -> str:
+    """
+    The one paper text every stage reads: the full text for short papers,
+    otherwise each distinct map-reduce digest once, in stage order (each
+    digest is headed by the part of the analysis it serves).
+    """
+    distinct = []
+    for text in stage_inputs.values():
+        if text not in distinct:
+            distinct.append(text)
+    return "\n\n".join(distinct)
+
+
+def shared_prefix(paper_text: str) -> str:
+    return PAPER_PREFIX.format(paper_text=_PLACEHOLDERS.sub(r'{ \1 }', paper_text))
+
+
+def share_paper(agents_by_stage: dict, stage_inputs: dict, extra: str = "", extra_stages=()) -> dict:
+    """
+    Put the paper text (plus `extra`, e.g. a figure note) in every agent's
+    shared prefix and return what each stage's task builder gets as its
+    paper text: PAPER_REFERENCE. When the distinct map-reduce digests joined
+    would not fit one task budget, nothing is shared: each stage gets its own
+    digest, capped on its own, with `extra` appended for extra_stages.
+    """
+    # Imported here: crew.compaction imports llm.registry, whose fake LLM imports this module
+    from crew.compaction import TASK_TOKEN_BUDGET, count_tokens, fit_to_budget
+    paper_text = shared_paper_text(stage_inputs)
+    if len(set(stage_inputs.values())) > 1 and count_tokens(paper_text) > TASK_TOKEN_BUDGET:
+        current_span().set(shared_prefix=False)
+        logger.info("Digests exceed the %d-token task budget together; no shared prompt prefix for this paper",
+                    TASK_TOKEN_BUDGET)
+        return {stage: fit_to_budget(text) + (extra if stage in extra_stages else "")
+                for stage, text in stage_inputs.items()}
+    apply_prefix(agents_by_stage.values(), shared_prefix(fit_to_budget(paper_text) + extra))
+    return dict.fromkeys(stage_inputs, PAPER_REFERENCE)
+
+
+def apply_prefix(agents, prefix: str):
+    """Put the shared prefix ahead of each agent's role prompt (system and task then follow it)"""
+    for agent in agents:
+        agent.system_template = prefix + "{{ .System }}"
+        agent.prompt_template = "{{ .Prompt }}"
+
+
+def prefix_of(agent):
+    template = getattr(agent, 'system_template', None) or ''
+    return template[:-len("{{ .System }}")] if template.endswith("{{ .System }}") else None
+
+
+def _first_llm(agent):
+    """The client an agent's calls reach first (a model cascade starts with its fast model)"""
+    return getattr(agent.llm, 'fast', agent.llm)
+
+
+def warm_prefix(agents) -> bool:
+    """Prefill the agents' shared prefix once, ahead of the stages that start together"""
+    prefix = prefix_of(agents[0]) if agents else None
+    if not PREFIX_WARMUP or len(agents) < 2 or prefix is None:
+        return False
+    if any(prefix_of(agent) != prefix for agent in agents):
+        return False
+    # Each model has its own prompt cache: warm every model that two or more stages start on
+    by_model = {}
+    for agent in agents:
+        by_model.setdefault(id(_first_llm(agent)), []).append(agent)
+    groups = [group for group in by_model.values() if len(group) > 1]
+    if not groups:
+        return False
+    with span('crew.prefix_warmup', models=len(groups)):
+        started = time.perf_counter()
+        for group in groups:
+            _first_llm(group[0]).call([{"role": "user", "content": prefix + WARMUP_PROMPT}], from_agent=group[0])
+    logger.info("Prompt prefix warmed in %.2fs", time.perf_counter() - started)
+    return True
+
+
+def prompt_cache_usage(agents_by_stage: dict) -> dict:
+    """
+    Input tokens per stage split into cached (read from the provider's
+    prompt cache) and uncached, from each agent's usage counters.
+    """
+    stages = {}
+    for stage, agent in agents_by_stage.items():
+        process = getattr(agent, '_token_process', None)
+        if process is None:
+            continue
+        usage = process.get_summary()
+        stages[stage] = {
+            'calls': usage.successful_requests,
+            'input_tokens': usage.prompt_tokens,
+            'cached_input_tokens': usage.cached_prompt_tokens,
+            'uncached_input_tokens': usage.prompt_tokens - usage.cached_prompt_tokens,
+            'output_tokens': usage.completion_tokens,
+        }
+    input_tokens = sum(stage['input_tokens'] for stage in stages.values())
+    cached = sum(stage['cached_input_tokens'] for stage in stages.values())
+    return {
+        'stages': stages,
+        'input_tokens': input_tokens,
+        'cached_input_tokens': cached,
+        'uncached_input_tokens': input_tokens - cached,
+        'cached_share': round(cached / input_tokens, 3) if input_tokens else 0.0,
+    }
@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+import threading
+from utils.analysis_cache import AnalysisCache
+
+# Bump when a change outside the task/agent definitions (e.g. output post-processing)
+# should invalidate every memoized stage
+PROMPT_VERSION = '1'
+
+STAGE_CACHE_ENABLED = os.getenv("STAGE_CACHE_ENABLED", "1") != "0"
+STAGE_CACHE_FOLDER = os.getenv(
+    "STAGE_CACHE_FOLDER",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache'))
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_stage_store() -> AnalysisCache:
+    """Per-stage output store, separate from the final-analysis cache"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = AnalysisCache(STAGE_CACHE_FOLDER,
+                                   ttl_seconds=30 * 24 * 3600,
+                                   max_entries=20000,
+                                   max_bytes=512 * 1024 * 1024,
+                                   db_name='stage_outputs.sqlite3')
+        return _store
+
+
+def memo_key(*parts) -> str:
+    """Stable sha256 over any JSON-serializable parts"""
+    blob = json.dumps([PROMPT_VERSION, *parts], sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
+
+def memoized(key: str, compute, keep=None):
+    """
+    Return the stored value for key, computing and storing it on a miss.
+    With keep, a computed value is only stored when keep(value) is true.
+    """
+    if not STAGE_CACHE_ENABLED:
+        return compute()
+    store = get_stage_store()
+    value = store.get(key)
+    if value is None:
+        value = compute()
+        if keep is None or keep(value):
+            store.put(key, value)
+    return value
+
+
+def agent_fingerprint(agent) -> dict:
+    """The parts of an agent's config that change what it produces"""
+    llm = getattr(agent, 'llm', None)
+    return {
+        'role': getattr(agent, 'role', None),
+        'goal': getattr(agent, 'goal', None),
+        'backstory': getattr(agent, 'backstory', None),
+        'max_iter': getattr(agent, 'max_iter', None),
+        'model': getattr(llm, 'model', None),
+        'temperature': getattr(llm, 'temperature', None),
+        # The shared paper prefix lives here, not in the task description
+        'system_template': getattr(agent, 'system_template', None),
+        'prompt_template': getattr(agent, 'prompt_template', None),
+    }
+
+
+def stage_keys(stages: list, tasks: list, graph: dict) -> dict:
+    """
+    Memo key per stage: the task's full prompt (template applied to this
+    paper's input), its expected output, the agent config and the keys of the
+    stages it consumes - so changing one prompt only invalidates that stage
+    and the stages downstream of it.
+    """
+    keys = {}
+    for stage, task in zip(stages, tasks):
+        keys[stage] = memo_key('stage', stage, task.description, task.expected_output,
+                               agent_fingerprint(task.agent), [keys[dep] for dep in graph[stage]])
+    return keys
+
+
+def load_stage_outputs(keys: dict) -> dict:
+    """Return {stage: raw output} for every stage that is already memoized"""
+    if not STAGE_CACHE_ENABLED:
+        return {}
+    store = get_stage_store()
+    outputs = {}
+    for stage, key in keys.items():
+        value = store.get(key)
+        if value is not None:
+            outputs[stage] = value['raw']
+    return outputs
+
+
+def save_stage_output(key: str, stage: str, raw: str):
+    if STAGE_CACHE_ENABLED:
+        get_stage_store().put(key, {'stage': stage, 'raw': raw})
+
+
+def restore_task_output(task, raw: str):
+    """Give a skipped task the memoized output so dependent tasks can use it as context"""
+    from crewai.tasks.task_output import TaskOutput
+    task.output = TaskOutput(description=task.description, expected_output=task.expected_output,
+                             raw=raw, agent=task.agent.role)
@@ -0,0 +1,176 @@
+import json
+import threading
+import time
+from utils.markdown_render import MarkdownRenderer
+
+# Finished streams stay readable this long so late clients can replay them
+STREAM_RETENTION_SECONDS = 600
+
+_lock = threading.Lock()
+_streams = {}
+# str(agent.id) -> (StageStream, stage); agents are built per crew, so IDs are per job
+_routes = {}
+_handler_installed = False
+
+
+class StageStream:
+    """
+    Live output of one analysis job: every LLM chunk an agent produces,
+    tagged with its stage, plus stage-complete and done markers. Events are
+    kept, so a client that connects late replays the stream from the start.
+    """
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self.events = []
+        self.started = time.perf_counter()
+        self.first_token = {}
+        self.finished_at = None
+        self._changed = threading.Condition()
+
+    def _emit(self, event: dict):
+        with self._changed:
+            event['t'] = round(time.perf_counter() - self.started, 3)
+            self.events.append(event)
+            self._changed.notify_all()
+
+    def token(self, stage: str, text: str, replayed: bool = False):
+        if not text:
+            return
+        if not replayed and stage not in self.first_token:
+            self.first_token[stage] = time.perf_counter() - self.started
+        self._emit({'type': 'token', 'stage': stage, 'text': text})
+
+    def restart(self, stage: str, reason: str):
+        """The stage's output so far is discarded; its answer is regenerated (e.g. escalated to a stronger model)"""
+        self._emit({'type': 'restart', 'stage': stage, 'reason': reason})
+
+    def stage_done(self, stage: str, memoized: bool = False):
+        self._emit({'type': 'stage', 'stage': stage, 'status': 'memoized' if memoized else 'done'})
+
+    def finish(self, error: str = None, **extra):
+        """Mark the stream complete (only the first call counts)"""
+        if self.finished_at is not None:
+            return
+        self._emit({'type': 'error', 'error': error} if error else {'type': 'done', **extra})
+        self.finished_at = time.time()
+
+    def ttft(self) -> dict:
+        """Seconds from stream start to the first live token, overall and per stage"""
+        stages = {stage: round(seconds, 3) for stage, seconds in self.first_token.items()}
+        return {'first_token_seconds': min(stages.values()) if stages else None, 'stages': stages}
+
+    def wait(self, cursor: int, timeout: float = 15.0):
+        """Events after cursor (blocking until there are some or timeout)"""
+        with self._changed:
+            if len(self.events) <= cursor and self.finished_at is None:
+                self._changed.wait(timeout)
+            return self.events[cursor:]
+
+
+def _on_chunk(source, event):
+    route = _routes.get(str(getattr(event, 'agent_id', None)))
+    if route:
+        stream, stage = route
+        stream.token(stage, event.chunk)
+
+
+def _install_handler():
+    """Forward CrewAI's LLM stream-chunk events (emitted in the calling thread)"""
+    global _handler_installed
+    if _handler_installed:
+        return
+    try:
+        from crewai.events import crewai_event_bus, LLMStreamChunkEvent
+    except ImportError:
+        from crewai.utilities.events import crewai_event_bus, LLMStreamChunkEvent
+    crewai_event_bus.register_handler(LLMStreamChunkEvent, _on_chunk)
+    _handler_installed = True
+
+
+def open_stream(job_id: str) -> StageStream:
+    now = time.time()
+    with _lock:
+        for old_id in [j for j, s in _streams.items()
+                       if s.finished_at and now - s.finished_at > STREAM_RETENTION_SECONDS]:
+            del _streams[old_id]
+        stream = _streams[job_id] = StageStream(job_id)
+    return stream
+
+
+def get_stream(job_id: str):
+    with _lock:
+        return _streams.get(job_id)
+
+
+def attach(stream: StageStream, agents: dict):
+    """Route the chunks of each {stage: agent} to the stream"""
+    with _lock:
+        _install_handler()
+        for stage, agent in agents.items():
+            _routes[str(agent.id)] = (stream, stage)
+
+
+def detach(agents: dict):
+    with _lock:
+        for agent in agents.values():
+            _routes.pop(str(agent.id), None)
+
+
+def restart_stage(agent, reason: str):
+    """Tell the stream an agent's stage starts over (no-op when the agent isn't streamed)"""
+    route = _routes.get(str(getattr(agent, 'id', None)))
+    if route:
+        stream, stage = route
+        stream.restart(stage, reason)
+
+
+def stream_events(stream: StageStream, html: bool = False):
+    """
+    Server-Sent Events: 'token' (with stage), 'stage', then 'done' or 'error';
+    'restart' means a stage's output so far is replaced by what follows.
+    With html=True, also 'html' events carrying each stage's output rendered
+    to safe HTML block by block as its tokens arrive.
+    """
+    renderers = {}
+    cursor = 0
+    while True:
+        events = stream.wait(cursor)
+        cursor += len(events)
+        for event in events:
+            yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+            if html:
+                fragments = _render_event(renderers, event)
+                for stage, fragment in fragments:
+                    payload = json.dumps({'stage': stage, 'html': fragment}, ensure_ascii=False)
+                    yield f"event: html\ndata: {payload}\n\n"
+            if event['type'] in ('done', 'error'):
+                return
+        if not events:
+            # Heartbeat so proxies keep the connection open
+            yield ': keep-alive\n\n'
+
+
+def _render_event(renderers: dict, event: dict) -> list:
+    """[(stage, html), ...] completed by this event; a stage's renderer is flushed when it finishes"""
+    if event['type'] == 'token':
+        renderer = renderers.get(event['stage'])
+        if renderer is None:
+            renderer = renderers[event['stage']] = MarkdownRenderer()
+        fragment = renderer.feed(event['text'])
+        return [(event['stage'], fragment)] if fragment else []
+    if event['type'] == 'restart':
+        renderers.pop(event['stage'], None)
+        return []
+    if event['type'] == 'stage':
+        finished = [event['stage']] if event['stage'] in renderers else []
+    elif event['type'] in ('done', 'error'):
+        finished = list(renderers)
+    else:
+        return []
+    fragments = []
+    for stage in finished:
+        fragment = renderers.pop(stage).close()
+        if fragment:
+            fragments.append((stage, fragment))
+    return fragments
@@ -1,31 +1,239 @@
-from dotenv import load_dotenv
-load_dotenv()
-
-from crew.crew_setup import build_crew
-from crew.crew_setup import extract_pdf_text
-JOB_DESCRIPTION = """
-We are looking for a Python developer with experience in AI, NLP,
-vector databases, and REST APIs.
-"""
-
-RESUME_TEXT = """
-Software Engineer with experience in Python, machine learning,
-and backend development.
-"""
-
-if __name__ == "__main__":
-    paper_text = extract_pdf_text("C:/Users/vyasp/OneDrive - Vantiva/Documents/Flask_learning/crewAI_research/Contribution_and_performance_of_ChatGPT.pdf")
-    crew = build_crew(paper_text)
-    result = crew.kickoff()
-
-    print("\nFINAL OUTPUT\n")
-    print(result)
-    
-    # Save to file
-    with open("output.txt", "w", encoding="utf-8") as f:
-        f.write("=" * 80 + "\n")
-        f.write("CREWAI JOB APPLICATION ASSISTANT - FINAL OUTPUT\n")
-        f.write("=" * 80 + "\n\n")
-        f.write(str(result))
-    
-    print("\n✅ Output saved to output.txt")
+"""
+Batch runner: analyze a single PDF, a directory of PDFs or a manifest.
+
+    python crew_runner.py papers/ --out results.jsonl --concurrency 4 --tpm 200000
+
+A manifest is a text file with one PDF path per line, or a .jsonl file with a
+"path" field per line. Text extraction runs in a process pool; papers then go
+through the crew with at most --concurrency papers in flight; every LLM call
+waits on the shared tokens-per-minute limiter in the batch lane. Papers
+already in the analysis cache are not rerun. Each paper becomes one JSON
+line in --out, written as soon as it finishes; rerunning into the same
+--out skips papers it already has a line for, except failed ones.
+"""
+from dotenv import load_dotenv
+load_dotenv()
+
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+from crew.crew_setup import build_crew
+from crew.dag import kickoff_crew
+from crew.compaction import compact_paper
+from llm.rate_limit import BATCH
+from llm.registry import rate_limiter
+from utils.analysis_cache import AnalysisCache
+from utils.pdf_extraction import prepare_paper
+
+JOB_DESCRIPTION = """
+We are looking for a Python developer with experience in AI, NLP,
+vector databases, and REST APIs.
+"""
+
+RESUME_TEXT = """
+Software Engineer with experience in Python, machine learning,
+and backend development.
+"""
+
+CACHE_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache')
+
+# Rough prompt size multiplier: four tasks, each sees (a digest of) the paper
+TOKENS_PER_CHAR = 0.25
+STAGE_COUNT = 4
+
+
+def collect_papers(source: str) -> list:
+    """Resolve a PDF, a directory (searched recursively) or a manifest into PDF paths"""
+    if os.path.isdir(source):
+        papers = []
+        for root, _, files in os.walk(source):
+            papers.extend(os.path.join(root, name) for name in files if name.lower().endswith('.pdf'))
+        return sorted(papers)
+    if source.lower().endswith('.pdf'):
+        return [source]
+
+    base = os.path.dirname(os.path.abspath(source))
+    papers = []
+    with open(source, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            path = json.loads(line)['path'] if line.startswith('{') else line
+            papers.append(path if os.path.isabs(path) else os.path.join(base, path))
+    return papers
+
+
+class Throughput:
+    """Running papers/min and tokens/min for the batch"""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.done = 0
+        self.tokens = 0
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+
+    def record(self, tokens: int) -> str:
+        with self.lock:
+            self.done += 1
+            self.tokens += tokens
+            minutes = max(time.monotonic() - self.started, 1e-6) / 60
+            return (f"[{self.done}/{self.total}] {self.done / minutes:.2f} papers/min, "
+                    f"{self.tokens / minutes:,.0f} tokens/min")
+
+
+def _token_count(result, paper_text: str) -> int:
+    """Tokens reported by the crew, or an estimate from the paper length"""
+    usage = getattr(result, 'token_usage', None)
+    total = getattr(usage, 'total_tokens', None)
+    if total:
+        return int(total)
+    return int(len(paper_text) * TOKENS_PER_CHAR * STAGE_COUNT)
+
+
+def analyze_paper(paper: dict, cache: AnalysisCache) -> dict:
+    """Run the crew on one extracted paper and store the analysis in the shared cache"""
+    compacted = compact_paper(paper['text'])
+    text = compacted['text']
+    started = time.perf_counter()
+    # Batch lane: uploads served by the web app go first when the quota is tight
+    run = kickoff_crew(build_crew(text), lane=BATCH)
+    result = str(run['result'])
+    cache.put(paper['key'], {
+        'result': result,
+        'visualizations': None,
+        'stage_timings': run['stage_timings'],
+        'timestamp': datetime.now().isoformat()
+    })
+    return {
+        'status': 'done',
+        'cached': False,
+        'result': result,
+        'stage_timings': run['stage_timings'],
+        'memoized_stages': run['memoized_stages'],
+        'tokens': _token_count(run['result'], text),
+        'tokens_saved': compacted['tokens_saved'],
+        'seconds': round(time.perf_counter() - started, 3),
+        'rate_wait_seconds': run['rate_limit']['throttled_seconds'],
+        'retries': run['rate_limit']['retries'],
+        'model_routing': run['model_routing'],
+    }
+
+
+def recorded_paths(out_path: str) -> set:
+    """Absolute paths that already have a non-failed record in out_path"""
+    if not os.path.exists(out_path):
+        return set()
+    paths = set()
+    with open(out_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short by an interrupted run
+                continue
+            if record.get('status') != 'failed':
+                paths.add(os.path.abspath(record['path']))
+    return paths
+
+
+def run_batch(papers: list, out_path: str, extract_workers: int, concurrency: int,
+              tokens_per_minute: int) -> dict:
+    recorded = recorded_paths(out_path)
+    if recorded:
+        pending = [path for path in papers if os.path.abspath(path) not in recorded]
+        print(f"⏭️ {len(papers) - len(pending)} papers already in {out_path}, not rerun")
+        papers = pending
+    cache = AnalysisCache(CACHE_FOLDER)
+    if tokens_per_minute:
+        # The same limiter every LLM call waits on, so the budget holds across all papers and agents
+        rate_limiter().configure(tokens_per_minute=tokens_per_minute)
+    throughput = Throughput(len(papers))
+    write_lock = threading.Lock()
+    summary = {'done': 0, 'cached': 0, 'failed': 0, 'skipped': 0}
+    scheduled = {}
+
+    with open(out_path, 'a', encoding='utf-8') as out:
+
+        def write(record: dict, tokens: int = 0):
+            with write_lock:
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                summary['cached' if record.get('cached') else record['status']] += 1
+            icon = {'done': '✅', 'skipped': '⏭️'}.get(record['status'], '❌')
+            print(f"{icon} {os.path.basename(record['path'])}  "
+                  f"{throughput.record(tokens)}")
+
+        def process(paper: dict):
+            record = {'path': paper['path'], 'key': paper['key']}
+            try:
+                record.update(analyze_paper(paper, cache))
+            except Exception as e:
+                record.update({'status': 'failed', 'error': str(e)})
+            write(record, record.get('tokens', 0))
+
+        with ProcessPoolExecutor(max_workers=extract_workers) as extract_pool, \
+                ThreadPoolExecutor(max_workers=concurrency) as crew_pool:
+            crew_futures = []
+            for future in as_completed([extract_pool.submit(prepare_paper, path) for path in papers]):
+                paper = future.result()
+                record = {'path': paper['path'], 'key': paper['key']}
+                if 'error' in paper:
+                    write({**record, 'status': 'failed', 'error': paper['error']})
+                    continue
+                if paper['key'] in scheduled:
+                    # Same bytes under another name: analyze once
+                    write({**record, 'status': 'skipped', 'duplicate_of': scheduled[paper['key']]})
+                    continue
+                scheduled[paper['key']] = paper['path']
+                cached = cache.get(paper['key'])
+                if cached is not None:
+                    write({**record, 'status': 'done', 'cached': True, 'result': cached.get('result'),
+                           'stage_timings': cached.get('stage_timings')})
+                    continue
+                crew_futures.append(crew_pool.submit(process, paper))
+            for future in crew_futures:
+                future.result()
+
+    return summary
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    parser = argparse.ArgumentParser(description="Analyze research papers with the crew, in batch.")
+    parser.add_argument('source', help="PDF file, directory of PDFs, or manifest (.txt / .jsonl)")
+    parser.add_argument('--out', default='output.jsonl', help="JSONL file to append one result per paper to")
+    parser.add_argument('--extract-workers', type=int, default=os.cpu_count() or 1,
+                        help="processes used for PDF extraction")
+    parser.add_argument('--concurrency', type=int, default=2, help="papers running through the crew at once")
+    parser.add_argument('--tpm', type=int, default=int(os.getenv('BATCH_TOKENS_PER_MINUTE', '0')),
+                        help="tokens-per-minute quota across all papers (0 = LLM_TOKENS_PER_MINUTE)")
+    args = parser.parse_args(argv)
+
+    papers = collect_papers(args.source)
+    if not papers:
+        print(f"No PDFs found in {args.source}")
+        return 1
+
+    print(f"📚 {len(papers)} papers → {args.out} "
+          f"(extract workers: {args.extract_workers}, crew concurrency: {args.concurrency}, "
+          f"tpm budget: {args.tpm or rate_limiter().tokens_per_minute or 'unlimited'})")
+    started = time.monotonic()
+    summary = run_batch(papers, args.out, args.extract_workers, args.concurrency, args.tpm)
+    minutes = (time.monotonic() - started) / 60
+    print(f"\n✅ {summary['done']} analyzed, {summary['cached']} from cache, "
+          f"{summary['skipped']} duplicates skipped, {summary['failed']} failed "
+          f"in {minutes:.1f} min")
+    return 0 if not summary['failed'] else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,167 +1,106 @@
-from crewai import Crew, Process
-from agents.math_simplifier import math_simplifier_agent
-from agents.implementation import implementation_agent
-from agents.paper_reader import paper_reader_agent
-from agents.summary import summary_agent
-from tasks.paper_reader_task import paper_reader_task
-from tasks.summary_task import summary_task
-from tasks.math_simplifier_task import math_simplifier_task
-from tasks.implementation_task import implementation_task
-from pypdf import PdfReader
-import os
-import base64
-from PIL import Image
-import io
-import re
-
-def normalize_pdf_text(text: str) -> str:
-    """Normalize PDF text for consistent extraction"""
-    if not text:
-        return ""
-    
-    # Convert to lowercase and strip
-    text = text.lower().strip()
-    
-    # Normalize unicode characters
-    import unicodedata
-    text = unicodedata.normalize('NFKD', text)
-    
-    # Remove extra whitespace
-    text = re.sub(r'\s+', ' ', text)
-    
-    # Remove page breaks and form feeds
-    text = re.sub(r'[\f\r\v\x0c]', ' ', text)
-    
-    # Standardize quotes
-    text = re.sub(r'[""''`]', '"', text)
-    
-    # Standardize dashes
-    text = re.sub(r'[–—―]', '-', text)
-    
-    return text.strip()
-
-def extract_pdf_content(pdf_path: str) -> dict:
-    """
-    Extract both text and images from PDF
-    Returns dict with 'text' and 'images' keys
-    """
-    try:
-        reader = PdfReader(pdf_path)
-        text = []
-        images = []
-        
-        # Create images folder if it doesn't exist
-        pdf_name = os.path.splitext(os.path.basename(pdf_path))[0]
-        images_dir = os.path.join(os.path.dirname(pdf_path), f"{pdf_name}_images")
-        os.makedirs(images_dir, exist_ok=True)
-
-        for page_num, page in enumerate(reader.pages):
-            # Extract text with normalization
-            page_text = page.extract_text()
-            if page_text:
-                normalized_text = normalize_pdf_text(page_text)
-                if normalized_text:  # Only add if we have meaningful text after normalization
-                    text.append(f"\n=== Page {page_num + 1} ===\n{normalized_text}")
-            
-            # Extract images
-            if '/XObject' in page.get('/Resources', {}):
-                xObject = page['/Resources']['/XObject'].get_object()
-                
-                for obj in xObject:
-                    if xObject[obj]['/Subtype'] == '/Image':
-                        try:
-                            # Get image data
-                            image_obj = xObject[obj]
-                            image_data = image_obj.get_data()
-                            
-                            # Convert to PIL Image
-                            image = Image.open(io.BytesIO(image_data))
-                            
-                            # Save image
-                            image_filename = f"page_{page_num + 1}_image_{len(images) + 1}.png"
-                            image_path = os.path.join(images_dir, image_filename)
-                            image.save(image_path)
-                            
-                            # Store image info
-                            images.append({
-                                'filename': image_filename,
-                                'path': image_path,
-                                'page': page_num + 1,
-                                'size': image.size,
-                                'description': f"Figure from page {page_num + 1}"
-                            })
-                            
-                        except Exception as img_error:
-                            print(f"Error extracting image from page {page_num + 1}: {img_error}")
-                            continue
-
-        if not text:
-            raise ValueError("No text could be extracted from the PDF.")
-
-        # Join and do final normalization
-        full_text = "\n".join(text)
-        normalized_full_text = normalize_pdf_text(full_text)
-
-        return {
-            'text': normalized_full_text,
-            'images': images,
-            'images_dir': images_dir
-        }
-        
-    except FileNotFoundError:
-        raise FileNotFoundError(f"PDF file not found at path: {pdf_path}")
-    except Exception as e:
-        raise Exception(f"Error reading PDF: {str(e)}")
-
-
-def extract_pdf_text(pdf_path: str) -> str:
-    """
-    Backward compatibility function - extracts only text
-    """
-    content = extract_pdf_content(pdf_path)
-    return content['text']
-
-def build_crew(paper_content, images_info=None) -> Crew:
-    """
-    Build crew with enhanced image support
-    paper_content: can be string (text only) or dict (text + images)
-    images_info: list of image information for visual analysis
-    """
-    
-    # Handle both old and new formats
-    if isinstance(paper_content, str):
-        paper_text = paper_content
-        visual_context = ""
-    else:
-        paper_text = paper_content.get('text', '')
-        images = paper_content.get('images', [])
-        visual_context = f"\n\n=== VISUAL CONTENT AVAILABLE ===\n"
-        if images:
-            visual_context += f"This paper contains {len(images)} figures/diagrams:\n"
-            for i, img in enumerate(images, 1):
-                visual_context += f"- Figure {i}: {img['description']} (Page {img['page']})\n"
-            visual_context += "\nPlease reference these visual elements in your analysis when relevant.\n"
-
-    # Agents
-    reader = paper_reader_agent()
-    math = math_simplifier_agent()
-    implementation = implementation_agent()
-    summary = summary_agent()
-
-    # Tasks with enhanced visual context
-    enhanced_paper_text = paper_text + visual_context
-    
-    task1 = paper_reader_task(reader, enhanced_paper_text)
-    task2 = math_simplifier_task(math, enhanced_paper_text)
-    task3 = implementation_task(implementation, enhanced_paper_text)
-    task4 = summary_task(summary, enhanced_paper_text)
-
-    return Crew(
-        agents=[reader, math, implementation, summary],
-        tasks=[task1, task2, task3, task4],
-        process=Process.sequential,
-        memory=False,  # Disable memory to save API calls
-        verbose=True
-    )
-    
-
+from crewai import Crew, Process
+from agents.math_simplifier import math_simplifier_agent
+from agents.implementation import implementation_agent
+from agents.paper_reader import paper_reader_agent
+from agents.summary import summary_agent
+from tasks.paper_reader_task import paper_reader_task
+from tasks.summary_task import summary_task
+from tasks.math_simplifier_task import math_simplifier_task
+from tasks.implementation_task import implementation_task
+from crew.dag import STAGES, apply_execution_mode
+from utils.tracing import VERBOSE
+from crew.map_reduce import prepare_stage_inputs
+from crew.compaction import compact_visual_context
+from crew.prompts import share_paper
+from utils.pdf_extraction import iter_pdf_pages, join_pages
+from utils.analysis_cache import file_content_key
+from utils.figure_store import get_figure_store
+
+def extract_pdf_content(pdf_path: str, max_workers: int = None, paper_key: str = None) -> dict:
+    """
+    Extract text and index the figures of a PDF
+    Returns dict with 'text', 'images' and 'paper_key' keys
+    max_workers: processes used for page-parallel text extraction
+    paper_key: sha256 of the PDF, if the caller already has it
+    Figures are only indexed here (page + object ID); they are decoded when
+    first requested through /image/<paper_key>/<figure_id>.
+    """
+    try:
+        # Text is extracted page-parallel and normalized once per page
+        full_text = join_pages(iter_pdf_pages(pdf_path, max_workers=max_workers))
+
+        if not full_text:
+            raise ValueError("No text could be extracted from the PDF.")
+
+        paper_key = paper_key or file_content_key(pdf_path)
+        images = get_figure_store().index_paper(pdf_path, paper_key)
+
+        return {
+            'text': full_text,
+            'images': images,
+            'paper_key': paper_key
+        }
+        
+    except FileNotFoundError:
+        raise FileNotFoundError(f"PDF file not found at path: {pdf_path}")
+    except Exception as e:
+        raise Exception(f"Error reading PDF: {str(e)}")
+
+
+def extract_pdf_text(pdf_path: str, max_workers: int = None) -> str:
+    """
+    Backward compatibility function - extracts only text
+    """
+    content = extract_pdf_content(pdf_path, max_workers=max_workers)
+    return content['text']
+
+def build_crew(paper_content, images_info=None, execution_mode=None) -> Crew:
+    """
+    Build crew with enhanced image support
+    paper_content: can be string (text only) or dict (text + images)
+    images_info: list of image information for visual analysis
+    execution_mode: 'dag' (independent stages in parallel) or 'sequential';
+                    defaults to CREW_EXECUTION_MODE
+    """
+    
+    # Handle both old and new formats
+    if isinstance(paper_content, str):
+        paper_text = paper_content
+        visual_context = ""
+    else:
+        paper_text = paper_content.get('text', '')
+        # One short figure note; the per-figure descriptions only repeated the page numbers
+        visual_context = compact_visual_context(paper_content.get('images', []))
+
+    # Agents
+    reader = paper_reader_agent()
+    math = math_simplifier_agent()
+    implementation = implementation_agent()
+    summary = summary_agent()
+
+    # Full text for short papers, the map-reduce digests for long ones
+    stage_inputs = prepare_stage_inputs(paper_text)
+
+    # Every stage's prompt opens with the same paper prefix (capped at the task
+    # budget, figure note included), so the provider's prompt cache prefills it once per
+    # paper and the tasks carry only their own instructions. Digests too long to
+    # share one budget go to their stages separately, each capped on its own.
+    agents = [reader, math, implementation, summary]
+    inputs = share_paper(dict(zip(STAGES, agents)), stage_inputs, visual_context, ('reader', 'summary'))
+
+    task1 = paper_reader_task(reader, inputs['reader'])
+    task2 = math_simplifier_task(math, inputs['math'])
+    task3 = implementation_task(implementation, inputs['implementation'])
+    task4 = summary_task(summary, inputs['summary'])
+
+    return Crew(
+        agents=agents,
+        tasks=apply_execution_mode([task1, task2, task3, task4], execution_mode),
+        # In 'dag' mode the first three tasks are async, so the sequential
+        # process runs them concurrently and waits for them before the summary
+        process=Process.sequential,
+        memory=False,  # Disable memory to save API calls
+        verbose=VERBOSE  # CREW_VERBOSE=0 leaves the console to tracing
+    )
+    
+
@@ -0,0 +1,264 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from crew.prompts import WARMUP_PROMPT
+
+try:
+    from crewai.llms.base_llm import BaseLLM
+except ImportError:
+    BaseLLM = object
+
+# Offline stand-in for the real model: fixed latency, token rate and canned answers.
+# Select it with LLM_PROVIDER=fake (benchmarks, CI, demos without credentials).
+FAKE_LATENCY_SECONDS = float(os.getenv("FAKE_LLM_LATENCY", "0.2"))
+FAKE_TOKENS_PER_SECOND = float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "200"))
+FAKE_OUTPUT_TOKENS = int(os.getenv("FAKE_LLM_OUTPUT_TOKENS", "400"))
+# Input tokens prefilled per second (0 = free); prompt-cached tokens are not prefilled
+FAKE_PREFILL_TOKENS_PER_SECOND = float(os.getenv("FAKE_LLM_PREFILL_TOKENS_PER_SECOND", "0"))
+
+# The small model's stand-in: FAKE_FAST_LLM_SPEEDUP times faster than the fake above,
+# with FAKE_FAST_LLM_FAILURE_RATE of its answers cut short (the ones a cascade escalates)
+FAKE_FAST_SPEEDUP = float(os.getenv("FAKE_FAST_LLM_SPEEDUP", "4"))
+FAKE_FAST_FAILURE_RATE = float(os.getenv("FAKE_FAST_LLM_FAILURE_RATE", "0.25"))
+# Words in a failed answer
+FAILED_ANSWER_TOKENS = 30
+
+# Prompt caching like the providers': prefixes in ~128-token blocks, from ~1024 tokens up
+PROMPT_CACHE_BLOCK_CHARS = 512
+PROMPT_CACHE_MIN_CHARS = 4096
+PROMPT_CACHE_MAX_BLOCKS = 50000
+
+# Words per streamed chunk (roughly what providers send per SSE event)
+CHUNK_WORDS = 4
+
+# Agent role keyword -> stage; map-reduce digest calls come without an agent
+ROLE_STAGES = (
+    ('Research Analyst', 'reader'),
+    ('Mathematics', 'math'),
+    ('Engineer', 'implementation'),
+    ('Explainer', 'summary'),
+    ('Synthesizer', 'summary'),
+)
+
+CANNED_RESPONSES = {
+    'reader': """## Problem
+The paper studies how large language models perform on the tasks it evaluates.
+
+## Method
+- A benchmark of prompts grouped by domain
+- Human and automatic scoring of the answers
+
+## Results
+The model is strong on **general knowledge** and weaker on domain-specific reasoning.
+""",
+    'math': """## Key equations
+The score is the mean accuracy over $N$ prompts: $acc = \\frac{1}{N}\\sum_i y_i$.
+
+## Intuition
+Each prompt counts once, so a domain with many prompts dominates the average.
+""",
+    'implementation': """## Components
+1. Prompt templates per domain
+2. An evaluation loop with retries
+
+```python
+for prompt in prompts:
+    answer = llm(prompt)
+    scores.append(grade(answer))
+```
+
+## Pitfalls
+- Rate limits and timeouts
+- Leaking evaluation data into prompts
+""",
+    'summary': """## Summary
+The paper measures where the model helps and where it fails.
+
+| Aspect | Finding |
+|--------|---------|
+| Knowledge | Strong |
+| Reasoning | Mixed |
+
+## Interview questions
+**Q:** How was accuracy measured?
+**A:** As the mean per-prompt score.
+""",
+    'digest': """### CONTRIBUTIONS
+Benchmark design, evaluated domains and headline results.
+
+### MATH
+Accuracy is the mean per-prompt score.
+
+### IMPLEMENTATION
+Prompt templates, an evaluation loop and scoring scripts.
+""",
+}
+
+
+def canned_text(template: str, tokens: int) -> str:
+    """The template repeated line by line until it has `tokens` words"""
+    if not template.split():
+        return template
+    lines = template.strip().splitlines()
+    out = []
+    words = 0
+    while words < tokens:
+        for line in lines:
+            out.append(line)
+            words += len(line.split())
+            if words >= tokens:
+                break
+    return "\n".join(out)
+
+
+class FakeLLM(BaseLLM):
+    """
+    Deterministic local LLM: waits latency_seconds (plus prefill time for
+    input tokens not in its simulated prompt cache), then "generates"
+    output_tokens at tokens_per_second and returns the canned answer for the
+    calling agent's stage. Streams the answer as LLMStreamChunkEvents when
+    stream is on, like the LiteLLM client does. With a failure_rate, that
+    share of prompts (chosen by prompt hash, so reruns agree) gets a short,
+    unstructured answer instead.
+    """
+
+    def __init__(self, latency_seconds: float = None, tokens_per_second: float = None,
+                 output_tokens: int = None, responses: dict = None, failure_rate: float = 0.0,
+                 model: str = 'fake/local'):
+        if BaseLLM is object:
+            self.model, self.temperature, self.stop = model, None, []
+        else:
+            super().__init__(model=model)
+        self.latency_seconds = FAKE_LATENCY_SECONDS if latency_seconds is None else latency_seconds
+        self.tokens_per_second = FAKE_TOKENS_PER_SECOND if tokens_per_second is None else tokens_per_second
+        self.output_tokens = FAKE_OUTPUT_TOKENS if output_tokens is None else output_tokens
+        self.prefill_tokens_per_second = FAKE_PREFILL_TOKENS_PER_SECOND
+        self.failure_rate = failure_rate
+        self.responses = {**CANNED_RESPONSES, **(responses or {})}
+        self.stream = False
+        self._lock = threading.Lock()
+        self._prompt_cache = OrderedDict()
+        self.stats = {'calls': 0, 'failed_answers': 0, 'input_tokens': 0, 'cached_input_tokens': 0,
+                      'output_tokens': 0, 'simulated_seconds': 0.0}
+
+    def _prefix_keys(self, prompt: str) -> list:
+        """Digests of the prompt's block-aligned prefixes, shortest first"""
+        digest = hashlib.sha1()
+        keys = []
+        for end in range(PROMPT_CACHE_BLOCK_CHARS, len(prompt) + 1, PROMPT_CACHE_BLOCK_CHARS):
+            digest.update(prompt[end - PROMPT_CACHE_BLOCK_CHARS:end].encode('utf-8'))
+            keys.append(digest.digest())
+        return keys
+
+    def _cached_chars(self, keys: list) -> int:
+        """Length of the longest prefix already in the prompt cache"""
+        cached = 0
+        with self._lock:
+            for key in keys:
+                if key not in self._prompt_cache:
+                    break
+                self._prompt_cache.move_to_end(key)
+                cached += PROMPT_CACHE_BLOCK_CHARS
+        return cached if cached >= PROMPT_CACHE_MIN_CHARS else 0
+
+    def _remember(self, keys: list):
+        """Cache a prompt's prefixes once it is prefilled (calls already running don't see them)"""
+        with self._lock:
+            for key in keys:
+                self._prompt_cache[key] = None
+                self._prompt_cache.move_to_end(key)
+            while len(self._prompt_cache) > PROMPT_CACHE_MAX_BLOCKS:
+                self._prompt_cache.popitem(last=False)
+
+    def _stage(self, messages, from_agent=None, from_task=None) -> str:
+        agent = from_agent or getattr(from_task, 'agent', None)
+        role = getattr(agent, 'role', '') or ''
+        for keyword, stage in ROLE_STAGES:
+            if keyword in role:
+                return stage
+        prompt = messages if isinstance(messages, str) else " ".join(m.get('content', '') for m in messages)
+        return 'digest' if '### CONTRIBUTIONS' in prompt else 'reader'
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None,
+             from_task=None, from_agent=None):
+        prompt = messages if isinstance(messages, str) else "".join(str(m.get('content', '')) for m in messages)
+        stage = self._stage(messages, from_agent, from_task)
+        failed = self.failure_rate > 0 and (
+            int(hashlib.sha1(prompt.encode('utf-8')).hexdigest()[:8], 16) / 0x100000000 < self.failure_rate)
+        # A failed answer is the first line or two of the canned one, without its sections
+        text = (" ".join(canned_text(self.responses[stage], FAILED_ANSWER_TOKENS).split()) if failed
+                else canned_text(self.responses[stage], self.output_tokens))
+        if prompt.endswith(WARMUP_PROMPT):
+            text = "OK"
+        elif from_agent is not None or from_task is not None:
+            # Agents parse the ReAct format; map-reduce digest calls read plain text
+            text = f"Thought: I now know the final answer\nFinal Answer: {text}"
+        tokens = len(text.split())
+        generation = tokens / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+        # ~4 characters per token, as in crew.compaction's fallback estimate
+        input_tokens = len(prompt) // 4
+        keys = self._prefix_keys(prompt)
+        cached_tokens = self._cached_chars(keys) // 4
+        prefill = ((input_tokens - cached_tokens) / self.prefill_tokens_per_second
+                   if self.prefill_tokens_per_second > 0 else 0.0)
+
+        time.sleep(self.latency_seconds + prefill)
+        self._remember(keys)
+        if self.stream:
+            self._stream(text, generation, from_task, from_agent)
+        else:
+            time.sleep(generation)
+        with self._lock:
+            self.stats['calls'] += 1
+            self.stats['failed_answers'] += failed
+            self.stats['input_tokens'] += input_tokens
+            self.stats['cached_input_tokens'] += cached_tokens
+            self.stats['output_tokens'] += tokens
+            self.stats['simulated_seconds'] += self.latency_seconds + prefill + generation
+        # What CrewAI's LiteLLM usage callback records for real models
+        process = getattr(from_agent, '_token_process', None)
+        if process is not None:
+            process.sum_successful_requests(1)
+            process.sum_prompt_tokens(input_tokens)
+            process.sum_cached_prompt_tokens(cached_tokens)
+            process.sum_completion_tokens(tokens)
+        return text
+
+    def _stream(self, text: str, generation: float, from_task, from_agent):
+        try:
+            from crewai.events import crewai_event_bus, LLMStreamChunkEvent
+        except ImportError:
+            from crewai.utilities.events import crewai_event_bus, LLMStreamChunkEvent
+        words = text.split(' ')
+        chunks = [" ".join(words[i:i + CHUNK_WORDS]) + " " for i in range(0, len(words), CHUNK_WORDS)]
+        pause = generation / len(chunks) if chunks else 0.0
+        for chunk in chunks:
+            time.sleep(pause)
+            crewai_event_bus.emit(self, event=LLMStreamChunkEvent(chunk=chunk, from_task=from_task,
+                                                                  from_agent=from_agent))
+
+    def supports_function_calling(self) -> bool:
+        return False
+
+    def supports_stop_words(self) -> bool:
+        return True
+
+    def get_context_window_size(self) -> int:
+        # Never trigger CrewAI's context summarization
+        return 1_000_000
+
+
+def get_fake_llm():
+    return FakeLLM()
+
+
+def get_fast_fake_llm():
+    """Offline stand-in for the small model of a cascade"""
+    llm = FakeLLM(latency_seconds=FAKE_LATENCY_SECONDS / FAKE_FAST_SPEEDUP,
+                  tokens_per_second=FAKE_TOKENS_PER_SECOND * FAKE_FAST_SPEEDUP,
+                  failure_rate=FAKE_FAST_FAILURE_RATE, model='fake/local-fast')
+    llm.prefill_tokens_per_second = FAKE_PREFILL_TOKENS_PER_SECOND * FAKE_FAST_SPEEDUP
+    return llm
@@ -0,0 +1,187 @@
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+
+# Provider quotas (0 = unlimited); LLM_TOKENS_PER_MINUTE_<PROVIDER> etc. override per provider
+DEFAULT_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+DEFAULT_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+
+# Retries on 429 / 5xx / connection errors, with exponential backoff and jitter
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "2"))
+BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "60"))
+
+# Completion tokens charged up front per call (the real count is only known afterwards)
+OUTPUT_TOKEN_ESTIMATE = int(os.getenv("LLM_OUTPUT_TOKEN_ESTIMATE", "1000"))
+
+# Lanes: a waiting interactive call is always served before a waiting batch call
+INTERACTIVE = 0
+BATCH = 1
+LANE_NAMES = {INTERACTIVE: 'interactive', BATCH: 'batch'}
+
+_RETRYABLE_ERRORS = ('RateLimitError', 'ServiceUnavailableError', 'InternalServerError',
+                     'APIConnectionError', 'Timeout', 'APITimeoutError')
+
+_lock = threading.Lock()
+# str(agent.id) -> (lane, ledger); agents are built per crew, so IDs are per run
+_routes = {}
+
+
+class RateLimiter:
+    """
+    Token buckets for a provider's tokens-per-minute and requests-per-minute
+    quotas, shared by every agent of every request.
+
+    acquire() blocks until the call fits both buckets. Waiting calls are
+    served in lane order, then arrival order, so an interactive upload
+    never queues behind a batch run. penalize() pauses everyone after a
+    429: when the provider pushes back, every caller backs off together.
+    """
+
+    def __init__(self, tokens_per_minute: int = 0, requests_per_minute: int = 0):
+        self._changed = threading.Condition()
+        self._waiting = []
+        self._arrivals = itertools.count()
+        self.blocked_until = 0.0
+        self.counters = {'throttled': 0, 'throttled_seconds': 0.0, 'penalties': 0,
+                         **{f"{name}_throttled_seconds": 0.0 for name in LANE_NAMES.values()}}
+        self.configure(tokens_per_minute, requests_per_minute)
+
+    def configure(self, tokens_per_minute: int = None, requests_per_minute: int = None):
+        """Change the quotas (buckets start full)"""
+        with self._changed:
+            if tokens_per_minute is not None:
+                self.tokens_per_minute = tokens_per_minute
+                self.tokens = float(tokens_per_minute)
+            if requests_per_minute is not None:
+                self.requests_per_minute = requests_per_minute
+                self.requests = float(requests_per_minute)
+            self.updated = time.monotonic()
+            self._changed.notify_all()
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated
+        self.updated = now
+        self.tokens = min(self.tokens_per_minute, self.tokens + elapsed * self.tokens_per_minute / 60.0)
+        self.requests = min(self.requests_per_minute, self.requests + elapsed * self.requests_per_minute / 60.0)
+
+    def _delay(self, tokens: int, now: float) -> float:
+        """Seconds until a call of `tokens` fits (0 when it fits now)"""
+        delay = max(0.0, self.blocked_until - now)
+        if self.tokens_per_minute and self.tokens < tokens:
+            delay = max(delay, (tokens - self.tokens) * 60.0 / self.tokens_per_minute)
+        if self.requests_per_minute and self.requests < 1:
+            delay = max(delay, (1 - self.requests) * 60.0 / self.requests_per_minute)
+        return delay
+
+    def acquire(self, tokens: int, lane: int = INTERACTIVE) -> float:
+        """Take one request and `tokens` tokens; returns seconds spent waiting"""
+        if not (self.tokens_per_minute or self.requests_per_minute or self.blocked_until):
+            return 0.0
+        started = time.monotonic()
+        with self._changed:
+            # A call larger than the whole bucket would never fit; let it through once the bucket is full
+            tokens = min(tokens, self.tokens_per_minute) if self.tokens_per_minute else 0
+            ticket = (lane, next(self._arrivals))
+            heapq.heappush(self._waiting, ticket)
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if self._waiting[0] == ticket:
+                    delay = self._delay(tokens, now)
+                    if delay <= 0:
+                        break
+                    self._changed.wait(delay)
+                else:
+                    self._changed.wait()
+            heapq.heappop(self._waiting)
+            self.tokens -= tokens
+            self.requests -= 1
+            waited = time.monotonic() - started
+            if waited > 0.001:
+                self.counters['throttled'] += 1
+                self.counters['throttled_seconds'] += waited
+                self.counters[f"{LANE_NAMES.get(lane, 'batch')}_throttled_seconds"] += waited
+            self._changed.notify_all()
+        return waited
+
+    def penalize(self, seconds: float):
+        """Hold every caller for `seconds` (the provider answered 429)"""
+        with self._changed:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+            self.counters['penalties'] += 1
+            self._changed.notify_all()
+
+    def stats(self) -> dict:
+        with self._changed:
+            self._refill(time.monotonic())
+            stats = dict(self.counters)
+            stats.update({
+                'tokens_per_minute': self.tokens_per_minute,
+                'requests_per_minute': self.requests_per_minute,
+                'tokens_available': int(self.tokens),
+                'waiting': len(self._waiting),
+            })
+        for field in stats:
+            if field.endswith('_seconds'):
+                stats[field] = round(stats[field], 3)
+        return stats
+
+
+def limiter_for(provider: str) -> RateLimiter:
+    """A new limiter with the provider's configured quotas"""
+    suffix = provider.upper()
+    return RateLimiter(
+        int(os.getenv(f"LLM_TOKENS_PER_MINUTE_{suffix}", DEFAULT_TOKENS_PER_MINUTE)),
+        int(os.getenv(f"LLM_REQUESTS_PER_MINUTE_{suffix}", DEFAULT_REQUESTS_PER_MINUTE)))
+
+
+def is_retryable(error: Exception) -> bool:
+    """429, 5xx and connection failures are worth retrying; bad requests and auth errors are not"""
+    status = getattr(error, 'status_code', None) or getattr(getattr(error, 'response', None), 'status_code', None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    return type(error).__name__ in _RETRYABLE_ERRORS
+
+
+def is_rate_limited(error: Exception) -> bool:
+    status = getattr(error, 'status_code', None) or getattr(getattr(error, 'response', None), 'status_code', None)
+    return status == 429 or type(error).__name__ == 'RateLimitError'
+
+
+def backoff_seconds(attempt: int, error: Exception = None) -> float:
+    """Exponential backoff with full jitter, but never shorter than the provider's Retry-After"""
+    delay = random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        retry_after = float(headers.get('retry-after') or 0)
+    except (TypeError, ValueError):
+        retry_after = 0.0
+    return max(delay, min(retry_after, BACKOFF_MAX_SECONDS))
+
+
+def assign_lane(agents, lane: int, ledger: dict = None):
+    """Run these agents' LLM calls in `lane`, adding their throttling to ledger"""
+    with _lock:
+        for agent in agents:
+            _routes[str(agent.id)] = (lane, ledger)
+
+
+def release_lane(agents):
+    with _lock:
+        for agent in agents:
+            _routes.pop(str(agent.id), None)
+
+
+def lane_of(agent) -> tuple:
+    """(lane, ledger) for an agent's calls; unassigned agents are interactive"""
+    with _lock:
+        return _routes.get(str(getattr(agent, 'id', None)), (INTERACTIVE, None))
+
+
+def new_ledger() -> dict:
+    """Per-run counters: calls, retries, 429s and seconds spent throttled or backing off"""
+    return {'calls': 0, 'retries': 0, 'rate_limited': 0, 'throttled_seconds': 0.0, 'backoff_seconds': 0.0}
@@ -0,0 +1,225 @@
+import logging
+import os
+import threading
+import time
+from functools import wraps
+from llm.fake_llm import get_fake_llm, get_fast_fake_llm
+from llm.rate_limit import (MAX_RETRIES, OUTPUT_TOKEN_ESTIMATE, limiter_for, lane_of, is_retryable,
+                            is_rate_limited, backoff_seconds)
+
+logger = logging.getLogger(__name__)
+
+
+def _gemini_llm():
+    # Imported on first use so offline runs (LLM_PROVIDER=fake) need no credentials
+    from llm.gemini_llm import get_gemini_llm
+    return get_gemini_llm()
+
+
+# Small model behind the 'fast' provider, as a LiteLLM model name (e.g. azure/gpt-4o-mini)
+FAST_MODEL = os.getenv("LLM_FAST_MODEL", "")
+
+
+def _fast_llm():
+    from crewai import LLM
+    if not FAST_MODEL:
+        raise ValueError("LLM_FAST_MODEL must name the model for the 'fast' provider")
+    return LLM(model=FAST_MODEL)
+
+
+# Client factories by provider name. Agents get theirs from llm.routing.llm_for(stage).
+PROVIDERS = {
+    'default': _gemini_llm,
+    # Small model for cascades and extraction stages (see llm/routing.py)
+    'fast': _fast_llm,
+    # Deterministic local stand-in (latency, token rate and answers set by FAKE_LLM_*)
+    'fake': get_fake_llm,
+    # Its small, faster counterpart, with a share of deficient answers to escalate
+    'fake-fast': get_fast_fake_llm,
+}
+
+# Provider behind get_shared_llm() when no provider is named
+DEFAULT_PROVIDER = os.getenv("LLM_PROVIDER", "default")
+
+# Max simultaneous LLM calls per provider (LLM_MAX_CONCURRENCY_<PROVIDER> overrides)
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+
+# Stream completions so agent tokens can be forwarded while they are generated
+STREAM_TOKENS = os.getenv("LLM_STREAMING", "1") != "0"
+
+# Keep-alive HTTP pool shared by every LiteLLM-backed client
+POOL_MAX_CONNECTIONS = int(os.getenv("LLM_POOL_MAX_CONNECTIONS", "20"))
+POOL_KEEPALIVE_SECONDS = float(os.getenv("LLM_POOL_KEEPALIVE_SECONDS", "120"))
+
+_lock = threading.Lock()
+_clients = {}
+_limits = {}
+_rate_limiters = {}
+_http_pool = None
+_metrics = {
+    'clients_built': 0,
+    'client_reuses': 0,
+    'setup_seconds': 0.0,
+    'calls': 0,
+    'in_flight': 0,
+    'limit_wait_seconds': 0.0,
+    'http_requests': 0,
+    'retries': 0,
+    'rate_limited': 0,
+    'backoff_seconds': 0.0,
+}
+
+
+def _count_request(request):
+    with _lock:
+        _metrics['http_requests'] += 1
+
+
+def _install_http_pool():
+    """Route LiteLLM's sync HTTP traffic through one keep-alive connection pool"""
+    global _http_pool
+    if _http_pool is not None:
+        return
+    try:
+        import httpx
+        import litellm
+    except ImportError:
+        return
+    _http_pool = httpx.Client(
+        limits=httpx.Limits(max_connections=POOL_MAX_CONNECTIONS,
+                            max_keepalive_connections=POOL_MAX_CONNECTIONS,
+                            keepalive_expiry=POOL_KEEPALIVE_SECONDS),
+        timeout=httpx.Timeout(600.0, connect=10.0),
+        event_hooks={'request': [_count_request]},
+    )
+    litellm.client_session = _http_pool
+
+
+def _open_connections() -> int:
+    try:
+        return len(_http_pool._transport._pool.connections)
+    except AttributeError:
+        return 0
+
+
+def _prompt_tokens(messages) -> int:
+    # Imported here: crew.compaction imports this module through crew.map_reduce
+    from crew.compaction import count_tokens
+    if isinstance(messages, str):
+        return count_tokens(messages)
+    return sum(count_tokens(str(message.get('content') or '')) for message in messages or [])
+
+
+def rate_limiter(provider: str = None):
+    """The provider's shared TPM/RPM limiter (created with the quotas from the environment)"""
+    provider = provider or DEFAULT_PROVIDER
+    with _lock:
+        limiter = _rate_limiters.get(provider)
+        if limiter is None:
+            limiter = _rate_limiters[provider] = limiter_for(provider)
+        return limiter
+
+
+def _limit_calls(llm, provider: str):
+    """
+    Wrap llm.call: wait for the provider's TPM/RPM buckets in the calling
+    agent's lane, run at most the provider's concurrency limit at once, and
+    retry 429/5xx failures with jittered exponential backoff.
+    """
+    limit = _limits[provider]
+    limiter = _rate_limiters[provider]
+    call = llm.call
+
+    @wraps(call)
+    def limited_call(*args, **kwargs):
+        lane, ledger = lane_of(kwargs.get('from_agent'))
+        messages = args[0] if args else kwargs.get('messages')
+        tokens = _prompt_tokens(messages) + OUTPUT_TOKEN_ESTIMATE
+        attempt = 0
+        while True:
+            throttled = limiter.acquire(tokens, lane)
+            waited = time.perf_counter()
+            with limit:
+                with _lock:
+                    _metrics['limit_wait_seconds'] += time.perf_counter() - waited
+                    _metrics['calls'] += 1
+                    _metrics['in_flight'] += 1
+                    if ledger is not None:
+                        ledger['calls'] += 1
+                        ledger['throttled_seconds'] += throttled
+                try:
+                    return call(*args, **kwargs)
+                except Exception as e:
+                    if attempt >= MAX_RETRIES or not is_retryable(e):
+                        raise
+                    error = e
+                finally:
+                    with _lock:
+                        _metrics['in_flight'] -= 1
+            delay = backoff_seconds(attempt, error)
+            attempt += 1
+            rate_limited = is_rate_limited(error)
+            if rate_limited:
+                # The quota is shared: everyone backs off, not just this call
+                limiter.penalize(delay)
+            with _lock:
+                _metrics['retries'] += 1
+                _metrics['rate_limited'] += rate_limited
+                _metrics['backoff_seconds'] += delay
+                if ledger is not None:
+                    ledger['retries'] += 1
+                    ledger['rate_limited'] += rate_limited
+                    ledger['backoff_seconds'] += delay
+            logger.warning("LLM call failed (%s); retry %d/%d in %.1fs", type(error).__name__, attempt, MAX_RETRIES, delay)
+            time.sleep(delay)
+
+    # object.__setattr__ also works when the LLM class is a pydantic model
+    object.__setattr__(llm, 'call', limited_call)
+    return llm
+
+
+def get_shared_llm(provider: str = None):
+    """
+    Process-wide LLM client for a provider: built once, then reused by every
+    agent of every request.
+    """
+    provider = provider or DEFAULT_PROVIDER
+    with _lock:
+        llm = _clients.get(provider)
+        if llm is not None:
+            _metrics['client_reuses'] += 1
+            return llm
+
+        started = time.perf_counter()
+        _install_http_pool()
+        max_concurrency = int(os.getenv(f"LLM_MAX_CONCURRENCY_{provider.upper()}", DEFAULT_MAX_CONCURRENCY))
+        _limits[provider] = threading.BoundedSemaphore(max_concurrency)
+        if provider not in _rate_limiters:
+            _rate_limiters[provider] = limiter_for(provider)
+        llm = _limit_calls(PROVIDERS[provider](), provider)
+        if STREAM_TOKENS and hasattr(llm, 'stream'):
+            # call() still returns the full text; chunks go out as stream events
+            object.__setattr__(llm, 'stream', True)
+        _clients[provider] = llm
+        _metrics['clients_built'] += 1
+        _metrics['setup_seconds'] += time.perf_counter() - started
+        return llm
+
+
+def llm_stats() -> dict:
+    """Client reuse, connection pool, concurrency-limit, rate-limit and retry metrics"""
+    with _lock:
+        stats = dict(_metrics)
+        providers = list(_clients)
+    open_connections = _open_connections()
+    stats.update({
+        'providers': providers,
+        'setup_seconds': round(stats['setup_seconds'], 4),
+        'limit_wait_seconds': round(stats['limit_wait_seconds'], 4),
+        'backoff_seconds': round(stats['backoff_seconds'], 3),
+        'rate_limits': {provider: limiter.stats() for provider, limiter in list(_rate_limiters.items())},
+        'open_connections': open_connections,
+        # Requests served without opening a new connection
+        'connection_reuses': max(0, stats['http_requests'] - open_connections),
+    })
+    return stats
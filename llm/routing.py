@@ -0,0 +1,182 @@
+import logging
+import os
+import threading
+import time
+from llm.registry import DEFAULT_PROVIDER, get_shared_llm
+from crew.streaming import restart_stage
+
+logger = logging.getLogger(__name__)
+
+try:
+    from crewai.llms.base_llm import BaseLLM
+except ImportError:
+    BaseLLM = object
+
+# Model tiers: a small, fast model for the extraction stages and the strong
+# model for synthesis. Both default to LLM_PROVIDER, so routing changes
+# nothing until LLM_FAST_PROVIDER names another provider (e.g. 'fast' or 'fake-fast').
+FAST_PROVIDER = os.getenv("LLM_FAST_PROVIDER", "") or DEFAULT_PROVIDER
+STRONG_PROVIDER = os.getenv("LLM_STRONG_PROVIDER", "") or DEFAULT_PROVIDER
+
+# Route per stage (LLM_ROUTE_<STAGE> overrides): 'fast', 'strong', a provider
+# name, or 'cascade' (fast model first, strong model when the answer fails check_answer)
+DEFAULT_ROUTES = {
+    'reader': 'cascade',
+    'math': 'cascade',
+    'implementation': 'cascade',
+    'summary': 'strong',
+}
+ROUTES = {stage: os.getenv(f"LLM_ROUTE_{stage.upper()}", route) for stage, route in DEFAULT_ROUTES.items()}
+
+# A fast-model answer escalates when it is shorter than this many words...
+CASCADE_MIN_WORDS = int(os.getenv("CASCADE_MIN_WORDS", "120"))
+# ...or has fewer markdown headings than its stage's task asks for sections
+MIN_HEADINGS = {'reader': 2, 'math': 1, 'implementation': 2, 'summary': 2}
+REFUSALS = ("i'm sorry", "i am sorry", "i cannot", "i can't", "as an ai")
+
+_lock = threading.Lock()
+_cascades = {}
+# str(agent.id) -> this run's counters for the agent; read once by routing_usage()
+_runs = {}
+_stages = {}
+
+
+def check_answer(stage: str, text: str):
+    """Why an answer is not good enough to keep (None when it passes)"""
+    if 'Final Answer:' not in text:
+        return 'no final answer'
+    answer = text.split('Final Answer:', 1)[1].strip()
+    if answer[:80].lower().startswith(REFUSALS):
+        return 'refusal'
+    words = len(answer.split())
+    if words < CASCADE_MIN_WORDS:
+        return f'too short ({words} words)'
+    headings = sum(1 for line in answer.splitlines() if line.lstrip().startswith('#'))
+    if headings < MIN_HEADINGS.get(stage, 0):
+        return f'{headings} headings'
+    if answer.count('```') % 2:
+        return 'unclosed code block'
+    return None
+
+
+def _new_counters() -> dict:
+    return {'calls': 0, 'escalations': 0, 'fast_seconds': 0.0, 'strong_seconds': 0.0, 'reasons': {}}
+
+
+class CascadeLLM(BaseLLM):
+    """
+    One stage's model cascade: every call goes to the fast model first and
+    is repeated on the strong model only when check_answer() rejects the
+    fast answer. A streamed stage is told to restart before the strong
+    model's tokens arrive. Escalations and seconds spent in each tier are
+    counted per agent (read by routing_usage) and per stage (routing_stats).
+    """
+
+    def __init__(self, stage: str, fast, strong):
+        # Set first: BaseLLM.__init__ assigns stop, which is forwarded to both tiers
+        self.stage = stage
+        self.fast = fast
+        self.strong = strong
+        model = f"cascade:{fast.model}>{strong.model}"
+        if BaseLLM is object:
+            self.model, self.temperature, self.stop = model, None, []
+        else:
+            super().__init__(model=model)
+
+    @property
+    def stop(self):
+        return self.fast.stop
+
+    @stop.setter
+    def stop(self, words):
+        # CrewAI's executor puts the agent's stop words on its LLM
+        self.fast.stop = words
+        self.strong.stop = words
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None,
+             from_task=None, from_agent=None):
+        kwargs = {'tools': tools, 'callbacks': callbacks, 'available_functions': available_functions,
+                  'from_task': from_task, 'from_agent': from_agent}
+        started = time.perf_counter()
+        answer = self.fast.call(messages, **kwargs)
+        fast_seconds = time.perf_counter() - started
+        # Tool calls come back as objects; only text answers are checked
+        reason = check_answer(self.stage, answer) if isinstance(answer, str) else None
+        strong_seconds = 0.0
+        if reason is not None:
+            logger.info("%s: fast model answer rejected: %s; escalating to %s", self.stage, reason, self.strong.model)
+            restart_stage(from_agent, reason)
+            started = time.perf_counter()
+            answer = self.strong.call(messages, **kwargs)
+            strong_seconds = time.perf_counter() - started
+
+        with _lock:
+            for counters in (_runs.setdefault(str(getattr(from_agent, 'id', None)), _new_counters()),
+                             _stages.setdefault(self.stage, _new_counters())):
+                counters['calls'] += 1
+                counters['fast_seconds'] += fast_seconds
+                counters['strong_seconds'] += strong_seconds
+                if reason is not None:
+                    counters['escalations'] += 1
+                    kind = reason.split(' (')[0]
+                    counters['reasons'][kind] = counters['reasons'].get(kind, 0) + 1
+        return answer
+
+    def supports_function_calling(self) -> bool:
+        return self.fast.supports_function_calling() and self.strong.supports_function_calling()
+
+    def supports_stop_words(self) -> bool:
+        return self.fast.supports_stop_words()
+
+    def get_context_window_size(self) -> int:
+        return min(self.fast.get_context_window_size(), self.strong.get_context_window_size())
+
+
+def _provider(route: str) -> str:
+    return {'fast': FAST_PROVIDER, 'strong': STRONG_PROVIDER}.get(route, route)
+
+
+def llm_for(stage: str):
+    """The LLM a stage's agent should use, following ROUTES"""
+    route = ROUTES.get(stage, 'strong')
+    if route != 'cascade':
+        return get_shared_llm(_provider(route))
+    if FAST_PROVIDER == STRONG_PROVIDER:
+        # Nothing to escalate to
+        return get_shared_llm(STRONG_PROVIDER)
+    with _lock:
+        cascade = _cascades.get(stage)
+    if cascade is None:
+        built = CascadeLLM(stage, get_shared_llm(FAST_PROVIDER), get_shared_llm(STRONG_PROVIDER))
+        with _lock:
+            cascade = _cascades.setdefault(stage, built)
+    return cascade
+
+
+def _rounded(counters: dict) -> dict:
+    return {**counters, 'reasons': dict(counters['reasons']),
+            'fast_seconds': round(counters['fast_seconds'], 3),
+            'strong_seconds': round(counters['strong_seconds'], 3)}
+
+
+def routing_usage(agents_by_stage: dict) -> dict:
+    """Each stage's route and model, with cascade escalations and tier seconds for this run"""
+    usage = {}
+    for stage, agent in agents_by_stage.items():
+        llm = getattr(agent, 'llm', None)
+        with _lock:
+            counters = _runs.pop(str(agent.id), None)
+        usage[stage] = {'route': ROUTES.get(stage, 'strong'), 'model': getattr(llm, 'model', None)}
+        if isinstance(llm, CascadeLLM):
+            usage[stage].update(_rounded(counters or _new_counters()))
+    return usage
+
+
+def routing_stats() -> dict:
+    """Routes, providers per tier and cascade counters per stage since startup"""
+    with _lock:
+        stages = {stage: _rounded(counters) for stage, counters in _stages.items()}
+    for counters in stages.values():
+        counters['escalation_rate'] = round(counters['escalations'] / counters['calls'], 3) if counters['calls'] else 0.0
+    return {'fast_provider': FAST_PROVIDER, 'strong_provider': STRONG_PROVIDER,
+            'routes': dict(ROUTES), 'cascades': stages}
@@ -0,0 +1,268 @@
+import os
+import re
+import sqlite3
+import threading
+import math
+import time
+import zlib
+from collections import deque
+import numpy as np
+from crew.map_reduce import split_into_chunks
+
+# Size of the hashed bag-of-words embeddings
+EMBEDDING_DIM = int(os.getenv("MEMORY_EMBEDDING_DIM", "512"))
+# Below this many vectors an exact scan takes a few milliseconds; above it the IVF lists are used
+IVF_MIN_VECTORS = int(os.getenv("MEMORY_IVF_MIN_VECTORS", "4096"))
+# Inverted lists scanned per query (more = better recall, slower)
+IVF_PROBES = int(os.getenv("MEMORY_IVF_PROBES", "16"))
+KMEANS_ITERATIONS = 8
+KMEANS_SAMPLE = 32768
+# Characters of paper text per section embedding
+SECTION_CHUNK_SIZE = 4000
+
+PAPER, SECTION = 0, 1
+
+WORD = re.compile(r"[a-z][a-z0-9]{2,}")
+STOPWORDS = frozenset(
+    "the and for are was were with that this from which these those have has had not but can "
+    "our their its into than then also such use used using been being between each other more "
+    "most some may all any one two both only over under after before while where when how what".split())
+
+
+def embed_text(text: str, dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """
+    Unit-length hashed bag-of-words embedding (signed feature hashing with
+    sublinear term frequency). crc32 keeps the hashes stable across processes,
+    so stored vectors stay comparable with new ones.
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    words = [w for w in WORD.findall(text.lower()) if w not in STOPWORDS]
+    if not words:
+        return vector
+    hashes = np.fromiter((zlib.crc32(w.encode()) for w in words), dtype=np.uint32, count=len(words))
+    signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+    np.add.at(vector, (hashes % dim).astype(np.intp), signs)
+    vector = np.sign(vector) * np.log1p(np.abs(vector))
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class VectorIndex:
+    """
+    Append-only approximate nearest-neighbour index (cosine similarity).
+
+    Vectors are float32 rows appended to vectors.f32 and read back through a
+    memory map, so the index opens instantly and the OS page cache is shared
+    between workers. Small indexes are scanned exactly. Once the index has
+    IVF_MIN_VECTORS vectors, it is clustered with spherical k-means into
+    about sqrt(n) inverted lists; a query then scores only the vectors in the
+    IVF_PROBES lists nearest to it. New vectors join their nearest list
+    immediately; the lists are re-clustered whenever the index doubles.
+    Row metadata lives in SQLite next to the vectors.
+    """
+
+    def __init__(self, folder: str, dim: int = EMBEDDING_DIM):
+        os.makedirs(folder, exist_ok=True)
+        self.dim = dim
+        self.vectors_path = os.path.join(folder, 'vectors.f32')
+        self.lists_path = os.path.join(folder, 'lists.i32')
+        self.centroids_path = os.path.join(folder, 'centroids.npy')
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=1000)
+        self.counters = {'queries': 0, 'inserts': 0, 'trainings': 0}
+        self._conn = sqlite3.connect(os.path.join(folder, 'index.sqlite3'),
+                                     check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS items (
+                row INTEGER PRIMARY KEY,
+                paper_id TEXT NOT NULL,
+                kind INTEGER NOT NULL,
+                label TEXT
+            )
+        """)
+        self._conn.execute('CREATE INDEX IF NOT EXISTS items_paper ON items(paper_id)')
+        self._items = self._conn.execute('SELECT paper_id, kind, label FROM items ORDER BY row').fetchall()
+        self.count = len(self._items)
+        # Drop vectors of an insert that crashed before its metadata was committed
+        for path, width in ((self.vectors_path, dim), (self.lists_path, 1)):
+            if os.path.exists(path) and os.path.getsize(path) > self.count * width * 4:
+                with open(path, 'r+b') as f:
+                    f.truncate(self.count * width * 4)
+        self._paper_ids = {}
+        self._paper_of_row = np.array([self._paper_ordinal(p) for p, _, _ in self._items], dtype=np.int32)
+        self._kind_of_row = np.array([kind for _, kind, _ in self._items], dtype=np.int8)
+        self._centroids = np.load(self.centroids_path) if os.path.exists(self.centroids_path) else None
+        self._trained_at = self.count if self._centroids is not None else 0
+        self._remap()
+
+    def _paper_ordinal(self, paper_id: str) -> int:
+        return self._paper_ids.setdefault(paper_id, len(self._paper_ids))
+
+    def _remap(self):
+        """Re-open the memory maps after the files grew"""
+        if self.count:
+            self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode='r', shape=(self.count, self.dim))
+        else:
+            self._vectors = np.zeros((0, self.dim), dtype=np.float32)
+        self._lists = None
+        self._members = {}
+        if self._centroids is not None and self.count:
+            self._lists = np.array(np.memmap(self.lists_path, dtype=np.int32, mode='r', shape=(self.count,)))
+            order = np.argsort(self._lists, kind='stable')
+            bounds = np.searchsorted(self._lists[order], np.arange(len(self._centroids) + 1))
+            self._members = {i: order[bounds[i]:bounds[i + 1]] for i in range(len(self._centroids))}
+
+    def paper_label(self, paper_id: str):
+        """Label of the paper's whole-paper row"""
+        with self._lock:
+            row = self._conn.execute('SELECT label FROM items WHERE paper_id = ? AND kind = ?',
+                                     (paper_id, PAPER)).fetchone()
+        return row[0] if row else None
+
+    def __contains__(self, paper_id: str) -> bool:
+        with self._lock:
+            return paper_id in self._paper_ids
+
+    def add(self, vectors: np.ndarray, items: list):
+        """Append vectors with their [(paper_id, kind, label), ...] metadata"""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        with self._lock:
+            first_row = self.count
+            with open(self.vectors_path, 'ab') as f:
+                f.write(vectors.tobytes())
+            if self._centroids is not None:
+                lists = np.argmax(vectors @ self._centroids.T, axis=1).astype(np.int32)
+                with open(self.lists_path, 'ab') as f:
+                    f.write(lists.tobytes())
+            self._conn.execute('BEGIN IMMEDIATE')
+            self._conn.executemany('INSERT INTO items (row, paper_id, kind, label) VALUES (?, ?, ?, ?)',
+                                   [(first_row + i, *item) for i, item in enumerate(items)])
+            self._conn.execute('COMMIT')
+            self._items.extend(items)
+            self._paper_of_row = np.concatenate(
+                [self._paper_of_row, np.array([self._paper_ordinal(p) for p, _, _ in items], dtype=np.int32)])
+            self._kind_of_row = np.concatenate(
+                [self._kind_of_row, np.array([kind for _, kind, _ in items], dtype=np.int8)])
+            self.count += len(items)
+            self.counters['inserts'] += len(items)
+            if self.count >= IVF_MIN_VECTORS and self.count >= 2 * self._trained_at:
+                self._train()
+            self._remap()
+
+    def _train(self):
+        """Spherical k-means over a sample, then assign every row to its nearest centroid"""
+        vectors = np.memmap(self.vectors_path, dtype=np.float32, mode='r', shape=(self.count, self.dim))
+        rng = np.random.default_rng(0)
+        sample = vectors[np.sort(rng.choice(self.count, min(self.count, KMEANS_SAMPLE), replace=False))]
+        n_lists = max(1, int(np.sqrt(self.count)))
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+        for _ in range(KMEANS_ITERATIONS):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # Empty clusters keep their previous centroid
+            centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+
+        lists = np.empty(self.count, dtype=np.int32)
+        for start in range(0, self.count, 8192):
+            lists[start:start + 8192] = np.argmax(vectors[start:start + 8192] @ centroids.T, axis=1)
+        tmp_path = f"{self.lists_path}.tmp"
+        lists.tofile(tmp_path)
+        os.replace(tmp_path, self.lists_path)
+        np.save(f"{self.centroids_path}.tmp.npy", centroids)
+        os.replace(f"{self.centroids_path}.tmp.npy", self.centroids_path)
+        self._centroids = centroids
+        self._trained_at = self.count
+        self.counters['trainings'] += 1
+
+    def search(self, vector: np.ndarray, k: int = 5, kind: int = None, exclude_paper: str = None) -> list:
+        """Top-k [(score, paper_id, kind, label), ...] by cosine similarity"""
+        started = time.perf_counter()
+        query = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            vectors, centroids, members = self._vectors, self._centroids, self._members
+            paper_of_row, kind_of_row, items = self._paper_of_row, self._kind_of_row, self._items
+            excluded = self._paper_ids.get(exclude_paper, -1)
+
+        if centroids is None or len(vectors) < IVF_MIN_VECTORS:
+            rows = np.arange(len(vectors))
+        else:
+            probes = np.argsort(centroids @ query)[::-1][:IVF_PROBES]
+            rows = np.sort(np.concatenate([members.get(int(p), np.empty(0, dtype=np.intp)) for p in probes]))
+        mask = np.ones(len(rows), dtype=bool)
+        if kind is not None:
+            mask &= kind_of_row[rows] == kind
+        if excluded >= 0:
+            mask &= paper_of_row[rows] != excluded
+        rows = rows[mask]
+
+        results = []
+        if len(rows):
+            scores = vectors[rows] @ query
+            top = np.argpartition(-scores, min(k, len(rows)) - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            results = [(float(scores[i]), *items[rows[i]]) for i in top]
+
+        with self._lock:
+            self.counters['queries'] += 1
+            self._latencies.append(time.perf_counter() - started)
+        return results
+
+    def stats(self) -> dict:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            stats = {
+                **self.counters,
+                'vectors': self.count,
+                'papers': len(self._paper_ids),
+                'dimensions': self.dim,
+                'ivf_lists': 0 if self._centroids is None else len(self._centroids),
+                'mode': 'exact' if self._centroids is None or self.count < IVF_MIN_VECTORS else 'ivf',
+            }
+        stats['bytes'] = sum(os.path.getsize(p) for p in (self.vectors_path, self.lists_path, self.centroids_path)
+                             if os.path.exists(p))
+        stats['query_ms_mean'] = round(1000 * sum(latencies) / len(latencies), 3) if latencies else None
+        stats['query_ms_p95'] = round(1000 * latencies[math.ceil(0.95 * len(latencies)) - 1], 3) if latencies else None
+        return stats
+
+
+class PaperMemoryIndex:
+    """Past papers and their sections in a VectorIndex, for 'related papers' lookups"""
+
+    def __init__(self, folder: str):
+        self.index = VectorIndex(folder)
+
+    def remember(self, paper_id: str, paper_text: str, title: str = None) -> bool:
+        """Index the paper and its sections once; returns False if it was already indexed"""
+        if paper_id in self.index:
+            return False
+        chunks = split_into_chunks(paper_text, SECTION_CHUNK_SIZE)
+        vectors = [embed_text(paper_text)] + [embed_text(chunk['text']) for chunk in chunks]
+        items = [(paper_id, PAPER, title)] + [(paper_id, SECTION, ", ".join(chunk['sections'])) for chunk in chunks]
+        self.index.add(np.vstack(vectors), items)
+        return True
+
+    def related_papers(self, paper_text: str, k: int = 5, exclude: str = None) -> list:
+        """
+        Past papers most similar to this one: [{'paper_id', 'title', 'score', 'section'}, ...].
+        A paper matches on its whole-paper vector or its best section.
+        """
+        hits = self.index.search(embed_text(paper_text), k=k * 8, exclude_paper=exclude)
+        best = {}
+        for score, paper_id, kind, label in hits:
+            entry = best.setdefault(paper_id, {'paper_id': paper_id, 'title': None, 'score': score, 'section': None})
+            if kind == PAPER:
+                entry['title'] = label
+            elif entry['section'] is None:
+                entry['section'] = label
+        ranked = sorted(best.values(), key=lambda entry: -entry['score'])[:k]
+        for entry in ranked:
+            entry['score'] = round(entry['score'], 4)
+            if entry['title'] is None:
+                entry['title'] = self.index.paper_label(entry['paper_id'])
+        return ranked
+
+    def stats(self) -> dict:
+        return self.index.stats()
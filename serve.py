@@ -0,0 +1,88 @@
+"""
+Production server: the Flask app on waitress, a threaded WSGI server.
+
+    python serve.py --port 8000 --drain-timeout 300
+    python serve.py --app app-VANWC5VSG3Z2
+
+Every request gets its own worker thread (--threads), so a long-lived SSE
+stream (/jobs/<id>/events, /jobs/<id>/stream) holds one thread and never
+blocks other requests. Request handlers never wait on the LLM: /upload
+queues the analysis on the app's bounded job queue (JOB_WORKERS analyses in
+flight, JOB_MAX_QUEUED waiting, then 429 with Retry-After) and returns the
+job ID. --connection-limit caps open connections, including SSE streams.
+
+On SIGINT/SIGTERM the server stops accepting connections, gives open requests
+--graceful-timeout seconds, then drains the job queue: no new jobs, and
+running ones get --drain-timeout seconds to finish. Jobs still unfinished
+stay queued in the job table and resume on the next start; the process
+exits without waiting for them.
+"""
+from dotenv import load_dotenv
+load_dotenv()
+
+import argparse
+import importlib
+import os
+import signal
+import sys
+import time
+
+from waitress.server import create_server
+from waitress.task import ThreadedTaskDispatcher
+
+
+class GracefulDispatcher(ThreadedTaskDispatcher):
+    """waitress's request threads, giving open requests graceful_timeout seconds on shutdown (not 5)"""
+
+    def __init__(self, threads: int, graceful_timeout: float):
+        super().__init__()
+        self.graceful_timeout = graceful_timeout
+        self.set_thread_count(threads)
+
+    def shutdown(self, cancel_pending=True, timeout=None):
+        return super().shutdown(cancel_pending, self.graceful_timeout if timeout is None else timeout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the paper analyzer with waitress")
+    parser.add_argument('--app', default='app', help="module holding `app` and `job_queue` (default: app)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--threads', type=int, default=32,
+                        help="request threads; each open SSE stream holds one")
+    parser.add_argument('--connection-limit', type=int, default=200,
+                        help="max open connections; more wait in the listen backlog")
+    parser.add_argument('--graceful-timeout', type=float, default=30,
+                        help="seconds open requests get to finish on shutdown")
+    parser.add_argument('--drain-timeout', type=float, default=300,
+                        help="seconds running analyses get to finish on shutdown")
+    args = parser.parse_args()
+
+    module = importlib.import_module(args.app)
+    server = create_server(module.app, host=args.host, port=args.port,
+                           connection_limit=args.connection_limit,
+                           _dispatcher=GracefulDispatcher(args.threads, args.graceful_timeout))
+    # server.run() shuts down cleanly on SystemExit, as it does on Ctrl+C
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    stats = module.job_queue.stats()
+    print(f"🚀 Serving {args.app} on http://{args.host}:{args.port} "
+          f"({args.threads} request threads, {stats['max_workers']} analysis workers, "
+          f"{stats['max_queued'] or 'unbounded'} queued)")
+    server.run()
+
+    print(f"⏳ Draining analysis jobs (up to {args.drain_timeout:.0f}s)...")
+    started = time.time()
+    unfinished = module.job_queue.drain(timeout=args.drain_timeout)
+    if not unfinished:
+        print(f"✅ Job queue drained in {time.time() - started:.1f}s")
+        return
+    print(f"⚠️ {unfinished} job(s) unfinished after {time.time() - started:.0f}s; they resume on next start")
+    sys.stdout.flush()
+    sys.stderr.flush()
+    # The job pool's threads are joined at interpreter exit, which would wait
+    # for the running analyses after all; they are re-queued from the job table
+    os._exit(0)
+
+
+if __name__ == '__main__':
+    main()
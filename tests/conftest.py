@@ -0,0 +1,13 @@
+import pytest
+
+import crew.stage_cache as stage_cache
+from utils.analysis_cache import AnalysisCache
+
+
+@pytest.fixture
+def stage_store(tmp_path, monkeypatch):
+    """A fresh, enabled stage store in tmp_path instead of the repo's cache folder"""
+    store = AnalysisCache(str(tmp_path), db_name='stage_outputs.sqlite3')
+    monkeypatch.setattr(stage_cache, 'STAGE_CACHE_ENABLED', True)
+    monkeypatch.setattr(stage_cache, '_store', store)
+    return store
@@ -0,0 +1,130 @@
+import json
+
+import pytest
+
+import utils.analysis_cache as analysis_cache
+from utils.analysis_cache import AnalysisCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time.time() for created/accessed timestamps"""
+    class Clock:
+        now = 1_000_000.0
+
+        def __call__(self):
+            return self.now
+
+        def advance(self, seconds):
+            self.now += seconds
+
+    fake = Clock()
+    monkeypatch.setattr(analysis_cache.time, 'time', fake)
+    return fake
+
+
+def entry_size(value) -> int:
+    return len(json.dumps(value, ensure_ascii=False).encode('utf-8'))
+
+
+def test_entries_expire_after_ttl(tmp_path, clock):
+    cache = AnalysisCache(str(tmp_path), ttl_seconds=60)
+    cache.put('paper', {'result': 'analysis'})
+
+    clock.advance(59)
+    assert cache.get('paper') == {'result': 'analysis'}
+    clock.advance(2)
+    assert cache.get('paper') is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_sweep_drops_expired_and_old_version_entries(tmp_path, clock):
+    cache = AnalysisCache(str(tmp_path), ttl_seconds=60)
+    cache.put('old', 'a')
+    clock.advance(30)
+    cache.put('fresh', 'b')
+    cache.put('previous-version', 'c')
+    cache._conn.execute("UPDATE entries SET version = '4.0' WHERE key = 'previous-version'")
+
+    clock.advance(40)
+    report = cache.sweep()
+    assert report['expired'] == 2 and report['evicted'] == 0
+    assert report['bytes_freed'] == entry_size('a') + entry_size('c')
+    assert cache.get('fresh') == 'b'
+
+
+def test_least_recently_used_entries_are_evicted_over_entry_budget(tmp_path, clock):
+    cache = AnalysisCache(str(tmp_path), max_entries=2)
+    cache.put('first', 1)
+    clock.advance(1)
+    cache.put('second', 2)
+    clock.advance(1)
+    # Reading 'first' makes 'second' the least recently used
+    assert cache.get('first') == 1
+    clock.advance(1)
+    cache.put('third', 3)
+
+    assert cache.get('second') is None
+    assert cache.get('first') == 1 and cache.get('third') == 3
+    assert cache.stats()['evictions'] == 1
+
+
+def test_byte_budget_evicts_until_it_holds(tmp_path, clock):
+    value = 'x' * 100
+    cache = AnalysisCache(str(tmp_path), max_bytes=2 * entry_size(value) + 10)
+    for key in ('a', 'b', 'c'):
+        cache.put(key, value)
+        clock.advance(1)
+
+    stats = cache.stats()
+    assert stats['entries'] == 2 and stats['bytes'] <= stats['max_bytes']
+    assert cache.get('a') is None
+
+
+def test_aliases_resolve_to_the_entry_and_go_with_it(tmp_path, clock):
+    cache = AnalysisCache(str(tmp_path), ttl_seconds=60)
+    cache.put('file-key', 'analysis', aliases=['text-key'])
+    cache.add_aliases('file-key', ['revision-key'])
+
+    assert cache.get('text-key') == 'analysis'
+    assert cache.get('revision-key') == 'analysis'
+
+    clock.advance(61)
+    cache.sweep()
+    assert cache._conn.execute('SELECT COUNT(*) FROM aliases').fetchone()[0] == 0
+
+
+def test_failed_write_leaves_no_partial_entry(tmp_path, monkeypatch):
+    cache = AnalysisCache(str(tmp_path))
+    cache.put('paper', 'original')
+
+    def fail():
+        raise RuntimeError('disk full')
+
+    # Fails after the entry and alias rows were written, inside the transaction
+    monkeypatch.setattr(cache, '_evict_over_budget', fail)
+    with pytest.raises(RuntimeError):
+        cache.put('paper', 'replacement', aliases=['alias'])
+
+    assert cache.get('paper') == 'original'
+    assert cache.get('alias') is None
+    assert cache.stats()['writes'] == 1
+
+
+def test_entries_survive_reopening(tmp_path):
+    AnalysisCache(str(tmp_path)).put('paper', {'result': 'analysis'}, aliases=['text-key'])
+    reopened = AnalysisCache(str(tmp_path))
+    assert reopened.get('text-key') == {'result': 'analysis'}
+
+
+def test_counters_and_hit_rate(tmp_path, clock):
+    cache = AnalysisCache(str(tmp_path), ttl_seconds=60)
+    cache.put('paper', 'analysis')
+    cache.get('paper')
+    cache.get('missing')
+    clock.advance(61)
+    cache.get('paper')
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['expired'], stats['writes']) == (1, 2, 1, 1)
+    assert stats['hit_rate'] == round(1 / 3, 3)
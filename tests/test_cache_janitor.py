@@ -0,0 +1,111 @@
+import hashlib
+import json
+import time
+from datetime import datetime, timedelta
+
+from utils.analysis_cache import AnalysisCache, legacy_file_key
+from utils.cache_janitor import CacheJanitor
+
+
+def write_legacy(folder, pdf_bytes: bytes, result, age: timedelta = timedelta(hours=1), version='3.0'):
+    """A cache file as the per-file JSON cache wrote it: cache/<md5 of the PDF>.json"""
+    path = folder / f"{hashlib.md5(pdf_bytes).hexdigest()}.json"
+    path.write_text(json.dumps({'result': result, 'timestamp': (datetime.now() - age).isoformat(),
+                                'version': version}), encoding='utf-8')
+    return path
+
+
+def test_legacy_entries_are_imported_under_their_md5_key(tmp_path):
+    cache = AnalysisCache(str(tmp_path))
+    pdf = tmp_path / 'paper.pdf'
+    pdf.write_bytes(b'%PDF-1.4 paper one')
+    text_entry = write_legacy(tmp_path, pdf.read_bytes(), "Plain analysis text")
+    full_entry = write_legacy(tmp_path, b'%PDF-1.4 paper two',
+                              {'result': 'Full analysis', 'visualizations': None, 'version': '4.0'})
+
+    janitor = CacheJanitor({'analyses': cache}, interval=0, legacy_folder=str(tmp_path), legacy_cache=cache)
+    report = janitor.run_once()
+
+    assert report['legacy_imported'] == 2 and report['legacy_pruned'] == 0
+    assert not text_entry.exists() and not full_entry.exists()
+    assert cache.get(legacy_file_key(str(pdf))) == {'result': 'Plain analysis text'}
+    assert cache.get(hashlib.md5(b'%PDF-1.4 paper two').hexdigest())['result'] == 'Full analysis'
+    # Imported once per process
+    assert janitor.run_once()['legacy_imported'] == 0
+
+
+def test_imported_entries_keep_their_age(tmp_path):
+    cache = AnalysisCache(str(tmp_path), ttl_seconds=24 * 3600)
+    write_legacy(tmp_path, b'old paper', "Stale analysis", age=timedelta(days=3))
+
+    janitor = CacheJanitor({'analyses': cache}, interval=0, legacy_folder=str(tmp_path), legacy_cache=cache)
+    janitor.run_once()
+
+    assert janitor.run_once()['caches']['analyses']['expired'] == 1
+    assert cache.get(hashlib.md5(b'old paper').hexdigest()) is None
+
+
+def test_unreadable_files_are_kept_unless_pruning(tmp_path):
+    cache = AnalysisCache(str(tmp_path))
+    broken = tmp_path / ('0' * 32 + '.json')
+    broken.write_text('{"result": ', encoding='utf-8')
+    other_version = write_legacy(tmp_path, b'interview', "Old prompt output", version='2.0')
+    unrelated = tmp_path / 'settings.json'
+    unrelated.write_text('{}', encoding='utf-8')
+
+    report = CacheJanitor({}, interval=0, legacy_folder=str(tmp_path), legacy_cache=cache).run_once()
+    assert report['legacy_imported'] == 0 and report['legacy_pruned'] == 0
+    assert broken.exists() and other_version.exists() and unrelated.exists()
+
+    report = CacheJanitor({}, interval=0, legacy_folder=str(tmp_path), legacy_cache=cache,
+                          prune_legacy=True).run_once()
+    assert report['legacy_pruned'] == 3
+    assert not broken.exists() and not other_version.exists() and not unrelated.exists()
+
+
+def test_legacy_files_are_left_alone_without_a_target_cache(tmp_path):
+    entry = write_legacy(tmp_path, b'paper', "Analysis")
+    report = CacheJanitor({}, interval=0, legacy_folder=str(tmp_path), prune_legacy=True).run_once()
+    assert report['legacy_imported'] == 0 and report['legacy_pruned'] == 0
+    assert entry.exists()
+
+
+class BrokenCache:
+    def sweep(self):
+        raise OSError('database is locked')
+
+
+def test_run_report_and_totals(tmp_path):
+    analyses = AnalysisCache(str(tmp_path), ttl_seconds=60)
+    stages = AnalysisCache(str(tmp_path), db_name='stages.sqlite3')
+    analyses.put('expired', 'x' * 100, created=time.time() - 120)
+    for key in ('a', 'b', 'c'):
+        analyses.put(key, 'y' * 10)
+    stages.put('stage', 'output')
+    # Budget lowered after the writes: only the sweep evicts
+    analyses.max_entries = 2
+
+    janitor = CacheJanitor({'analyses': analyses, 'stages': stages, 'figures': BrokenCache()}, interval=0)
+    report = janitor.run_once()
+
+    assert report['caches']['analyses']['expired'] == 1
+    assert report['caches']['analyses']['evicted'] == 1
+    assert report['caches']['analyses']['bytes_freed'] == len(json.dumps('x' * 100)) + len(json.dumps('y' * 10))
+    assert analyses.get('a') is None and analyses.get('c') is not None
+    stages_report = report['caches']['stages']
+    assert (stages_report['expired'], stages_report['evicted'], stages_report['bytes_freed']) == (0, 0, 0)
+    assert report['caches']['figures'] == {'error': 'database is locked'}
+    assert report['seconds'] >= 0
+
+    janitor.run_once()
+    stats = janitor.stats()
+    assert (stats['runs'], stats['expired'], stats['evicted'], stats['errors']) == (2, 1, 1, 2)
+    assert stats['bytes_freed'] == report['caches']['analyses']['bytes_freed']
+    assert [run['started'] for run in stats['recent_runs']] == sorted(run['started'] for run in stats['recent_runs'])
+    assert len(stats['recent_runs']) == 2 and stats['interval_seconds'] == 0
+
+
+def test_zero_interval_never_starts_the_thread(tmp_path):
+    janitor = CacheJanitor({'analyses': AnalysisCache(str(tmp_path))}, interval=0)
+    janitor.start()
+    assert janitor._thread is None
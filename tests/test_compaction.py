@@ -0,0 +1,60 @@
+import os
+
+from crew.compaction import compact_paper
+from utils.pdf_extraction import extract_normalized_text
+
+SAMPLE_PDF = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          'Contribution_and_performance_of_ChatGPT.pdf')
+
+
+def test_reference_word_in_body_text_keeps_following_pages():
+    paper = ("abstract we study coreference. the model resolves references to entities in text. "
+             "our method uses a parser. === page 2 === experiments show gains. "
+             "=== page 3 === the results hold across datasets.")
+    compacted = compact_paper(paper)
+    assert "our method uses a parser" in compacted['text']
+    assert "experiments show gains" in compacted['text']
+    assert "the results hold across datasets" in compacted['text']
+    assert all(section['action'] != 'dropped' for section in compacted['sections'])
+
+
+def test_references_heading_is_dropped():
+    paper = "5 Conclusion we conclude.\nReferences\n[1] A. Smith. Some title. 2020."
+    compacted = compact_paper(paper)
+    assert "we conclude" in compacted['text']
+    assert "A. Smith" not in compacted['text']
+
+
+def test_numbered_references_heading_is_dropped():
+    paper = "=== page 1 === results are strong. 6 References [1] A. Smith. 2020."
+    compacted = compact_paper(paper)
+    assert "results are strong" in compacted['text']
+    assert "A. Smith" not in compacted['text']
+
+
+def test_roman_numbered_references_heading_is_dropped():
+    paper = "=== page 1 === results are strong. viii. references [1] A. Smith. 2020."
+    compacted = compact_paper(paper)
+    assert "results are strong" in compacted['text']
+    assert "A. Smith" not in compacted['text']
+
+
+def test_dropped_region_runs_across_pages_until_the_next_heading():
+    paper = ("intro text.\nReferences\n[1] A. Smith. === page 9 === [2] B. Jones. 2021. "
+             "=== page 10 === Appendix proofs we keep.")
+    compacted = compact_paper(paper)
+    assert "A. Smith" not in compacted['text']
+    assert "B. Jones" not in compacted['text']
+    assert "proofs we keep" in compacted['text']
+
+
+def test_bundled_paper_loses_its_bibliography():
+    text = extract_normalized_text(SAMPLE_PDF, max_workers=1)
+    compacted = compact_paper(text)
+    assert "lund, b. d., & wang, t." in text
+    assert "lund, b. d., & wang, t." not in compacted['text']
+    assert "inclusive future" in compacted['text']
+    # "api references" in the body text (page 17) is not a heading
+    assert "usage examples, and api references. this automated documentation" in compacted['text']
+    dropped = [section['section'] for section in compacted['sections'] if section['action'] == 'dropped']
+    assert dropped == ['references', 'page 22', 'page 23', 'page 24', 'page 25']
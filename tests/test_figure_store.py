@@ -0,0 +1,57 @@
+import os
+import time
+
+from PIL import Image
+
+from utils.figure_store import FigureStore
+
+
+def image_pdf(path, color) -> str:
+    Image.new('RGB', (40, 30), color).save(path, format='PDF')
+    return str(path)
+
+
+def age(store: FigureStore, paper_key: str, seconds: float):
+    store._conn.execute('UPDATE papers SET accessed = ? WHERE paper_key = ?', (time.time() - seconds, paper_key))
+
+
+def test_sweep_expires_unused_papers_and_their_images(tmp_path):
+    store = FigureStore(str(tmp_path / 'figures'), ttl_seconds=3600)
+    old = store.index_paper(image_pdf(tmp_path / 'old.pdf', 'red'), 'old')
+    store.index_paper(image_pdf(tmp_path / 'new.pdf', 'blue'), 'new')
+    old_image = store.get('old', old[0]['figure_id'])
+    age(store, 'old', 7200)
+
+    report = store.sweep()
+    assert (report['expired'], report['evicted']) == (1, 0)
+    assert report['bytes_freed'] > 0
+    assert not os.path.exists(old_image)
+    assert os.listdir(store.papers_dir) == ['new.pdf']
+    assert store.get('old', old[0]['figure_id']) is None
+    assert store.figures('new')
+
+
+def test_sweep_keeps_images_other_papers_share(tmp_path):
+    store = FigureStore(str(tmp_path / 'figures'), ttl_seconds=3600)
+    first = store.index_paper(image_pdf(tmp_path / 'a.pdf', 'red'), 'a')
+    second = store.index_paper(image_pdf(tmp_path / 'b.pdf', 'red'), 'b')
+    shared = store.get('a', first[0]['figure_id'])
+    assert store.get('b', second[0]['figure_id']) == shared
+    age(store, 'a', 7200)
+
+    store.sweep()
+    assert os.path.exists(shared)
+
+
+def test_sweep_evicts_least_recently_used_over_budget(tmp_path):
+    pdfs = [image_pdf(tmp_path / f"{n}.pdf", color) for n, color in enumerate(('red', 'green', 'blue'))]
+    store = FigureStore(str(tmp_path / 'figures'), max_bytes=2 * max(os.path.getsize(pdf) for pdf in pdfs))
+    for n, pdf in enumerate(pdfs):
+        store.index_paper(pdf, str(n))
+        age(store, str(n), 30 - n)
+    # Viewing a figure counts as use
+    store.get('0', store.figures('0')[0]['figure_id'])
+
+    report = store.sweep()
+    assert (report['expired'], report['evicted']) == (0, 1)
+    assert sorted(os.listdir(store.papers_dir)) == ['0.pdf', '2.pdf']
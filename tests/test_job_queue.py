@@ -0,0 +1,66 @@
+import threading
+import time
+
+import pytest
+
+from utils.job_queue import DEFAULT_RETRY_AFTER, DONE, QUEUED, JobQueue, QueueClosed, QueueFull
+
+
+def wait_for(condition, timeout: float = 5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def gate():
+    gate = threading.Event()
+    yield gate
+    # Let blocked workers finish so the pool's threads exit
+    gate.set()
+
+
+def blocking_queue(tmp_path, gate, **kwargs) -> JobQueue:
+    return JobQueue(str(tmp_path / 'jobs.db'), lambda job_id, payload, report: gate.wait(5) and payload,
+                    max_workers=1, **kwargs)
+
+
+def test_admission_is_bounded(tmp_path, gate):
+    queue = blocking_queue(tmp_path, gate, max_queued=1)
+    running = queue.submit({'n': 1})
+    wait_for(lambda: queue.stats()['running'] == 1)
+    waiting = queue.submit({'n': 2})
+    assert queue.get(waiting)['queue_position'] == 0
+
+    with pytest.raises(QueueFull) as refused:
+        queue.submit({'n': 3})
+    assert (refused.value.queued, refused.value.max_queued) == (1, 1)
+    assert refused.value.retry_after == DEFAULT_RETRY_AFTER
+
+    gate.set()
+    wait_for(lambda: queue.get(waiting)['status'] == DONE)
+    assert queue.get(running)['output'] == {'n': 1}
+    assert queue.stats()['done'] == 2
+
+
+def test_drain_finishes_backlog(tmp_path, gate):
+    queue = blocking_queue(tmp_path, gate)
+    jobs = [queue.submit({'n': n}) for n in range(3)]
+    gate.set()
+    assert queue.drain(timeout=5) == 0
+    assert all(queue.get(job_id)['status'] == DONE for job_id in jobs)
+    with pytest.raises(QueueClosed):
+        queue.submit({'n': 4})
+
+
+def test_drain_timeout_leaves_jobs_to_resume(tmp_path, gate):
+    queue = blocking_queue(tmp_path, gate)
+    queue.submit({'n': 1})
+    waiting = queue.submit({'n': 2})
+    wait_for(lambda: queue.stats()['running'] == 1)
+    started = time.time()
+    assert queue.drain(timeout=0.2) == 2
+    assert time.time() - started < 2
+    assert not queue.stats()['accepting']
+    assert queue.get(waiting)['status'] == QUEUED
@@ -0,0 +1,80 @@
+from crew.map_reduce import STAGE_DIGESTS, parse_digest, prepare_stage_inputs, reduce_digests, split_into_chunks
+from llm.fake_llm import FakeLLM
+
+PAPER = " ".join(f"=== page {n} === page {n} describes step {n} of the method in detail." for n in range(1, 9))
+DIGEST = "### CONTRIBUTIONS\nA new method.\n### MATH\nnone\n### IMPLEMENTATION\nA loop."
+
+
+def digest_llm(answer: str, model: str = 'fake/local') -> FakeLLM:
+    return FakeLLM(latency_seconds=0, tokens_per_second=0, output_tokens=len(answer.split()),
+                   responses={'digest': answer}, model=model)
+
+
+def test_headings_are_recognized_however_they_are_formatted():
+    assert parse_digest(DIGEST) == {'CONTRIBUTIONS': 'A new method.', 'MATH': 'none', 'IMPLEMENTATION': 'A loop.'}
+    bold = "**Contributions:**\nA new method.\n**Math:**\nnone\n2. Implementation\nA loop."
+    assert parse_digest(bold) == parse_digest(DIGEST)
+    assert parse_digest("The paper proposes a new method.") == {}
+
+
+def test_digests_are_memoized_per_model(stage_store):
+    first = digest_llm(DIGEST)
+    prepare_stage_inputs(PAPER, llm=first, chunk_size=200)
+    calls = first.stats['calls']
+    assert calls > 1
+    prepare_stage_inputs(PAPER, llm=first, chunk_size=200)
+    assert first.stats['calls'] == calls
+
+    other_model = digest_llm(DIGEST, model='fake/other')
+    prepare_stage_inputs(PAPER, llm=other_model, chunk_size=200)
+    assert other_model.stats['calls'] == calls
+
+
+def test_digest_without_headings_falls_back_to_chunk_text_and_is_not_stored(stage_store):
+    llm = digest_llm("Here is a short summary of this part.")
+    inputs = prepare_stage_inputs(PAPER, llm=llm, chunk_size=200)
+    chunks = llm.stats['calls'] // 2
+    # Every chunk was asked twice (one retry), and its text stands in for the digest
+    assert chunks > 1
+    for stage in STAGE_DIGESTS:
+        assert "step 1 of the method" in inputs[stage]
+        assert "step 8 of the method" in inputs[stage]
+
+    prepare_stage_inputs(PAPER, llm=llm, chunk_size=200)
+    assert llm.stats['calls'] == 4 * chunks
+
+
+def test_chunks_respect_the_size_and_keep_every_word_in_order():
+    chunks = split_into_chunks(PAPER, chunk_size=200)
+    assert len(chunks) > 1
+    assert [chunk['index'] for chunk in chunks] == list(range(len(chunks)))
+    assert all(len(chunk['text']) <= 200 for chunk in chunks)
+    assert " ".join(chunk['text'] for chunk in chunks).split() == PAPER.split()
+    assert chunks[0]['sections'][0] == 'page 1'
+
+
+def test_oversized_sections_are_split_at_sentence_ends():
+    section = "1. Introduction " + " ".join(f"Sentence {n} is about the method." for n in range(40))
+    chunks = split_into_chunks(section, chunk_size=150)
+    assert all(len(chunk['text']) <= 150 for chunk in chunks)
+    assert all(chunk['text'].endswith('.') for chunk in chunks)
+    assert all(chunk['sections'] == ['1. introduction'] for chunk in chunks)
+
+
+def test_short_papers_skip_map_reduce():
+    llm = digest_llm(DIGEST)
+    assert prepare_stage_inputs(PAPER, llm=llm) == {stage: PAPER for stage in STAGE_DIGESTS}
+    assert llm.stats['calls'] == 0
+
+
+def test_reduce_joins_digests_in_paper_order_and_skips_none():
+    chunks = [{'index': 0, 'sections': ['abstract']}, {'index': 1, 'sections': ['2. method', 'page 3']}]
+    digests = [{'CONTRIBUTIONS': 'First claim.', 'MATH': 'none', 'IMPLEMENTATION': 'None.'},
+               {'CONTRIBUTIONS': 'Second claim.', 'MATH': 'x = y', 'IMPLEMENTATION': ''}]
+    inputs = reduce_digests(chunks, digests)
+
+    assert inputs['reader'] == inputs['summary']
+    assert inputs['reader'].index('[abstract]\nFirst claim.') < inputs['reader'].index('[2. method, page 3]\nSecond claim.')
+    assert 'none' not in inputs['math'] and '[2. method, page 3]\nx = y' in inputs['math']
+    assert inputs['implementation'].endswith('(the paper has no content for this part of the analysis)')
+    assert inputs['math'].startswith('=== Math digest of the paper (2 parts) ===')
@@ -0,0 +1,56 @@
+from utils.markdown_render import MarkdownRenderer, render_inline, render_markdown
+
+DOCUMENT = """## Method
+The model is **strong** on *general* tasks.
+
+- first item
+  continued
+- second item
+
+1. one
+2. two
+
+```python
+if a < b:
+    print(a)
+```
+
+| Aspect | Finding |
+|--------|---------|
+| Knowledge | Strong |
+"""
+
+
+def test_blocks():
+    html = render_markdown(DOCUMENT)
+    assert "<h2>Method</h2>" in html
+    assert "<p>The model is <strong>strong</strong> on <em>general</em> tasks.</p>" in html
+    assert "<ul>\n<li>first item<br>continued</li>\n<li>second item</li>\n</ul>" in html
+    assert "<ol>\n<li>one</li>\n<li>two</li>\n</ol>" in html
+    assert "<pre><code>if a &lt; b:\n    print(a)</code></pre>" in html
+    assert "<tr><th>Aspect</th><th>Finding</th></tr>" in html
+    assert "<tr><td>Knowledge</td><td>Strong</td></tr>" in html
+
+
+def test_streamed_chunks_render_like_the_whole_text():
+    renderer = MarkdownRenderer()
+    streamed = "".join(renderer.feed(DOCUMENT[i:i + 7]) for i in range(0, len(DOCUMENT), 7))
+    assert streamed + renderer.close() == render_markdown(DOCUMENT)
+
+
+def test_blocks_are_emitted_once_complete():
+    renderer = MarkdownRenderer()
+    assert renderer.feed("## Title\nA paragraph") == "<h2>Title</h2>\n"
+    assert renderer.feed(" that continues\n") == ""
+    assert renderer.feed("\n") == "<p>A paragraph that continues</p>\n"
+
+
+def test_text_is_escaped_and_raw_html_dropped():
+    assert render_inline("a < b & <script>alert(1)</script>") == "a &lt; b &amp; alert(1)"
+    assert render_inline("[x](javascript:alert(1))") == "[x](javascript:alert(1))"
+    assert render_inline("[paper](https://example.org/a)") == \
+        '<a href="https://example.org/a" rel="noopener nofollow">paper</a>'
+
+
+def test_leaked_css_lines_are_dropped():
+    assert render_markdown("h2 { color: red; }\nKept text") == "<p>Kept text</p>\n"
@@ -0,0 +1,35 @@
+from utils.near_duplicates import NearDuplicateIndex, estimated_similarity, minhash_signature
+
+
+def paper(topic: str, words: int = 2000) -> str:
+    return " ".join(f"{topic}{i % 997}x{i // 997}" for i in range(words))
+
+
+def test_signature_ignores_page_markers_and_numbers():
+    first, second = paper("graph", 1000), paper("graph", 2000)[len(paper("graph", 1000)):]
+    text = first + second
+    marked = "=== page 1 === " + first + " 12 === page 2 ===" + second
+    assert estimated_similarity(minhash_signature(text), minhash_signature(marked)) == 1.0
+
+
+def test_similar_texts_have_similar_signatures():
+    text = paper("graph")
+    revised = "preprint version two with a new cover page " + text
+    assert estimated_similarity(minhash_signature(text), minhash_signature(revised)) > 0.9
+    assert estimated_similarity(minhash_signature(text), minhash_signature(paper("vision"))) < 0.1
+
+
+def test_index_finds_near_duplicates_only(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path / 'near.db'))
+    original = minhash_signature(paper("graph"))
+    index.add('original', original)
+    index.add('other', minhash_signature(paper("vision")))
+
+    matches = index.find(minhash_signature("watermarked draft " + paper("graph")))
+    assert [match['key'] for match in matches] == ['original']
+    assert matches[0]['similarity'] >= 0.85
+    assert index.find(original, exclude='original') == []
+
+    index.remove('original')
+    assert index.find(original) == []
+    assert index.stats()['papers'] == 1
@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+import utils.pdf_extraction as pdf_extraction
+from utils.pdf_extraction import iter_pdf_pages, join_pages, split_page_ranges
+
+SAMPLE_PDF = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'Contribution_and_performance_of_ChatGPT.pdf')
+
+
+@pytest.fixture(scope='module')
+def sequential_pages():
+    return list(iter_pdf_pages(SAMPLE_PDF, max_workers=1))
+
+
+def test_split_page_ranges_covers_every_page_once():
+    for page_count, parts in ((25, 8), (8, 8), (3, 16), (1, 4), (100, 7)):
+        ranges = split_page_ranges(page_count, parts)
+        assert len(ranges) == min(parts, page_count)
+        assert [page for start, stop in ranges for page in range(start, stop)] == list(range(page_count))
+        sizes = [stop - start for start, stop in ranges]
+        assert max(sizes) - min(sizes) <= 1
+
+
+def test_page_parallel_extraction_matches_sequential(sequential_pages):
+    assert len(sequential_pages) >= pdf_extraction.MIN_PAGES_FOR_POOL
+    parallel_pages = list(iter_pdf_pages(SAMPLE_PDF, max_workers=2))
+
+    assert parallel_pages == sequential_pages
+    assert [page for page, _ in parallel_pages] == list(range(1, len(sequential_pages) + 1))
+    assert join_pages(parallel_pages) == join_pages(sequential_pages)
+
+
+def test_short_documents_skip_the_pool(monkeypatch):
+    def no_pool(*args, **kwargs):
+        raise AssertionError("process pool started")
+
+    monkeypatch.setattr(pdf_extraction, 'ProcessPoolExecutor', no_pool)
+    monkeypatch.setattr(pdf_extraction, 'MIN_PAGES_FOR_POOL', 1000)
+    assert len(list(iter_pdf_pages(SAMPLE_PDF, max_workers=4))) > 1
+
+
+def test_stopping_early_still_yields_leading_pages_in_order(sequential_pages):
+    pages = iter_pdf_pages(SAMPLE_PDF, max_workers=2)
+    first = [next(pages) for _ in range(3)]
+    pages.close()
+    assert first == sequential_pages[:3]
+
+
+def test_missing_file_raises():
+    with pytest.raises(FileNotFoundError):
+        list(iter_pdf_pages('does-not-exist.pdf'))
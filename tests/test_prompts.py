@@ -0,0 +1,41 @@
+from types import SimpleNamespace
+
+import crew.compaction as compaction
+from crew.prompts import PAPER_REFERENCE, prefix_of, share_paper
+
+STAGES = ['reader', 'math', 'implementation', 'summary']
+
+
+def agents():
+    return {stage: SimpleNamespace(system_template=None, prompt_template=None) for stage in STAGES}
+
+
+def digests(words: int) -> dict:
+    texts = {kind: f"### {kind}\n" + " ".join(f"{kind.lower()}{i}" for i in range(words))
+             for kind in ('CONTRIBUTIONS', 'MATH', 'IMPLEMENTATION')}
+    return {'reader': texts['CONTRIBUTIONS'], 'math': texts['MATH'],
+            'implementation': texts['IMPLEMENTATION'], 'summary': texts['CONTRIBUTIONS']}
+
+
+def test_digests_that_fit_share_one_prefix(monkeypatch):
+    monkeypatch.setattr(compaction, 'TASK_TOKEN_BUDGET', 100000)
+    by_stage = agents()
+    inputs = share_paper(by_stage, digests(200), extra="FIGURES", extra_stages=('reader',))
+    assert inputs == dict.fromkeys(STAGES, PAPER_REFERENCE)
+    prefix = prefix_of(by_stage['reader'])
+    assert all(prefix_of(agent) == prefix for agent in by_stage.values())
+    for heading in ('### CONTRIBUTIONS', '### MATH', '### IMPLEMENTATION', 'FIGURES'):
+        assert heading in prefix
+
+
+def test_digests_too_long_together_are_capped_per_stage(monkeypatch):
+    stage_inputs = digests(600)
+    budget = max(compaction.count_tokens(text) for text in stage_inputs.values()) + 10
+    monkeypatch.setattr(compaction, 'TASK_TOKEN_BUDGET', budget)
+    by_stage = agents()
+    inputs = share_paper(by_stage, stage_inputs, extra="FIGURES", extra_stages=('reader', 'summary'))
+    # Each digest fits on its own, so each stage gets its whole digest
+    assert inputs['math'] == stage_inputs['math']
+    assert inputs['implementation'] == stage_inputs['implementation']
+    assert inputs['reader'] == stage_inputs['reader'] + "FIGURES"
+    assert all(prefix_of(agent) is None for agent in by_stage.values())
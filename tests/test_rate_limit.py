@@ -0,0 +1,41 @@
+import threading
+import time
+
+from llm.rate_limit import BATCH, INTERACTIVE, RateLimiter
+
+
+def test_unlimited_never_waits():
+    limiter = RateLimiter()
+    assert limiter.acquire(10 ** 9) == 0.0
+    assert limiter.stats()['throttled'] == 0
+
+
+def test_interactive_lane_goes_before_waiting_batch_call():
+    # 100 tokens/s; the bucket starts full and is emptied at once
+    limiter = RateLimiter(tokens_per_minute=6000)
+    limiter.acquire(6000)
+    served = []
+
+    def call(lane):
+        limiter.acquire(30, lane)
+        served.append(lane)
+
+    batch = threading.Thread(target=call, args=(BATCH,))
+    batch.start()
+    time.sleep(0.05)
+    interactive = threading.Thread(target=call, args=(INTERACTIVE,))
+    interactive.start()
+    batch.join(5)
+    interactive.join(5)
+
+    assert served == [INTERACTIVE, BATCH]
+    stats = limiter.stats()
+    assert stats['throttled'] == 2
+    assert stats['batch_throttled_seconds'] > stats['interactive_throttled_seconds'] > 0
+
+
+def test_penalize_holds_every_caller():
+    limiter = RateLimiter()
+    limiter.penalize(0.2)
+    assert limiter.acquire(1) >= 0.15
+    assert limiter.stats()['penalties'] == 1
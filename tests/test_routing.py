@@ -0,0 +1,101 @@
+from types import SimpleNamespace
+
+import pytest
+
+import crew.streaming as streaming
+import llm.routing as routing
+from llm.fake_llm import FakeLLM, canned_text
+from llm.routing import CascadeLLM, check_answer
+
+SECTIONS = "## Problem\n" + "The paper studies a problem. " * 30 + "\n## Method\n" + "It proposes a method. " * 30
+PROMPT = [{'role': 'user', 'content': "Analyze the paper."}]
+
+
+@pytest.fixture(autouse=True)
+def fresh_counters(monkeypatch):
+    monkeypatch.setattr(routing, '_runs', {})
+    monkeypatch.setattr(routing, '_stages', {})
+
+
+def fake(text: str, model: str) -> FakeLLM:
+    """A fake provider answering exactly `text` with no latency"""
+    return FakeLLM(latency_seconds=0, tokens_per_second=0, output_tokens=len(text.split()),
+                   responses={'reader': text}, model=model)
+
+
+def agent(name: str = 'reader-agent'):
+    return SimpleNamespace(id=name, role='Research Analyst')
+
+
+def cascade(fast_text: str) -> CascadeLLM:
+    return CascadeLLM('reader', fake(fast_text, 'fake/fast'), fake(SECTIONS, 'fake/strong'))
+
+
+@pytest.mark.parametrize('text, reason', [
+    ("## Problem\nToo short.\n## Method\nStill short.", 'too short'),
+    ("The paper studies a problem. " * 40, '0 headings'),
+    (SECTIONS + "\n```python\nprint('never closed')", 'unclosed code block'),
+], ids=['too-short', 'no-headings', 'open-code-block'])
+def test_weak_fast_answers_escalate(text, reason):
+    llm = cascade(text)
+    answer = llm.call(PROMPT, from_agent=agent())
+    assert check_answer('reader', f"Final Answer: {text}").startswith(reason)
+    assert answer == f"Thought: I now know the final answer\nFinal Answer: {canned_text(SECTIONS, len(SECTIONS.split()))}"
+    assert llm.fast.stats['calls'] == 1
+    assert llm.strong.stats['calls'] == 1
+
+
+def test_answer_without_final_answer_escalates():
+    llm = cascade(SECTIONS)
+    # Without an agent the fake answers in plain text, not the ReAct format
+    llm.call(PROMPT)
+    assert check_answer('reader', SECTIONS) == 'no final answer'
+    assert llm.strong.stats['calls'] == 1
+    assert routing.routing_stats()['cascades']['reader']['reasons'] == {'no final answer': 1}
+
+
+def test_passing_answer_is_not_escalated():
+    llm = cascade(SECTIONS)
+    answer = llm.call(PROMPT, from_agent=agent())
+    assert check_answer('reader', answer) is None
+    assert llm.fast.stats['calls'] == 1
+    assert llm.strong.stats['calls'] == 0
+
+
+def test_counters_per_run_and_per_stage():
+    weak = cascade("## Problem\nToo short.")
+    strong_enough = cascade(SECTIONS)
+    first, second = agent('first'), agent('second')
+    weak.call(PROMPT, from_agent=first)
+    weak.call(PROMPT, from_agent=first)
+    strong_enough.call(PROMPT, from_agent=second)
+
+    usage = routing.routing_usage({'reader': SimpleNamespace(id='first', llm=weak)})
+    assert usage['reader']['calls'] == 2
+    assert usage['reader']['escalations'] == 2
+    assert usage['reader']['reasons'] == {'too short': 2}
+    assert usage['reader']['model'] == 'cascade:fake/fast>fake/strong'
+    # Read once per run
+    assert routing.routing_usage({'reader': SimpleNamespace(id='first', llm=weak)})['reader']['calls'] == 0
+
+    stats = routing.routing_stats()['cascades']['reader']
+    assert stats['calls'] == 3
+    assert stats['escalations'] == 2
+    assert stats['escalation_rate'] == round(2 / 3, 3)
+
+
+def test_escalation_restarts_the_streamed_stage(monkeypatch):
+    # The stream routes agents by ID; no CrewAI event bus is needed for restarts
+    monkeypatch.setattr(streaming, '_install_handler', lambda: None)
+    stream = streaming.open_stream('routing-test')
+    streamed = agent('streamed')
+    streaming.attach(stream, {'reader': streamed})
+    try:
+        cascade("## Problem\nToo short.").call(PROMPT, from_agent=streamed)
+        cascade(SECTIONS).call(PROMPT, from_agent=streamed)
+    finally:
+        streaming.detach({'reader': streamed})
+    restarts = [event for event in stream.events if event['type'] == 'restart']
+    assert len(restarts) == 1
+    assert restarts[0]['stage'] == 'reader'
+    assert restarts[0]['reason'].startswith('too short')
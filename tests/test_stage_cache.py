@@ -0,0 +1,50 @@
+from types import SimpleNamespace
+
+from crew.dag import DEPENDENCY_GRAPH, STAGES
+from crew.stage_cache import load_stage_outputs, save_stage_output, stage_keys
+
+
+def make_tasks(**changes):
+    """One task per stage; changes maps a stage to agent attributes to override"""
+    tasks = []
+    for stage in STAGES:
+        llm = SimpleNamespace(model='fake/local', temperature=0.1)
+        agent = SimpleNamespace(role=f"{stage} analyst", goal=f"Analyze the {stage}", backstory="Expert",
+                                max_iter=3, llm=llm, system_template=None, prompt_template=None)
+        for name, value in changes.get(stage, {}).items():
+            setattr(llm if name in ('model', 'temperature') else agent, name, value)
+        tasks.append(SimpleNamespace(description=f"{stage} task for the paper", expected_output="Markdown",
+                                     agent=agent))
+    return tasks
+
+
+def changed_stages(before: dict, after: dict) -> set:
+    return {stage for stage in before if before[stage] != after[stage]}
+
+
+def test_keys_are_stable_for_the_same_agents():
+    assert stage_keys(STAGES, make_tasks(), DEPENDENCY_GRAPH) == stage_keys(STAGES, make_tasks(), DEPENDENCY_GRAPH)
+
+
+def test_changing_an_agent_invalidates_its_stage_and_downstream_only():
+    base = stage_keys(STAGES, make_tasks(), DEPENDENCY_GRAPH)
+    for change in ({'goal': 'Explain every equation'}, {'model': 'fake/larger'}, {'temperature': 0.7},
+                   {'system_template': 'Paper: ...'}):
+        keys = stage_keys(STAGES, make_tasks(math=change), DEPENDENCY_GRAPH)
+        assert changed_stages(base, keys) == {'math', 'summary'}, change
+
+
+def test_changing_the_final_stage_keeps_upstream_outputs():
+    base = stage_keys(STAGES, make_tasks(), DEPENDENCY_GRAPH)
+    keys = stage_keys(STAGES, make_tasks(summary={'role': 'Editor'}), DEPENDENCY_GRAPH)
+    assert changed_stages(base, keys) == {'summary'}
+
+
+def test_only_unchanged_stages_are_loaded_after_an_agent_change(stage_store):
+    keys = stage_keys(STAGES, make_tasks(), DEPENDENCY_GRAPH)
+    for stage, key in keys.items():
+        save_stage_output(key, stage, f"{stage} output")
+
+    assert load_stage_outputs(keys) == {stage: f"{stage} output" for stage in STAGES}
+    changed = stage_keys(STAGES, make_tasks(reader={'backstory': 'Reviewer'}), DEPENDENCY_GRAPH)
+    assert load_stage_outputs(changed) == {'math': 'math output', 'implementation': 'implementation output'}
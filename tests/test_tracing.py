@@ -0,0 +1,113 @@
+import json
+import threading
+import uuid
+
+import pytest
+
+import utils.tracing as tracing
+from utils.tracing import current_span, metrics, prometheus_metrics, record_span, span, traced
+
+
+@pytest.fixture
+def export_path(tmp_path, monkeypatch):
+    path = tmp_path / 'traces.jsonl'
+    monkeypatch.setattr(tracing, 'TRACE_EXPORT_PATH', str(path))
+    return path
+
+
+def exported_traces(path) -> list:
+    return [json.loads(line)['resourceSpans'][0]['scopeSpans'][0]['spans']
+            for line in path.read_text(encoding='utf-8').splitlines()]
+
+
+def unique(name: str) -> str:
+    """Span names are process-wide histogram keys: keep each test's own"""
+    return f"{name}.{uuid.uuid4().hex[:8]}"
+
+
+def test_finished_trace_is_exported_as_one_otlp_line(export_path):
+    root, child, measured = unique('job'), unique('extract'), unique('extract.page')
+    with span(root, job_id='j1') as job:
+        with span(child) as extract:
+            extract.set(bytes=1200, cached=False)
+            record_span(measured, 0.25, page=3)
+        assert current_span() is job
+        assert not export_path.exists()
+
+    [spans] = exported_traces(export_path)
+    by_name = {s['name']: s for s in spans}
+    assert set(by_name) == {root, child, measured}
+    assert {s['traceId'] for s in spans} == {job.trace_id}
+    assert 'parentSpanId' not in by_name[root]
+    assert by_name[child]['parentSpanId'] == by_name[root]['spanId']
+    assert by_name[measured]['parentSpanId'] == by_name[child]['spanId']
+    assert {a['key']: a['value'] for a in by_name[child]['attributes']} == {
+        'bytes': {'intValue': '1200'}, 'cached': {'boolValue': False}}
+    page = by_name[measured]
+    assert int(page['endTimeUnixNano']) - int(page['startTimeUnixNano']) == 250_000_000
+
+
+def test_errors_are_recorded_and_reraised(export_path):
+    name = unique('crew.kickoff')
+    with pytest.raises(ValueError):
+        with span(name):
+            raise ValueError('rate limited')
+
+    [[exported]] = exported_traces(export_path)
+    assert exported['status'] == {'code': 2, 'message': 'ValueError: rate limited'}
+    assert metrics()[name]['errors'] == 1
+
+
+def test_concurrent_traces_are_exported_separately(export_path):
+    name = unique('job')
+
+    def run(job_id):
+        with span(name, job_id=job_id):
+            with span(f"{name}.child"):
+                pass
+
+    threads = [threading.Thread(target=run, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    traces = exported_traces(export_path)
+    assert len(traces) == 4
+    assert all(len({s['traceId'] for s in spans}) == 1 and len(spans) == 2 for spans in traces)
+
+
+def test_histogram_buckets_are_cumulative():
+    name = unique('cache.lookup')
+    for seconds in (0.001, 0.02, 0.02, 3.0):
+        record_span(name, seconds)
+
+    histogram = metrics()[name]
+    assert histogram['count'] == 4
+    assert histogram['sum_seconds'] == pytest.approx(3.041)
+    assert histogram['buckets']['0.005'] == 1
+    assert histogram['buckets']['0.025'] == 3
+    assert histogram['buckets']['2.5'] == 3
+    assert histogram['buckets']['+Inf'] == 4
+
+    exposition = prometheus_metrics()
+    assert f'span_duration_seconds_bucket{{span="{name}",le="0.025"}} 3' in exposition
+    assert f'span_duration_seconds_count{{span="{name}"}} 4' in exposition
+
+
+def test_traced_decorator_and_disabled_tracing(monkeypatch):
+    name = unique('decorated')
+
+    @traced(name)
+    def work():
+        return current_span().name
+
+    assert work() == name
+
+    monkeypatch.setattr(tracing, 'TRACING_ENABLED', False)
+    disabled = unique('disabled')
+    with span(disabled) as noop:
+        noop.set(ignored=True)
+    record_span(disabled, 1.0)
+    assert current_span() is tracing.NOOP_SPAN
+    assert disabled not in metrics()
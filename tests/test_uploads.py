@@ -0,0 +1,49 @@
+import hashlib
+import io
+import os
+
+from flask import Flask, jsonify, request
+
+from utils.analysis_cache import file_content_key
+from utils.uploads import HashingRequest, HashingSpool
+
+PDF_BYTES = b'%PDF-1.4\n' + os.urandom(300_000) + b'\n%%EOF\n'
+
+
+def test_spool_digest_is_the_sha256_of_the_bytes(tmp_path):
+    spool = HashingSpool(str(tmp_path))
+    for start in range(0, len(PDF_BYTES), 65536):
+        spool.write(PDF_BYTES[start:start + 65536])
+
+    target = str(tmp_path / 'paper.pdf')
+    digest = spool.claim(target)
+    spool.close()
+
+    assert digest == hashlib.sha256(PDF_BYTES).hexdigest() == file_content_key(target)
+    assert spool.size == len(PDF_BYTES)
+    assert os.listdir(tmp_path) == ['paper.pdf']
+
+
+def test_unclaimed_spool_removes_its_file(tmp_path):
+    spool = HashingSpool(str(tmp_path))
+    spool.write(b'partial upload')
+    spool.close()
+    assert os.listdir(tmp_path) == []
+
+
+def test_uploaded_file_is_hashed_while_received(tmp_path):
+    app = Flask(__name__)
+    app.request_class = HashingRequest
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+
+    @app.route('/upload', methods=['POST'])
+    def upload():
+        path = os.path.join(str(tmp_path), 'saved.pdf')
+        return jsonify(key=request.files['file'].stream.claim(path))
+
+    response = app.test_client().post('/upload', data={'file': (io.BytesIO(PDF_BYTES), 'paper.pdf')},
+                                      content_type='multipart/form-data')
+
+    saved = str(tmp_path / 'saved.pdf')
+    assert response.get_json()['key'] == file_content_key(saved) == hashlib.sha256(PDF_BYTES).hexdigest()
+    assert os.listdir(tmp_path) == ['saved.pdf']
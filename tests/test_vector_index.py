@@ -0,0 +1,119 @@
+import os
+
+import numpy as np
+import pytest
+
+import memory.vector_index as vector_index
+from memory.vector_index import PAPER, SECTION, PaperMemoryIndex, VectorIndex, embed_text
+
+DIM = 32
+
+
+def random_unit_vectors(count: int, seed: int = 0) -> np.ndarray:
+    vectors = np.random.default_rng(seed).standard_normal((count, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def exact_top_k(vectors: np.ndarray, query: np.ndarray, k: int) -> list:
+    return [f"p{row}" for row in np.argsort(-(vectors @ query), kind='stable')[:k]]
+
+
+def fill(index: VectorIndex, vectors: np.ndarray, first_row: int = 0):
+    rows = range(first_row, first_row + len(vectors))
+    index.add(vectors, [(f"p{row}", PAPER, f"paper {row}") for row in rows])
+
+
+def paper(topic: str) -> str:
+    return " ".join(f"=== page {n} === {topic} methods section {n}: the {topic} model is trained "
+                    f"on {topic} data and evaluated against {topic} baselines." for n in range(1, 6))
+
+
+def test_exact_search_returns_the_true_top_k(tmp_path):
+    vectors = random_unit_vectors(200)
+    index = VectorIndex(str(tmp_path), dim=DIM)
+    fill(index, vectors)
+
+    for query in random_unit_vectors(10, seed=1):
+        results = index.search(query, k=5)
+        assert [paper_id for _, paper_id, _, _ in results] == exact_top_k(vectors, query, 5)
+        scores = [score for score, _, _, _ in results]
+        assert scores == sorted(scores, reverse=True)
+    assert index.stats()['mode'] == 'exact'
+
+
+def test_kind_and_exclude_filters(tmp_path):
+    index = VectorIndex(str(tmp_path), dim=DIM)
+    vectors = random_unit_vectors(3)
+    index.add(vectors, [('a', PAPER, 'A'), ('a', SECTION, 'intro'), ('b', SECTION, 'method')])
+
+    assert {paper_id for _, paper_id, _, _ in index.search(vectors[0], k=5, kind=SECTION)} == {'a', 'b'}
+    assert [label for _, _, _, label in index.search(vectors[0], k=5, exclude_paper='a')] == ['method']
+    assert index.search(vectors[0], k=5, kind=PAPER, exclude_paper='a') == []
+
+
+def test_ivf_lists_find_the_same_neighbours_when_every_list_is_probed(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_index, 'IVF_MIN_VECTORS', 100)
+    monkeypatch.setattr(vector_index, 'IVF_PROBES', 1000)
+    vectors = random_unit_vectors(400)
+    index = VectorIndex(str(tmp_path), dim=DIM)
+    fill(index, vectors[:250])
+    # Below twice the trained size: these join their nearest lists without re-clustering
+    fill(index, vectors[250:], first_row=250)
+
+    stats = index.stats()
+    assert stats['mode'] == 'ivf' and stats['ivf_lists'] > 1 and stats['trainings'] == 1
+    for query in random_unit_vectors(10, seed=2):
+        assert [paper_id for _, paper_id, _, _ in index.search(query, k=5)] == exact_top_k(vectors, query, 5)
+
+
+def test_index_is_unchanged_after_reopening(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_index, 'IVF_MIN_VECTORS', 100)
+    vectors = random_unit_vectors(300)
+    index = VectorIndex(str(tmp_path), dim=DIM)
+    fill(index, vectors)
+    queries = random_unit_vectors(5, seed=3)
+    before = [index.search(query, k=5) for query in queries]
+
+    reopened = VectorIndex(str(tmp_path), dim=DIM)
+    assert reopened.count == 300 and reopened.stats()['ivf_lists'] == index.stats()['ivf_lists']
+    assert [reopened.search(query, k=5) for query in queries] == before
+    assert 'p299' in reopened and reopened.paper_label('p7') == 'paper 7'
+
+
+def test_vectors_without_metadata_are_dropped_on_reopen(tmp_path):
+    vectors = random_unit_vectors(10)
+    fill(VectorIndex(str(tmp_path), dim=DIM), vectors)
+    # An insert that crashed after writing its vectors but before committing their rows
+    with open(os.path.join(str(tmp_path), 'vectors.f32'), 'ab') as f:
+        f.write(random_unit_vectors(3, seed=4).tobytes())
+
+    reopened = VectorIndex(str(tmp_path), dim=DIM)
+    assert reopened.count == 10
+    assert os.path.getsize(reopened.vectors_path) == 10 * DIM * 4
+    new = random_unit_vectors(1, seed=5)
+    reopened.add(new, [('new', PAPER, 'new paper')])
+    assert reopened.search(new[0], k=1)[0][1] == 'new'
+
+
+def test_related_papers_rank_the_similar_paper_first(tmp_path):
+    memory = PaperMemoryIndex(str(tmp_path))
+    assert memory.remember('graphs', paper('graph'), title='Graph networks')
+    assert memory.remember('vision', paper('vision'), title='Vision transformers')
+    assert not memory.remember('graphs', paper('graph'))
+
+    related = memory.related_papers(paper('graph') + " with graph attention", k=2)
+    assert [entry['paper_id'] for entry in related] == ['graphs', 'vision']
+    assert related[0]['title'] == 'Graph networks'
+    assert related[0]['score'] > related[1]['score']
+    assert [entry['paper_id'] for entry in memory.related_papers(paper('graph'), exclude='graphs')] == ['vision']
+
+    reopened = PaperMemoryIndex(str(tmp_path))
+    assert reopened.related_papers(paper('graph'), k=1)[0]['paper_id'] == 'graphs'
+
+
+def test_embeddings_are_unit_length_and_ignore_stopwords():
+    vector = embed_text("The transformer model and the attention layers")
+    assert vector.shape == (vector_index.EMBEDDING_DIM,)
+    assert float(np.linalg.norm(vector)) == pytest.approx(1.0, abs=1e-5)
+    assert np.array_equal(vector, embed_text("transformer model attention layers"))
+    assert not embed_text("the and for").any()
@@ -0,0 +1,204 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Bump to invalidate every cached analysis (replaces the old per-file 'version' check)
+CACHE_VERSION = '5.0'
+
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 500
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def content_key(data: bytes) -> str:
+    """Strict content-address for a blob: sha256 of the exact bytes"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_content_key(filepath: str) -> str:
+    """sha256 of a file's bytes, read in blocks"""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def legacy_file_key(filepath: str) -> str:
+    """md5 of a file's bytes: the key of the per-file JSON cache this index replaced"""
+    digest = hashlib.md5()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class AnalysisCache:
+    """
+    Content-addressed analysis cache backed by a single SQLite index.
+
+    Entries are keyed by the sha256 of the uploaded PDF. Secondary keys
+    (e.g. a hash of the normalized text) can be registered as aliases that
+    resolve to the same entry. Lookups are primary-key reads; writes are
+    single transactions, so a crash never leaves a half-written entry.
+    Entries expire after ttl_seconds and the least recently used ones are
+    evicted when the entry or byte budget is exceeded; sweep() applies both
+    across the whole index (see utils/cache_janitor.py).
+    """
+
+    def __init__(self, cache_folder: str, ttl_seconds: int = DEFAULT_TTL_SECONDS,
+                 max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES,
+                 db_name: str = 'analysis_cache.sqlite3'):
+        os.makedirs(cache_folder, exist_ok=True)
+        self.db_path = os.path.join(cache_folder, db_name)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.counters = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0, 'writes': 0}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                version TEXT NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed);
+            CREATE INDEX IF NOT EXISTS entries_created ON entries(created);
+            CREATE TABLE IF NOT EXISTS aliases (
+                alias TEXT PRIMARY KEY,
+                key TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS aliases_key ON aliases(key);
+        """)
+
+    def _resolve(self, key: str) -> str:
+        row = self._conn.execute('SELECT key FROM aliases WHERE alias = ?', (key,)).fetchone()
+        return row[0] if row else key
+
+    def _delete(self, keys: list):
+        self._conn.executemany('DELETE FROM entries WHERE key = ?', [(k,) for k in keys])
+        self._conn.executemany('DELETE FROM aliases WHERE key = ?', [(k,) for k in keys])
+
+    def get(self, key: str):
+        """Return the cached payload for key (or one of its aliases), or None"""
+        now = time.time()
+        with self._lock:
+            key = self._resolve(key)
+            row = self._conn.execute(
+                'SELECT payload, version, created FROM entries WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.counters['misses'] += 1
+                return None
+            payload, version, created = row
+            if version != CACHE_VERSION or now - created > self.ttl_seconds:
+                self._conn.execute('BEGIN IMMEDIATE')
+                self._delete([key])
+                self._conn.execute('COMMIT')
+                self.counters['misses'] += 1
+                self.counters['expired'] += 1
+                return None
+            self._conn.execute('UPDATE entries SET accessed = ? WHERE key = ?', (now, key))
+            self.counters['hits'] += 1
+        return json.loads(payload)
+
+    def put(self, key: str, value, aliases: list = None, created: float = None):
+        """
+        Store value under key (atomically) and register any alias keys for it.
+        created backdates the entry (imported entries keep their original age for the TTL).
+        """
+        payload = json.dumps(value, ensure_ascii=False)
+        size = len(payload.encode('utf-8'))
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO entries (key, payload, size, version, created, accessed) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (key, payload, size, CACHE_VERSION, created or now, now))
+                self._conn.executemany(
+                    'INSERT OR REPLACE INTO aliases (alias, key) VALUES (?, ?)',
+                    [(alias, key) for alias in (aliases or []) if alias and alias != key])
+                evicted = self._evict_over_budget()
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+            self.counters['writes'] += 1
+            self.counters['evictions'] += evicted
+
+    def add_aliases(self, key: str, aliases: list):
+        """Make alias keys resolve to an existing entry"""
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO aliases (alias, key) VALUES (?, ?)',
+                [(alias, key) for alias in aliases if alias and alias != key])
+
+    def _evict_over_budget(self) -> int:
+        """Drop least recently used entries until both budgets hold (inside a transaction)"""
+        count, total = self._conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return 0
+        victims = []
+        for key, size in self._conn.execute('SELECT key, size FROM entries ORDER BY accessed ASC').fetchall():
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            victims.append(key)
+            count -= 1
+            total -= size
+        self._delete(victims)
+        return len(victims)
+
+    def sweep(self) -> dict:
+        """
+        Housekeeping from the index alone (payloads are never read): drop
+        expired and old-version entries, then evict least recently used ones
+        until both budgets hold. Returns what was removed and how long it took.
+        """
+        started = time.perf_counter()
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                before = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+                expired = [key for (key,) in self._conn.execute(
+                    'SELECT key FROM entries WHERE created < ? OR version != ?', (cutoff, CACHE_VERSION))]
+                self._delete(expired)
+                evicted = self._evict_over_budget()
+                after = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+            self.counters['expired'] += len(expired)
+            self.counters['evictions'] += evicted
+        return {'expired': len(expired), 'evicted': evicted, 'bytes_freed': before - after,
+                'seconds': round(time.perf_counter() - started, 4)}
+
+    def stats(self) -> dict:
+        """Runtime counters plus current index size"""
+        with self._lock:
+            count, total = self._conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+            counters = dict(self.counters)
+        lookups = counters['hits'] + counters['misses']
+        counters.update({
+            'entries': count,
+            'bytes': total,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'ttl_seconds': self.ttl_seconds,
+            'hit_rate': round(counters['hits'] / lookups, 3) if lookups else 0.0,
+        })
+        return counters
@@ -0,0 +1,153 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Seconds between sweeps; 0 turns scheduled sweeps off (run_once() still works)
+CACHE_JANITOR_INTERVAL = int(os.getenv("CACHE_JANITOR_INTERVAL", "600"))
+# Also delete legacy JSON files that aren't a readable cache entry (off by default)
+CACHE_JANITOR_PRUNE_LEGACY = os.getenv("CACHE_JANITOR_PRUNE_LEGACY", "false").lower() == "true"
+
+# Pre-index cache files: cache/<md5 of the PDF bytes>.json
+LEGACY_FILE_NAME = re.compile(r"^([0-9a-f]{32})\.json$")
+LEGACY_VERSIONS = ('3.0', '4.0')
+
+
+def read_legacy_entry(path: str):
+    """(result, created timestamp) of a pre-index JSON cache file, None if it isn't one"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get('version') not in LEGACY_VERSIONS or not data.get('result'):
+        return None
+    result = data['result']
+    if not isinstance(result, dict):
+        # Oldest entries stored the bare analysis text
+        result = {'result': result}
+    try:
+        created = datetime.fromisoformat(data['timestamp']).timestamp()
+    except (KeyError, TypeError, ValueError):
+        created = os.path.getmtime(path)
+    return result, created
+
+
+class CacheJanitor:
+    """
+    Background cache housekeeping, off the request path.
+
+    Every interval seconds a daemon thread calls sweep() on each cache
+    (TTL, version and LRU budget eviction from the cache's index). On its
+    first run it also imports the pre-index JSON cache files left in
+    legacy_folder into legacy_cache, under their original md5 key and
+    with their original age; each file is removed once its entry is in
+    the index. Files that aren't a readable cache entry are left alone
+    unless prune_legacy is set. Each run is recorded: what every cache
+    evicted, bytes freed and how long it took.
+    """
+
+    def __init__(self, caches: dict, interval: int = CACHE_JANITOR_INTERVAL, legacy_folder: str = None,
+                 legacy_cache=None, prune_legacy: bool = CACHE_JANITOR_PRUNE_LEGACY):
+        self.caches = caches
+        self.interval = interval
+        self.legacy_folder = legacy_folder
+        self.legacy_cache = legacy_cache
+        self.prune_legacy = prune_legacy
+        self._legacy_done = False
+        self.totals = {'runs': 0, 'expired': 0, 'evicted': 0, 'bytes_freed': 0,
+                       'legacy_imported': 0, 'legacy_pruned': 0, 'errors': 0}
+        self.history = deque(maxlen=20)
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name='cache-janitor', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        # First sweep right away: catches whatever expired while the server was down
+        while not self._stop.is_set():
+            self.run_once()
+            self._stop.wait(self.interval)
+
+    def _import_legacy_files(self) -> tuple:
+        """Move pre-index JSON entries into legacy_cache; returns (imported, pruned)"""
+        if self._legacy_done or self.legacy_cache is None:
+            return 0, 0
+        if not self.legacy_folder or not os.path.isdir(self.legacy_folder):
+            self._legacy_done = True
+            return 0, 0
+        imported = pruned = 0
+        with os.scandir(self.legacy_folder) as entries:
+            for entry in entries:
+                if not entry.is_file() or not entry.name.endswith('.json'):
+                    continue
+                match = LEGACY_FILE_NAME.match(entry.name)
+                legacy = read_legacy_entry(entry.path) if match else None
+                if legacy is None:
+                    if self.prune_legacy:
+                        os.remove(entry.path)
+                        pruned += 1
+                    continue
+                result, created = legacy
+                self.legacy_cache.put(match.group(1), result, created=created)
+                os.remove(entry.path)
+                imported += 1
+        # Nothing writes these files anymore: one pass per process is enough
+        self._legacy_done = True
+        return imported, pruned
+
+    def run_once(self) -> dict:
+        """Sweep every cache now and return the run's report"""
+        with self._run_lock:
+            started = time.perf_counter()
+            report = {'started': time.time(), 'caches': {}}
+            errors = 0
+            for name, cache in self.caches.items():
+                try:
+                    report['caches'][name] = cache.sweep()
+                except Exception as e:
+                    logger.warning("Cache janitor error (%s): %s", name, e)
+                    report['caches'][name] = {'error': str(e)}
+                    errors += 1
+            try:
+                report['legacy_imported'], report['legacy_pruned'] = self._import_legacy_files()
+            except Exception as e:
+                logger.warning("Cache janitor error (legacy files): %s", e)
+                report['legacy_imported'] = report['legacy_pruned'] = 0
+                errors += 1
+            report['seconds'] = round(time.perf_counter() - started, 4)
+
+        swept = [result for result in report['caches'].values() if 'error' not in result]
+        with self._lock:
+            self.totals['runs'] += 1
+            self.totals['errors'] += errors
+            self.totals['legacy_imported'] += report['legacy_imported']
+            self.totals['legacy_pruned'] += report['legacy_pruned']
+            for field in ('expired', 'evicted', 'bytes_freed'):
+                self.totals[field] += sum(result[field] for result in swept)
+            self.history.append(report)
+        removed = sum(result['expired'] + result['evicted'] for result in swept) + report['legacy_pruned']
+        if removed:
+            logger.info("Cache janitor removed %d entries in %ss", removed, report['seconds'])
+        if report['legacy_imported']:
+            logger.info("Cache janitor imported %d legacy cache files", report['legacy_imported'])
+        return report
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self.totals, 'interval_seconds': self.interval, 'recent_runs': list(self.history)}
@@ -0,0 +1,355 @@
+import io
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from utils.analysis_cache import content_key
+from utils.pdf_extraction import open_pdf
+
+FIGURE_FOLDER = os.getenv(
+    "FIGURE_FOLDER",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'figures'))
+DECODE_WORKERS = int(os.getenv("FIGURE_DECODE_WORKERS", "2"))
+# Seconds an /image request waits for a decode before asking the client to retry
+DECODE_TIMEOUT = float(os.getenv("FIGURE_DECODE_TIMEOUT", "10"))
+# Longest side, in pixels, of the cached thumbnails
+THUMBNAIL_SIZE = int(os.getenv("FIGURE_THUMBNAIL_SIZE", "320"))
+# sweep() drops papers unused this long, then the least recently used ones
+# until their stored PDFs fit FIGURE_MAX_BYTES
+FIGURE_TTL_SECONDS = int(os.getenv("FIGURE_TTL_SECONDS", str(7 * 24 * 3600)))
+FIGURE_MAX_BYTES = int(os.getenv("FIGURE_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+
+def figure_id(page: int, object_name: str) -> str:
+    """Stable figure ID from its page and XObject name, e.g. 'p3-Im1'"""
+    return f"p{page}-{object_name.lstrip('/')}"
+
+
+class FigureStore:
+    """
+    Lazily extracted PDF figures.
+
+    index_paper() only records where each image lives (page, XObject name and
+    PDF object number); nothing is decoded until get() asks for a figure.
+    Decoding runs on a small worker pool, and concurrent requests for the same
+    figure share one decode. Decoded PNGs are stored under the sha256 of their
+    bytes, so an image repeated across pages or papers (logos, banners) is
+    decoded once per paper and stored once overall. Thumbnails are made once
+    per stored image and kept next to it.
+
+    A paper (its PDF copy, index entries and the images no other paper
+    shares) expires ttl_seconds after it was last indexed or viewed; least
+    recently used papers are dropped while the stored PDFs exceed max_bytes.
+    sweep() applies both (see utils/cache_janitor.py).
+    """
+
+    def __init__(self, folder: str, max_workers: int = DECODE_WORKERS,
+                 ttl_seconds: int = FIGURE_TTL_SECONDS, max_bytes: int = FIGURE_MAX_BYTES):
+        self.folder = folder
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.papers_dir = os.path.join(folder, 'papers')
+        self.blobs_dir = os.path.join(folder, 'blobs')
+        os.makedirs(self.papers_dir, exist_ok=True)
+        os.makedirs(self.blobs_dir, exist_ok=True)
+        self.counters = {'indexed_papers': 0, 'decoded': 0, 'reused': 0, 'deduplicated': 0,
+                         'thumbnails': 0, 'errors': 0, 'expired': 0, 'evictions': 0}
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='figure-decode')
+        self._conn = sqlite3.connect(os.path.join(folder, 'figures.sqlite3'),
+                                     check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS papers (
+                paper_key TEXT PRIMARY KEY,
+                pdf_path TEXT NOT NULL,
+                indexed REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS figures (
+                paper_key TEXT NOT NULL,
+                figure_id TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                object_name TEXT NOT NULL,
+                object_id INTEGER,
+                width INTEGER,
+                height INTEGER,
+                blob TEXT,
+                PRIMARY KEY (paper_key, figure_id)
+            );
+            CREATE INDEX IF NOT EXISTS figures_object ON figures(paper_key, object_id);
+            CREATE INDEX IF NOT EXISTS figures_blob ON figures(blob);
+        """)
+        columns = [row[1] for row in self._conn.execute('PRAGMA table_info(papers)')]
+        if 'accessed' not in columns:
+            # Stores from before sweep(): papers count as used when they were indexed
+            self._conn.execute('ALTER TABLE papers ADD COLUMN accessed REAL')
+            self._conn.execute('UPDATE papers SET accessed = indexed')
+
+    def _blob_path(self, blob: str) -> str:
+        return os.path.join(self.blobs_dir, blob[:2], f"{blob}.png")
+
+    def _thumbnail_path(self, blob: str) -> str:
+        return os.path.join(self.blobs_dir, blob[:2], f"{blob}-t{THUMBNAIL_SIZE}.png")
+
+    def _stored_path(self, blob: str, thumbnail: bool) -> str:
+        return self._thumbnail_path(blob) if thumbnail else self._blob_path(blob)
+
+    def index_paper(self, pdf_path: str, paper_key: str) -> list:
+        """
+        Record every image XObject of the PDF without decoding it and keep a
+        copy of the PDF for later decodes. Already indexed papers are not re-read.
+        """
+        with self._lock:
+            known = self._conn.execute('SELECT 1 FROM papers WHERE paper_key = ?', (paper_key,)).fetchone()
+            if known:
+                self._conn.execute('UPDATE papers SET accessed = ? WHERE paper_key = ?', (time.time(), paper_key))
+        if known:
+            return self.figures(paper_key)
+
+        stored_pdf = os.path.join(self.papers_dir, f"{paper_key}.pdf")
+        if not os.path.exists(stored_pdf):
+            try:
+                os.link(pdf_path, stored_pdf)
+            except OSError:
+                shutil.copyfile(pdf_path, stored_pdf)
+
+        rows = []
+        with open_pdf(stored_pdf) as reader:
+            for page_num, page in enumerate(reader.pages, 1):
+                resources = page.get('/Resources', {})
+                if '/XObject' not in resources:
+                    continue
+                x_objects = resources['/XObject'].get_object()
+                for name, ref in x_objects.items():
+                    image = ref.get_object()
+                    if image.get('/Subtype') != '/Image':
+                        continue
+                    rows.append((paper_key, figure_id(page_num, name), page_num, name,
+                                 getattr(ref, 'idnum', None), image.get('/Width'), image.get('/Height')))
+
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            self._conn.executemany(
+                'INSERT OR IGNORE INTO figures (paper_key, figure_id, page, object_name, object_id, width, height) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+            now = time.time()
+            self._conn.execute(
+                'INSERT OR REPLACE INTO papers (paper_key, pdf_path, indexed, accessed) VALUES (?, ?, ?, ?)',
+                (paper_key, stored_pdf, now, now))
+            self._conn.execute('COMMIT')
+            self.counters['indexed_papers'] += 1
+        return self.figures(paper_key)
+
+    def figures(self, paper_key: str) -> list:
+        """Index entries for a paper, in page order"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT figure_id, page, width, height FROM figures WHERE paper_key = ? ORDER BY page, rowid',
+                (paper_key,)).fetchall()
+        return [{
+            'figure_id': fid,
+            'page': page,
+            'size': (width, height),
+            'description': f"Figure from page {page}",
+        } for fid, page, width, height in rows]
+
+    def get(self, paper_key: str, fig_id: str, timeout: float = DECODE_TIMEOUT, thumbnail: bool = False):
+        """
+        Path of the figure's PNG (or its thumbnail), decoding it first if
+        needed; None if the figure isn't indexed. The file name is the content
+        hash, so it doubles as an ETag. Raises TimeoutError if the decode takes
+        longer than timeout.
+        """
+        job = (paper_key, fig_id, thumbnail)
+        with self._lock:
+            row = self._conn.execute('SELECT blob FROM figures WHERE paper_key = ? AND figure_id = ?',
+                                     (paper_key, fig_id)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute('UPDATE papers SET accessed = ? WHERE paper_key = ?', (time.time(), paper_key))
+            if row[0] and os.path.exists(self._stored_path(row[0], thumbnail)):
+                return self._stored_path(row[0], thumbnail)
+            future = self._inflight.get(job)
+            submitted = future is None
+            if submitted:
+                future = self._pool.submit(self._materialize, paper_key, fig_id, thumbnail)
+                self._inflight[job] = future
+        if submitted:
+            # Outside the lock: the callback runs inline if the decode already finished
+            future.add_done_callback(lambda _: self._forget(job))
+        return future.result(timeout=timeout)
+
+    def _forget(self, job: tuple):
+        with self._lock:
+            self._inflight.pop(job, None)
+
+    def _materialize(self, paper_key: str, fig_id: str, thumbnail: bool) -> str:
+        with self._lock:
+            row = self._conn.execute('SELECT blob FROM figures WHERE paper_key = ? AND figure_id = ?',
+                                     (paper_key, fig_id)).fetchone()
+        path = self._blob_path(row[0]) if row[0] else None
+        if path is None or not os.path.exists(path):
+            path = self._decode(paper_key, fig_id)
+        return self._make_thumbnail(path) if thumbnail else path
+
+    def _make_thumbnail(self, path: str) -> str:
+        blob = os.path.splitext(os.path.basename(path))[0]
+        thumb_path = self._thumbnail_path(blob)
+        if not os.path.exists(thumb_path):
+            with Image.open(path) as image:
+                image.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+                tmp_path = f"{thumb_path}.{threading.get_ident()}.tmp"
+                image.save(tmp_path, format='PNG')
+            os.replace(tmp_path, thumb_path)
+            with self._lock:
+                self.counters['thumbnails'] += 1
+        return thumb_path
+
+    def _decode(self, paper_key: str, fig_id: str) -> str:
+        with self._lock:
+            pdf_path, page, object_name, object_id = self._conn.execute(
+                'SELECT p.pdf_path, f.page, f.object_name, f.object_id FROM figures f '
+                'JOIN papers p ON p.paper_key = f.paper_key WHERE f.paper_key = ? AND f.figure_id = ?',
+                (paper_key, fig_id)).fetchone()
+            # The same PDF object drawn on several pages only needs decoding once
+            shared = None
+            if object_id is not None:
+                shared = self._conn.execute(
+                    'SELECT blob FROM figures WHERE paper_key = ? AND object_id = ? AND blob IS NOT NULL',
+                    (paper_key, object_id)).fetchone()
+
+        if shared and os.path.exists(self._blob_path(shared[0])):
+            blob = shared[0]
+            counter = 'reused'
+        else:
+            try:
+                with open_pdf(pdf_path) as reader:
+                    image = reader.pages[page - 1].images[object_name].image
+                    buffer = io.BytesIO()
+                    image.save(buffer, format='PNG')
+            except Exception:
+                with self._lock:
+                    self.counters['errors'] += 1
+                raise
+            data = buffer.getvalue()
+            blob = content_key(data)
+            path = self._blob_path(blob)
+            if os.path.exists(path):
+                counter = 'deduplicated'
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+                counter = 'decoded'
+
+        with self._lock:
+            if object_id is not None:
+                self._conn.execute('UPDATE figures SET blob = ? WHERE paper_key = ? AND object_id = ?',
+                                   (blob, paper_key, object_id))
+            else:
+                self._conn.execute('UPDATE figures SET blob = ? WHERE paper_key = ? AND figure_id = ?',
+                                   (blob, paper_key, fig_id))
+            self.counters[counter] += 1
+        return self._blob_path(blob)
+
+    def _remove_files(self, paths) -> int:
+        """Delete files that exist; returns the bytes freed"""
+        freed = 0
+        for path in paths:
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+                freed += size
+            except OSError:
+                pass
+        return freed
+
+    def _drop_papers(self, paper_keys: list) -> list:
+        """
+        Remove papers from the index (inside a transaction); returns the
+        files to delete: their PDF copies and the images no other paper uses.
+        """
+        files = []
+        for paper_key in paper_keys:
+            row = self._conn.execute('SELECT pdf_path FROM papers WHERE paper_key = ?', (paper_key,)).fetchone()
+            blobs = [blob for (blob,) in self._conn.execute(
+                'SELECT DISTINCT blob FROM figures WHERE paper_key = ? AND blob IS NOT NULL', (paper_key,))]
+            self._conn.execute('DELETE FROM figures WHERE paper_key = ?', (paper_key,))
+            self._conn.execute('DELETE FROM papers WHERE paper_key = ?', (paper_key,))
+            if row:
+                files.append(row[0])
+            for blob in blobs:
+                if self._conn.execute('SELECT 1 FROM figures WHERE blob = ? LIMIT 1', (blob,)).fetchone() is None:
+                    files.extend((self._blob_path(blob), self._thumbnail_path(blob)))
+        return files
+
+    def sweep(self) -> dict:
+        """
+        Drop papers unused for ttl_seconds, then the least recently used ones
+        until the stored PDFs fit max_bytes. Returns what was removed and how
+        long it took.
+        """
+        started = time.perf_counter()
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            papers = self._conn.execute('SELECT paper_key, pdf_path, accessed FROM papers '
+                                        'ORDER BY accessed ASC').fetchall()
+            expired = [key for key, _, accessed in papers if accessed < cutoff]
+            total = 0
+            sizes = []
+            for key, pdf_path, accessed in papers:
+                if accessed >= cutoff:
+                    size = os.path.getsize(pdf_path) if os.path.exists(pdf_path) else 0
+                    sizes.append((key, size))
+                    total += size
+            evicted = []
+            for key, size in sizes:
+                if total <= self.max_bytes:
+                    break
+                evicted.append(key)
+                total -= size
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                files = self._drop_papers(expired + evicted)
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+            self.counters['expired'] += len(expired)
+            self.counters['evictions'] += len(evicted)
+        # Unlinked after the commit: a concurrent get() can no longer find these papers
+        freed = self._remove_files(files)
+        return {'expired': len(expired), 'evicted': len(evicted), 'bytes_freed': freed,
+                'seconds': round(time.perf_counter() - started, 4)}
+
+    def stats(self) -> dict:
+        with self._lock:
+            figures, decoded = self._conn.execute(
+                'SELECT COUNT(*), COUNT(blob) FROM figures').fetchone()
+            blobs = self._conn.execute('SELECT COUNT(DISTINCT blob) FROM figures').fetchone()[0]
+            papers = self._conn.execute('SELECT COUNT(*) FROM papers').fetchone()[0]
+            stats = dict(self.counters)
+        return {**stats, 'papers': papers, 'figures': figures, 'figures_decoded': decoded, 'stored_images': blobs,
+                'ttl_seconds': self.ttl_seconds, 'max_bytes': self.max_bytes}
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_figure_store() -> FigureStore:
+    """Process-wide figure store"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = FigureStore(FIGURE_FOLDER)
+        return _store
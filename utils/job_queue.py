@@ -0,0 +1,253 @@
+import html
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+FINISHED_STATES = (DONE, FAILED)
+
+# Retry-After hint when there is no job duration to estimate from yet
+DEFAULT_RETRY_AFTER = 30
+
+
+class QueueFull(Exception):
+    """submit() refused a job because the admission queue is at capacity"""
+
+    def __init__(self, queued: int, max_queued: int, retry_after: int):
+        super().__init__(f"Analysis queue is full ({queued}/{max_queued} waiting)")
+        self.queued = queued
+        self.max_queued = max_queued
+        self.retry_after = retry_after
+
+
+class QueueClosed(Exception):
+    """submit() refused a job because the queue is draining for shutdown"""
+
+
+class JobQueue:
+    """
+    Background analysis jobs: a bounded thread pool plus a persistent job table.
+
+    handler(job_id, payload, report) does the work and returns a JSON-serializable
+    output; report(message) records progress. Jobs survive restarts: anything
+    still queued or running when the process stopped is queued again on startup.
+
+    At most max_workers jobs run at once. With max_queued set, submit() raises
+    QueueFull instead of letting the backlog grow past that many waiting jobs.
+    drain() stops admission and waits for the backlog to finish.
+    """
+
+    def __init__(self, db_path: str, handler, max_workers: int = 2, max_queued: int = 0):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.handler = handler
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.accepting = True
+        self._waiting = 0
+        self._running = 0
+        self._durations = deque(maxlen=50)
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                progress TEXT,
+                output TEXT,
+                error TEXT,
+                created REAL NOT NULL,
+                started REAL,
+                finished REAL,
+                updated REAL NOT NULL
+            )
+        """)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='analysis-job')
+        self._resume_unfinished()
+
+    def _resume_unfinished(self):
+        rows = self._conn.execute(
+            'SELECT id, payload FROM jobs WHERE status IN (?, ?) ORDER BY created',
+            (QUEUED, RUNNING)).fetchall()
+        for job_id, payload in rows:
+            self._update(job_id, status=QUEUED, progress='Re-queued after restart')
+            with self._lock:
+                self._waiting += 1
+            self._pool.submit(self._run, job_id, json.loads(payload))
+
+    def _update(self, job_id: str, **fields):
+        fields['updated'] = time.time()
+        columns = ', '.join(f'{name} = ?' for name in fields)
+        with self._changed:
+            self._conn.execute(f'UPDATE jobs SET {columns} WHERE id = ?', (*fields.values(), job_id))
+            self._changed.notify_all()
+
+    def retry_after(self) -> int:
+        """Seconds until a worker is likely free for one more job, from recent job durations"""
+        with self._lock:
+            durations = list(self._durations)
+            backlog = self._waiting + self._running
+        if not durations:
+            return DEFAULT_RETRY_AFTER
+        average = sum(durations) / len(durations)
+        return max(1, math.ceil(average * (backlog - self.max_workers + 1) / self.max_workers))
+
+    def submit(self, payload: dict) -> str:
+        """
+        Persist a new job and hand it to the worker pool; returns the job ID at once.
+        Raises QueueFull when max_queued jobs are already waiting and QueueClosed while draining.
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._changed:
+            if not self.accepting:
+                raise QueueClosed("The server is shutting down")
+            if self.max_queued and self._waiting >= self.max_queued:
+                queued = self._waiting
+                full = True
+            else:
+                self._waiting += 1
+                full = False
+        if full:
+            raise QueueFull(queued, self.max_queued, self.retry_after())
+        with self._changed:
+            self._conn.execute(
+                'INSERT INTO jobs (id, status, payload, progress, created, updated) VALUES (?, ?, ?, ?, ?, ?)',
+                (job_id, QUEUED, json.dumps(payload), 'Queued', now, now))
+        self._pool.submit(self._run, job_id, payload)
+        return job_id
+
+    def _run(self, job_id: str, payload: dict):
+        with self._lock:
+            self._waiting -= 1
+            self._running += 1
+        started = time.time()
+        self._update(job_id, status=RUNNING, started=started, progress='Started')
+        try:
+            output = self.handler(job_id, payload, lambda message: self._update(job_id, progress=message))
+            self._update(job_id, status=DONE, finished=time.time(), progress='Done',
+                         output=json.dumps(output, ensure_ascii=False))
+        except Exception as e:
+            traceback.print_exc()
+            self._update(job_id, status=FAILED, finished=time.time(), progress='Failed', error=str(e))
+        finally:
+            with self._changed:
+                self._running -= 1
+                self._durations.append(time.time() - started)
+                self._changed.notify_all()
+
+    def get(self, job_id: str, include_output: bool = True):
+        """Return the job as a dict, or None if it doesn't exist"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT id, status, progress, output, error, created, started, finished, updated '
+                'FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            if row is None:
+                return None
+            position = None
+            if row[1] == QUEUED:
+                position = self._conn.execute(
+                    'SELECT COUNT(*) FROM jobs WHERE status = ? AND created < ?', (QUEUED, row[5])).fetchone()[0]
+        job = {
+            'id': row[0],
+            'status': row[1],
+            'progress': row[2],
+            'error': row[4],
+            'created': row[5],
+            'started': row[6],
+            'finished': row[7],
+            'updated': row[8],
+            'queue_position': position,
+        }
+        if include_output:
+            job['output'] = json.loads(row[3]) if row[3] else None
+        return job
+
+    def wait_for_update(self, job_id: str, since: float, timeout: float = 15.0):
+        """Block until the job changes after `since` (or timeout); returns the job without output"""
+        deadline = time.time() + timeout
+        with self._changed:
+            while True:
+                row = self._conn.execute('SELECT updated FROM jobs WHERE id = ?', (job_id,)).fetchone()
+                remaining = deadline - time.time()
+                if row is None or row[0] > since or remaining <= 0:
+                    break
+                self._changed.wait(remaining)
+        return self.get(job_id, include_output=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self._conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+            in_process = {'waiting': self._waiting, 'running': self._running}
+        return {'max_workers': self.max_workers, 'max_queued': self.max_queued, 'accepting': self.accepting,
+                **in_process, **{state: counts.get(state, 0) for state in (QUEUED, RUNNING, DONE, FAILED)}}
+
+    def drain(self, timeout: float = None) -> int:
+        """
+        Graceful shutdown: refuse new jobs, wait (up to timeout) for queued and
+        running ones to finish, then stop the pool. Returns the number of jobs
+        left unfinished; they stay in the job table and resume on next start.
+        The pool's threads are not daemons: a process that must exit before
+        running jobs finish has to leave with os._exit() (see serve.py).
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._changed:
+            self.accepting = False
+            while self._waiting + self._running:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._changed.wait(remaining)
+            unfinished = self._waiting + self._running
+        # Jobs not started yet are cancelled here; they are still 'queued' in the table
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        return unfinished
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
+
+
+def job_events(queue: JobQueue, job_id: str):
+    """Server-Sent Events stream of a job's status until it finishes"""
+    since = 0.0
+    while True:
+        job = queue.wait_for_update(job_id, since)
+        if job is None:
+            yield 'event: error\ndata: {"error": "unknown job"}\n\n'
+            return
+        if job['updated'] > since:
+            since = job['updated']
+            yield f"data: {json.dumps(job)}\n\n"
+        else:
+            # Heartbeat so proxies keep the connection open
+            yield ': keep-alive\n\n'
+        if job['status'] in FINISHED_STATES:
+            return
+
+
+def pending_page(job: dict, refresh_seconds: int = 5) -> str:
+    """Minimal self-refreshing HTML page for a browser waiting on a queued or running job"""
+    if job['status'] == QUEUED and job.get('queue_position') is not None:
+        detail = f"{job['queue_position']} job(s) ahead of yours"
+    else:
+        detail = job.get('progress') or job['status']
+    return (
+        '<!DOCTYPE html>\n<html><head><meta charset="utf-8">'
+        f'<meta http-equiv="refresh" content="{refresh_seconds}">'
+        '<title>Analysis in progress</title></head>\n'
+        f'<body><h1>Analysis {html.escape(job["status"])}</h1>\n'
+        f'<p>{html.escape(detail)}</p>\n'
+        f'<p>This page reloads every {refresh_seconds} seconds and shows the result when it is ready.</p>\n'
+        '</body></html>\n')
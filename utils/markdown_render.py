@@ -0,0 +1,220 @@
+import html
+import re
+
+# Bump when the renderer's output changes; cached HTML from older versions is re-rendered
+RENDER_VERSION = '1'
+
+_FENCE = re.compile(r'\s*(```|~~~)')
+_HEADING = re.compile(r'(#{1,6})\s+(.*?)\s*#*\s*$')
+_RULE = re.compile(r'\s*([-*_])(\s*\1){2,}\s*$')
+_BULLET = re.compile(r'\s*[-*+]\s+(.*)')
+_NUMBERED = re.compile(r'\s*\d{1,9}[.)]\s+(.*)')
+_TABLE_SEPARATOR = re.compile(r'\s*\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?\s*$')
+
+# Styling the agents sometimes leak into their answers (what the old formatter filtered out)
+_CSS_LINE = re.compile(r'box-shadow|rgba\(|color:|text-decoration|margin-bottom|text-align|\}\s*h[1-6]\s*\{',
+                       re.IGNORECASE)
+
+# One scan per line: code spans, strong, emphasis, http(s) links and raw HTML tags (dropped)
+_INLINE = re.compile(
+    r'(?P<code>`+)(?P<code_text>.+?)(?P=code)'
+    r'|\*\*(?P<strong>[^*\n]+?)\*\*|__(?P<strong_u>[^_\n]+?)__'
+    r'|\*(?P<em>[^*\s][^*\n]*?)\*|(?<!\w)_(?P<em_u>[^_\s][^_\n]*?)_(?!\w)'
+    r'|\[(?P<label>[^\]\n]+)\]\((?P<href>https?://[^)\s]+)\)'
+    r'|(?P<tag></?[A-Za-z][^<>\n]*>)'
+)
+
+# Characters that can start an inline token; lines without any are only escaped
+_INLINE_MARKERS = frozenset('`*_[<')
+# Characters that can start a block marker (heading, fence, rule, list item, table row)
+_BLOCK_MARKERS = frozenset('#`~-*_+|0123456789')
+# Every _CSS_LINE pattern contains one of these
+_CSS_MARKERS = ('-', ':', '(', '{')
+
+
+def render_inline(text: str) -> str:
+    """Escape a line of text and turn its inline markdown into HTML"""
+    if _INLINE_MARKERS.isdisjoint(text):
+        return html.escape(text)
+    out = []
+    position = 0
+    for match in _INLINE.finditer(text):
+        out.append(html.escape(text[position:match.start()]))
+        position = match.end()
+        kind = match.lastgroup
+        if kind == 'code_text':
+            out.append(f"<code>{html.escape(match['code_text'].strip())}</code>")
+        elif kind in ('strong', 'strong_u'):
+            out.append(f"<strong>{render_inline(match[kind])}</strong>")
+        elif kind in ('em', 'em_u'):
+            out.append(f"<em>{render_inline(match[kind])}</em>")
+        elif kind == 'href':
+            out.append(f'<a href="{html.escape(match["href"])}" rel="noopener nofollow">'
+                       f'{html.escape(match["label"])}</a>')
+        # kind == 'tag': raw HTML from the model is dropped
+    out.append(html.escape(text[position:]))
+    return ''.join(out)
+
+
+def _cells(row: str) -> list:
+    row = row.strip()
+    if row.startswith('|'):
+        row = row[1:]
+    if row.endswith('|'):
+        row = row[:-1]
+    return [cell.strip() for cell in row.split('|')]
+
+
+class MarkdownRenderer:
+    """
+    Single-pass markdown to safe HTML for crew output.
+
+    feed() takes text in chunks of any size (whole outputs or streamed LLM
+    tokens) and returns the HTML of every block completed so far; close()
+    flushes the rest. Each line is classified once and each block emitted
+    once, so rendering is linear in the input. Supports headings,
+    paragraphs, bullet and numbered lists, tables, fenced code, rules,
+    strong/emphasis, code spans and http(s) links. All text is escaped and
+    raw HTML tags are dropped.
+    """
+
+    def __init__(self):
+        self._partial = []
+        self._block = None
+        self._lines = []
+        self._table_rows = 0
+        self._out = []
+
+    def feed(self, chunk: str) -> str:
+        self._partial.append(chunk)
+        if '\n' not in chunk:
+            return ''
+        lines = ''.join(self._partial).split('\n')
+        self._partial = [lines.pop()]
+        for line in lines:
+            self._line(line.rstrip('\r'))
+        return self._take()
+
+    def close(self) -> str:
+        tail = ''.join(self._partial)
+        self._partial = []
+        if tail:
+            self._line(tail.rstrip('\r'))
+        self._close_block()
+        return self._take()
+
+    def _take(self) -> str:
+        html_out = ''.join(self._out)
+        self._out = []
+        return html_out
+
+    def _line(self, line: str):
+        if self._block == 'code':
+            if _FENCE.match(line):
+                self._close_block()
+            else:
+                self._lines.append(line)
+            return
+        if not line.strip():
+            self._close_block()
+            return
+        if any(marker in line for marker in _CSS_MARKERS) and (
+                _CSS_LINE.search(line) or (line.count(':') > 2 and line.count(';') > 1)):
+            return
+        if line.lstrip()[0] in _BLOCK_MARKERS:
+            self._block_line(line)
+        else:
+            self._text_line(line)
+
+    def _block_line(self, line: str):
+        """A line that may open a heading, fence, rule, table row or list item"""
+        if _FENCE.match(line):
+            self._close_block()
+            self._block = 'code'
+            return
+        heading = _HEADING.match(line)
+        if heading:
+            self._close_block()
+            level = len(heading[1])
+            self._out.append(f"<h{level}>{render_inline(heading[2])}</h{level}>\n")
+            return
+        if _RULE.match(line):
+            self._close_block()
+            self._out.append('<hr>\n')
+            return
+        if line.lstrip().startswith('|'):
+            self._table_row(line)
+            return
+        item = _BULLET.match(line)
+        numbered = None if item else _NUMBERED.match(line)
+        if item or numbered:
+            kind = 'ul' if item else 'ol'
+            if self._block != kind:
+                self._close_block()
+                self._block = kind
+                self._out.append(f"<{kind}>\n")
+            else:
+                self._flush_item()
+            self._lines.append((item or numbered)[1])
+            return
+        self._text_line(line)
+
+    def _text_line(self, line: str):
+        if self._block in ('ul', 'ol') and line[:1].isspace():
+            # Indented continuation of the current list item
+            self._lines.append(line.strip())
+            return
+        if self._block != 'p':
+            self._close_block()
+            self._block = 'p'
+        self._lines.append(line.strip())
+
+    def _table_row(self, line: str):
+        if self._block != 'table':
+            self._close_block()
+            self._block = 'table'
+            self._table_rows = 0
+        self._table_rows += 1
+        if self._table_rows == 1:
+            # The header row is only known once the separator row arrives
+            self._lines.append(line)
+            return
+        if self._table_rows == 2:
+            self._out.append('<table class="analysis-table">\n')
+            first = self._lines.pop()
+            if _TABLE_SEPARATOR.match(line):
+                self._out.append('<tr>' + ''.join(f"<th>{render_inline(c)}</th>" for c in _cells(first)) + '</tr>\n')
+                return
+            self._out.append('<tr>' + ''.join(f"<td>{render_inline(c)}</td>" for c in _cells(first)) + '</tr>\n')
+        self._out.append('<tr>' + ''.join(f"<td>{render_inline(c)}</td>" for c in _cells(line)) + '</tr>\n')
+
+    def _flush_item(self):
+        if self._lines:
+            self._out.append(f"<li>{'<br>'.join(render_inline(part) for part in self._lines)}</li>\n")
+            self._lines = []
+
+    def _close_block(self):
+        block = self._block
+        if block == 'p':
+            self._out.append(f"<p>{'<br>'.join(render_inline(part) for part in self._lines)}</p>\n")
+        elif block in ('ul', 'ol'):
+            self._flush_item()
+            self._out.append(f"</{block}>\n")
+        elif block == 'code':
+            code = html.escape('\n'.join(self._lines))
+            self._out.append(f"<pre><code>{code}</code></pre>\n")
+        elif block == 'table':
+            if self._table_rows == 1:
+                # A lone pipe row is not a table
+                self._out.append(f"<p>{render_inline(self._lines[0].strip())}</p>\n")
+            else:
+                self._out.append('</table>\n')
+        self._block = None
+        self._lines = []
+        self._table_rows = 0
+
+
+def render_markdown(text: str) -> str:
+    """Render a complete markdown document to safe HTML"""
+    renderer = MarkdownRenderer()
+    return renderer.feed(text) + renderer.close()
@@ -0,0 +1,143 @@
+import os
+import sqlite3
+import threading
+import time
+import zlib
+import numpy as np
+from utils.normalize import cache_key_words
+
+# Papers at least this similar (estimated Jaccard over word shingles) count as the same paper
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.85"))
+
+SHINGLE_WORDS = 5
+NUM_PERMUTATIONS = 128
+# 32 bands x 4 rows: pairs above ~0.6 similarity almost always share a band,
+# pairs below ~0.3 rarely do
+LSH_BANDS = 32
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+_rng = np.random.default_rng(1)
+# Fixed seed: signatures are stored, so the permutations must never change
+_PERM_A = _rng.integers(1, 1 << 32, NUM_PERMUTATIONS, dtype=np.uint64)
+_PERM_B = _rng.integers(0, 1 << 32, NUM_PERMUTATIONS, dtype=np.uint64)
+
+
+def shingle_hashes(text: str) -> np.ndarray:
+    """
+    Distinct 32-bit hashes of the paper's overlapping 5-word shingles, over
+    the same normalized words as the text cache key (page markers and bare
+    numbers dropped, so page numbering and layout don't matter).
+    """
+    words = cache_key_words(text)
+    if len(words) < SHINGLE_WORDS:
+        words = words + [''] * (SHINGLE_WORDS - len(words))
+    shingles = {zlib.crc32(" ".join(words[i:i + SHINGLE_WORDS]).encode())
+                for i in range(len(words) - SHINGLE_WORDS + 1)}
+    return np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+
+
+def minhash_signature(text: str) -> np.ndarray:
+    """NUM_PERMUTATIONS minimum hashes of the shingle set under fixed universal hash permutations"""
+    hashes = shingle_hashes(text)
+    signature = np.full(NUM_PERMUTATIONS, _MAX_HASH, dtype=np.uint64)
+    # Blocks of shingles keep the permutation matrix small for long papers
+    for start in range(0, len(hashes), 4096):
+        block = hashes[start:start + 4096]
+        permuted = ((np.outer(_PERM_A, block) + _PERM_B[:, None]) % _MERSENNE_PRIME) & _MAX_HASH
+        np.minimum(signature, permuted.min(axis=1), out=signature)
+    return signature.astype(np.uint32)
+
+
+def estimated_similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity: the share of permutations with equal minimums"""
+    return float(np.count_nonzero(a == b)) / len(a)
+
+
+def _band_keys(signature: np.ndarray) -> list:
+    rows = signature.reshape(LSH_BANDS, LSH_ROWS)
+    return [(band, zlib.crc32(rows[band].tobytes())) for band in range(LSH_BANDS)]
+
+
+class NearDuplicateIndex:
+    """
+    MinHash + LSH index of analyzed papers.
+
+    Each paper's signature is split into LSH_BANDS bands; papers sharing any
+    band bucket are candidates. A lookup is LSH_BANDS indexed reads plus a
+    signature comparison per candidate, independent of how many papers are
+    stored. Catches re-uploads the exact keys miss: another preprint
+    version, an added cover page, a watermark on every page.
+    """
+
+    def __init__(self, db_path: str):
+        self.counters = {'lookups': 0, 'matches': 0, 'candidates': 0, 'indexed': 0}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS signatures (
+                key TEXT PRIMARY KEY,
+                signature BLOB NOT NULL,
+                added REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS bands (
+                band INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                key TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS bands_bucket ON bands(band, bucket);
+            CREATE INDEX IF NOT EXISTS bands_key ON bands(key);
+        """)
+
+    def add(self, key: str, signature: np.ndarray):
+        """Index (or re-index) a paper's signature under its cache key"""
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            self._conn.execute('DELETE FROM bands WHERE key = ?', (key,))
+            self._conn.execute('INSERT OR REPLACE INTO signatures (key, signature, added) VALUES (?, ?, ?)',
+                               (key, signature.astype(np.uint32).tobytes(), time.time()))
+            self._conn.executemany('INSERT INTO bands (band, bucket, key) VALUES (?, ?, ?)',
+                                   [(band, bucket, key) for band, bucket in _band_keys(signature)])
+            self._conn.execute('COMMIT')
+            self.counters['indexed'] += 1
+
+    def find(self, signature: np.ndarray, threshold: float = None, exclude: str = None) -> list:
+        """[{'key', 'similarity'}, ...] at or above threshold, most similar first"""
+        threshold = NEAR_DUPLICATE_THRESHOLD if threshold is None else threshold
+        with self._lock:
+            candidates = set()
+            for band, bucket in _band_keys(signature):
+                candidates.update(key for (key,) in self._conn.execute(
+                    'SELECT key FROM bands WHERE band = ? AND bucket = ?', (band, bucket)))
+            candidates.discard(exclude)
+            stored = self._conn.execute(
+                f"SELECT key, signature FROM signatures WHERE key IN ({','.join('?' * len(candidates))})",
+                list(candidates)).fetchall() if candidates else []
+            self.counters['lookups'] += 1
+            self.counters['candidates'] += len(candidates)
+        matches = []
+        for key, blob in stored:
+            similarity = estimated_similarity(signature, np.frombuffer(blob, dtype=np.uint32))
+            if similarity >= threshold:
+                matches.append({'key': key, 'similarity': round(similarity, 3)})
+        matches.sort(key=lambda match: -match['similarity'])
+        if matches:
+            with self._lock:
+                self.counters['matches'] += 1
+        return matches
+
+    def remove(self, key: str):
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            self._conn.execute('DELETE FROM bands WHERE key = ?', (key,))
+            self._conn.execute('DELETE FROM signatures WHERE key = ?', (key,))
+            self._conn.execute('COMMIT')
+
+    def stats(self) -> dict:
+        with self._lock:
+            papers = self._conn.execute('SELECT COUNT(*) FROM signatures').fetchone()[0]
+            stats = dict(self.counters)
+        return {**stats, 'papers': papers, 'threshold': NEAR_DUPLICATE_THRESHOLD,
+                'bands': LSH_BANDS, 'rows_per_band': LSH_ROWS}
@@ -0,0 +1,39 @@
+import re
+import unicodedata
+
+# Quote and dash standardization: exactly what the old re.sub character
+# classes replaced. str.replace runs at memcpy speed even on non-ASCII text,
+# where str.translate falls back to a per-character mapping lookup.
+_PUNCTUATION = (('`', '"'), ('–', '-'), ('—', '-'), ('―', '-'))
+
+# Cache-key tokens: page markers (skipped) and runs of 4+ ASCII letters/digits
+_KEY_TOKEN = re.compile(r'=== page \d+ ===|[a-z0-9]{4,}')
+
+
+def normalize_pdf_text(text: str) -> str:
+    """
+    Normalize PDF text for consistent extraction: lowercase, NFKD, collapse
+    whitespace, standardize quotes and dashes. Every step is a C-level string
+    operation over the whole text (no regex passes); NFKD is skipped for
+    pure-ASCII text, where it is a no-op.
+    """
+    if not text:
+        return ""
+    text = text.lower()
+    if not text.isascii():
+        text = unicodedata.normalize('NFKD', text)
+    # str.split() splits on exactly the characters re's \s matches
+    text = " ".join(text.split())
+    for old, new in _PUNCTUATION:
+        text = text.replace(old, new)
+    return text
+
+
+def cache_key_words(text: str) -> list:
+    """
+    The words a paper's text cache key is built from: lowercase alphanumeric
+    runs of 4+ characters that aren't plain numbers, page markers excluded.
+    One regex scan instead of separate marker/punctuation/whitespace passes.
+    """
+    return [word for word in _KEY_TOKEN.findall(text.lower())
+            if word[0] != '=' and not word.isdigit()]
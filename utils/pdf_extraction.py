@@ -0,0 +1,141 @@
+import mmap
+import os
+import time
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from pypdf import PdfReader
+from utils.analysis_cache import file_content_key
+from utils.normalize import normalize_pdf_text
+from utils.tracing import record_span
+
+# Number of worker processes used for page extraction. 0/unset means os.cpu_count().
+MAX_WORKERS = int(os.getenv("PDF_EXTRACT_MAX_WORKERS", "0")) or None
+
+# Below this page count the process pool costs more than it saves
+MIN_PAGES_FOR_POOL = 8
+
+# Each worker gets several small page ranges so a slow page doesn't stall the pool
+RANGES_PER_WORKER = 4
+
+
+@contextmanager
+def open_pdf(pdf_path: str):
+    """
+    PdfReader over a read-only memory map of the file. Given a path, pypdf
+    reads the whole file into a private BytesIO; a mapping shares the OS page
+    cache instead, so concurrent readers of large PDFs don't each hold a copy.
+    The mapping is closed on exit: an open one keeps Windows from deleting the file.
+    """
+    with open(pdf_path, 'rb') as f:
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files can't be mapped; let pypdf raise its usual error
+            buffer = None
+    if buffer is None:
+        with PdfReader(pdf_path) as reader:
+            yield reader
+        return
+    try:
+        yield PdfReader(buffer)
+    finally:
+        buffer.close()
+
+
+def split_page_ranges(page_count: int, parts: int) -> list:
+    """Split [0, page_count) into at most `parts` contiguous (start, stop) ranges"""
+    parts = max(1, min(parts, page_count))
+    size, extra = divmod(page_count, parts)
+    ranges = []
+    start = 0
+    for i in range(parts):
+        stop = start + size + (1 if i < extra else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+def _iter_page_range(pdf_path: str, start: int, stop: int, normalize: bool = True):
+    """Yield (page_number, text, seconds) for pages [start, stop)"""
+    with open_pdf(pdf_path) as reader:
+        for page_num in range(start, stop):
+            started = time.perf_counter()
+            page_text = reader.pages[page_num].extract_text() or ""
+            if normalize:
+                page_text = normalize_pdf_text(page_text)
+            yield page_num + 1, page_text, time.perf_counter() - started
+
+
+def _extract_page_range(pdf_path: str, start: int, stop: int, normalize: bool = True) -> list:
+    """Worker: extract pages [start, stop) and return [(page_number, text, seconds), ...]"""
+    return list(_iter_page_range(pdf_path, start, stop, normalize))
+
+
+def _traced_pages(pages):
+    """Record a span per page (timed where it was extracted) and yield (page_number, text)"""
+    for page_num, page_text, seconds in pages:
+        record_span('extract.page', seconds, page=page_num, bytes=len(page_text))
+        yield page_num, page_text
+
+
+def iter_pdf_pages(pdf_path: str, max_workers: int = None, normalize: bool = True):
+    """
+    Yield (page_number, text) for every page of the PDF, in page order.
+    Page ranges are extracted in a process pool; each page is normalized
+    exactly once, inside the worker that extracted it.
+    """
+    if not os.path.exists(pdf_path):
+        raise FileNotFoundError(f"PDF file not found at path: {pdf_path}")
+
+    with open_pdf(pdf_path) as reader:
+        page_count = len(reader.pages)
+    workers = min(max_workers or MAX_WORKERS or os.cpu_count() or 1, page_count)
+
+    if workers <= 1 or page_count < MIN_PAGES_FOR_POOL:
+        yield from _traced_pages(_iter_page_range(pdf_path, 0, page_count, normalize))
+        return
+
+    ranges = split_page_ranges(page_count, workers * RANGES_PER_WORKER)
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        futures = [pool.submit(_extract_page_range, pdf_path, start, stop, normalize)
+                   for start, stop in ranges]
+        # Futures are consumed in submission order, so pages stream out in order
+        # as soon as each leading range is done.
+        for future in futures:
+            yield from _traced_pages(future.result())
+    finally:
+        # Drop ranges that haven't started if the consumer stops early
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def join_pages(pages) -> str:
+    """
+    Join normalized (page_number, text) pairs into the single-line paper text
+    with '=== page N ===' markers, skipping pages that normalized to nothing.
+    """
+    return " ".join(f"=== page {page_num} === {text}" for page_num, text in pages if text)
+
+
+def extract_normalized_text(pdf_path: str, max_workers: int = None) -> str:
+    """Normalized paper text with page markers (what extract_pdf_content returns as 'text')"""
+    return join_pages(iter_pdf_pages(pdf_path, max_workers=max_workers))
+
+
+def prepare_paper(pdf_path: str) -> dict:
+    """
+    Process-pool worker for batch runs: {'path', 'key', 'text'} or {'path', 'key', 'error'}
+    (key is None when the file can't be read). Never raises, so one bad path
+    fails its own paper rather than the batch.
+    Lives here rather than in crew_runner so spawned workers don't import crewai.
+    """
+    paper = {'path': pdf_path, 'key': None}
+    try:
+        paper['key'] = file_content_key(pdf_path)
+        text = extract_normalized_text(pdf_path, max_workers=1)
+        if not text.strip():
+            raise ValueError("no text could be extracted (scanned or image-only PDF?)")
+        paper['text'] = text
+    except Exception as e:
+        paper['error'] = f"Extraction failed: {e}"
+    return paper
@@ -0,0 +1,210 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "1") != "0"
+# Append finished traces here as OTLP/JSON lines (one ExportTraceServiceRequest per trace)
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "")
+# CrewAI's console output; tracing makes it optional
+VERBOSE = os.getenv("CREW_VERBOSE", "1") != "0"
+
+# Latency histogram bucket upper bounds, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_current = contextvars.ContextVar('current_span', default=None)
+_lock = threading.Lock()
+_open_traces = {}
+_histograms = {}
+
+
+class _NoopSpan:
+    """Returned while tracing is disabled: every operation does nothing"""
+
+    def set(self, **attributes):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """One timed operation with attributes (durations, token counts, byte sizes...)"""
+
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'attributes',
+                 'start_ns', 'end_ns', 'error', '_token')
+
+    def __init__(self, name: str, parent=None, attributes: dict = None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+        self._token = None
+
+    @property
+    def seconds(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+        return self
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        _current.reset(self._token)
+        _finish(self)
+        return False
+
+
+def span(name: str, **attributes):
+    """
+    Context manager timing a block as a child of the current span:
+        with span('cache.lookup', key=key) as s:
+            ...
+            s.set(hit=True)
+    """
+    if not TRACING_ENABLED:
+        return NOOP_SPAN
+    parent = _current.get()
+    trace = Span(name, parent, attributes)
+    if parent is None:
+        with _lock:
+            _open_traces[trace.trace_id] = []
+    return trace
+
+
+def record_span(name: str, seconds: float, end_ns: int = None, **attributes):
+    """Record an already measured operation (e.g. timed in a worker process) under the current span"""
+    if not TRACING_ENABLED:
+        return
+    finished = span(name, **attributes)
+    finished.end_ns = end_ns or time.time_ns()
+    finished.start_ns = finished.end_ns - int(seconds * 1e9)
+    _finish(finished)
+
+
+def traced(name: str):
+    """Decorator: run the function inside span(name)"""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_span():
+    """The innermost open span (a no-op span if there is none or tracing is off)"""
+    return (_current.get() if TRACING_ENABLED else None) or NOOP_SPAN
+
+
+def _finish(finished: Span):
+    if finished.end_ns is None:
+        finished.end_ns = time.time_ns()
+    seconds = finished.seconds
+    with _lock:
+        histogram = _histograms.get(finished.name)
+        if histogram is None:
+            histogram = _histograms[finished.name] = {'buckets': [0] * (len(BUCKETS) + 1),
+                                                     'sum': 0.0, 'count': 0, 'errors': 0}
+        histogram['buckets'][bisect_left(BUCKETS, seconds)] += 1
+        histogram['sum'] += seconds
+        histogram['count'] += 1
+        if finished.error:
+            histogram['errors'] += 1
+        spans = _open_traces.get(finished.trace_id)
+        if spans is None:
+            return
+        spans.append(finished)
+        if finished.parent_id is not None:
+            return
+        # The root span closed: the trace is complete
+        del _open_traces[finished.trace_id]
+    if TRACE_EXPORT_PATH:
+        _export(spans)
+
+
+def _attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        typed = {'boolValue': value}
+    elif isinstance(value, int):
+        typed = {'intValue': str(value)}
+    elif isinstance(value, float):
+        typed = {'doubleValue': value}
+    else:
+        typed = {'stringValue': str(value)}
+    return {'key': key, 'value': typed}
+
+
+def _export(spans: list):
+    """Append the trace as one OTLP/JSON line (readable by the OpenTelemetry Collector's otlpjsonfile receiver)"""
+    otlp_spans = []
+    for finished in spans:
+        otlp = {
+            'traceId': finished.trace_id,
+            'spanId': finished.span_id,
+            'name': finished.name,
+            'kind': 1,
+            'startTimeUnixNano': str(finished.start_ns),
+            'endTimeUnixNano': str(finished.end_ns),
+            'attributes': [_attribute(k, v) for k, v in finished.attributes.items() if v is not None],
+            'status': {'code': 2, 'message': finished.error} if finished.error else {},
+        }
+        if finished.parent_id:
+            otlp['parentSpanId'] = finished.parent_id
+        otlp_spans.append(otlp)
+    line = json.dumps({'resourceSpans': [{
+        'resource': {'attributes': [_attribute('service.name', 'research-paper-analyzer')]},
+        'scopeSpans': [{'scope': {'name': 'utils.tracing'}, 'spans': otlp_spans}],
+    }]})
+    with _lock:
+        with open(TRACE_EXPORT_PATH, 'a', encoding='utf-8') as f:
+            f.write(line + "\n")
+
+
+def metrics() -> dict:
+    """Latency histogram per span name"""
+    with _lock:
+        snapshot = {name: {**h, 'buckets': list(h['buckets'])} for name, h in _histograms.items()}
+    report = {}
+    for name, h in sorted(snapshot.items()):
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(BUCKETS + ('+Inf',), h['buckets']):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        report[name] = {'count': h['count'], 'errors': h['errors'], 'sum_seconds': round(h['sum'], 6),
+                        'mean_seconds': round(h['sum'] / h['count'], 6) if h['count'] else 0.0,
+                        'buckets': buckets}
+    return report
+
+
+def prometheus_metrics() -> str:
+    """metrics() in the Prometheus text exposition format"""
+    lines = ['# HELP span_duration_seconds Duration of traced operations',
+             '# TYPE span_duration_seconds histogram']
+    for name, h in metrics().items():
+        for bound, count in h['buckets'].items():
+            lines.append(f'span_duration_seconds_bucket{{span="{name}",le="{bound}"}} {count}')
+        lines.append(f'span_duration_seconds_sum{{span="{name}"}} {h["sum_seconds"]}')
+        lines.append(f'span_duration_seconds_count{{span="{name}"}} {h["count"]}')
+    return "\n".join(lines) + "\n"
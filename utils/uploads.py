@@ -0,0 +1,53 @@
+import hashlib
+import os
+import tempfile
+from flask import Request, current_app
+
+
+class HashingSpool:
+    """
+    Upload target that sha256-hashes bytes as the multipart parser writes them.
+
+    The bytes go straight to a temp file in the upload folder, so nothing is
+    buffered in memory. claim() moves that file to its final name (a rename,
+    not a copy). An unclaimed spool removes its file when the request closes it.
+    """
+
+    def __init__(self, folder: str):
+        self._file = tempfile.NamedTemporaryFile(dir=folder, prefix='upload-', suffix='.part', delete=False)
+        self.name = self._file.name
+        self._digest = hashlib.sha256()
+        self.size = 0
+        self.claimed = False
+
+    def write(self, data) -> int:
+        self._digest.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
+
+    def claim(self, path: str) -> str:
+        """Move the received file to path; returns its sha256"""
+        # Windows can't rename a file that is still open
+        self._file.close()
+        os.replace(self.name, path)
+        self.claimed = True
+        return self.hexdigest()
+
+    def close(self):
+        self._file.close()
+        if not self.claimed and os.path.exists(self.name):
+            os.remove(self.name)
+
+    def __getattr__(self, name):
+        # read/seek/tell/readline etc. for werkzeug's FileStorage
+        return getattr(self._file, name)
+
+
+class HashingRequest(Request):
+    """Flask request whose file uploads are spooled to disk and hashed while received"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashingSpool(current_app.config['UPLOAD_FOLDER'])
@@ -0,0 +1,140 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from utils.analysis_cache import content_key
+from utils.tracing import record_span
+
+logger = logging.getLogger(__name__)
+
+# Worker processes rendering charts; each keeps Matplotlib imported between jobs
+VIZ_WORKERS = int(os.getenv("VIZ_WORKERS", "2"))
+
+MANIFEST = 'manifest.json'
+
+
+def _warm_worker():
+    """Pool initializer: load Matplotlib (headless), its font cache and the generator once per worker"""
+    # A failing initializer breaks the whole pool; leave import errors to _render
+    try:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+        figure = plt.figure()
+        figure.canvas.draw()
+        plt.close(figure)
+        import utils.visualization_generator  # noqa: F401
+    except ImportError:
+        pass
+
+
+def _render(folder: str, analysis_text: str, paper_name: str) -> dict:
+    """Worker: render every chart for one analysis into folder and write its manifest"""
+    from utils.visualization_generator import VisualizationGenerator
+    started = time.perf_counter()
+    os.makedirs(folder, exist_ok=True)
+    visualizations = VisualizationGenerator(folder).generate_all_visualizations(analysis_text, paper_name) or []
+    manifest = {'visualizations': visualizations, 'seconds': round(time.perf_counter() - started, 3)}
+    # Written last and atomically: a folder with a manifest is a complete render
+    tmp_path = os.path.join(folder, f"{MANIFEST}.{os.getpid()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp_path, os.path.join(folder, MANIFEST))
+    return manifest
+
+
+class VisualizationRenderer:
+    """
+    Chart rendering off the request path.
+
+    Charts for an analysis are rendered in a process pool whose workers keep
+    Matplotlib loaded, so a job pays only for drawing. Each analysis renders
+    into a folder named by the sha256 of its text: the same analysis (a cache
+    hit, a rerun) reuses the finished charts, and concurrent submissions of
+    it share one render. Pages load first and poll status() for the charts.
+    """
+
+    def __init__(self, folder: str, max_workers: int = VIZ_WORKERS):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+        self.max_workers = max_workers
+        self.counters = {'rendered': 0, 'reused': 0, 'deduplicated': 0, 'errors': 0}
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._errors = {}
+        self._pool = None
+
+    def _manifest_path(self, analysis_id: str) -> str:
+        return os.path.join(self.folder, analysis_id, MANIFEST)
+
+    def _ensure_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_warm_worker)
+        return self._pool
+
+    def submit(self, analysis_text: str, paper_name: str) -> str:
+        """Start rendering the analysis' charts (unless done or running) and return its analysis ID"""
+        analysis_id = content_key(analysis_text.encode('utf-8'))
+        with self._lock:
+            if os.path.exists(self._manifest_path(analysis_id)):
+                self.counters['reused'] += 1
+                return analysis_id
+            if analysis_id in self._inflight:
+                self.counters['deduplicated'] += 1
+                return analysis_id
+            self._errors.pop(analysis_id, None)
+            job = (_render, os.path.join(self.folder, analysis_id), analysis_text, paper_name)
+            try:
+                future = self._ensure_pool().submit(*job)
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory); start a fresh pool
+                self._pool = None
+                future = self._ensure_pool().submit(*job)
+            self._inflight[analysis_id] = future
+        # Outside the lock: the callback runs inline if the render already finished
+        future.add_done_callback(lambda done: self._finished(analysis_id, done))
+        return analysis_id
+
+    def _finished(self, analysis_id: str, future):
+        error = future.exception()
+        with self._lock:
+            self._inflight.pop(analysis_id, None)
+            if error is not None:
+                self._errors[analysis_id] = str(error)
+                self.counters['errors'] += 1
+            else:
+                self.counters['rendered'] += 1
+        if error is None:
+            manifest = future.result()
+            record_span('visualization', manifest['seconds'], charts=len(manifest['visualizations']))
+        else:
+            logger.error("Visualization generation error: %s", error)
+
+    def status(self, analysis_id: str) -> dict:
+        """{'analysis_id', 'status': pending|done|failed|unknown, 'visualizations', 'error'}"""
+        manifest_path = self._manifest_path(analysis_id)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding='utf-8') as f:
+                manifest = json.load(f)
+            return {'analysis_id': analysis_id, 'status': 'done',
+                    'visualizations': manifest['visualizations']}
+        with self._lock:
+            if analysis_id in self._inflight:
+                return {'analysis_id': analysis_id, 'status': 'pending', 'visualizations': []}
+            error = self._errors.get(analysis_id)
+        if error is not None:
+            return {'analysis_id': analysis_id, 'status': 'failed', 'visualizations': [], 'error': error}
+        return {'analysis_id': analysis_id, 'status': 'unknown', 'visualizations': []}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self.counters, 'in_flight': len(self._inflight)}
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)